@@ -0,0 +1,231 @@
+"""
+Offline benchmarks for the hot paths of lw_to_epub.py.
+
+Runs page parsing, post extraction, the EPUB and Kindle cleaners, image optimization and
+EPUB creation against the saved pages and images in benchmarks/fixtures, without network
+access, and reports throughput (posts/s or images/s, and MB/s of input) for each.
+
+    python benchmarks/benchmark.py --json results.json
+    python benchmarks/benchmark.py --compare results.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCHMARK_DIR, "fixtures")
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+
+import lw_to_epub as lw  # noqa: E402
+
+# URLs the fixture pages are served under; their images point at FIXTURE_IMAGE_URL
+FIXTURE_PAGES = {
+    "post_long.html": f"{lw.BASE_URL}/posts/benchlong/updating-on-weak-evidence",
+    "post_short.html": f"{lw.BASE_URL}/posts/benchshort/a-short-note",
+    "post_messy.html": f"{lw.BASE_URL}/posts/benchmessy/legacy-post",
+}
+FIXTURE_IMAGES = ["diagram.png", "photo.jpg", "chart.png", "animation.gif"]
+FIXTURE_IMAGE_URL = "https://res.cloudinary.com/lesswrong-2-0/image/upload/v1/benchmark/"
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def seed_image_cache():
+    """Puts the fixture images in the image cache under the names download_image looks for."""
+    os.makedirs(lw.IMAGES_DIR, exist_ok=True)
+    for name in FIXTURE_IMAGES:
+        local_name = lw.get_image_filename(FIXTURE_IMAGE_URL + name)
+        shutil.copyfile(os.path.join(FIXTURES_DIR, name),
+                        os.path.join(lw.IMAGES_DIR, local_name))
+
+
+def extract_post(url, page):
+    """Runs get_post_content on a fixture page, handing the page to make_soup instead of fetching it."""
+    lw._prefetched_pages[url] = page
+    return lw.get_post_content(url, use_cache=False, image_workers=1)
+
+
+def get_content_html(page):
+    """Returns the post body markup of a fixture page, the input the cleaners see."""
+    soup = lw.bs4.BeautifulSoup(page, lw.HTML_PARSER)
+    content = soup.select_one('div#postContent div.InlineReactSelectionWrapper-root > div') or \
+        soup.select_one('div.PostsPage-postContent div.ContentStyles-base')
+    return str(content)
+
+
+def run_benchmark(function, repeat):
+    """Calls function once to warm up, then repeat times. Returns the timings in seconds."""
+    function()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def get_benchmarks(args):
+    """Returns (name, unit, items, input bytes, function) for every benchmark, each function doing one round."""
+    pages = {url: read_fixture(name) for name, url in FIXTURE_PAGES.items()}
+    page_bytes = sum(len(page) for page in pages.values())
+    contents = [get_content_html(page) for page in pages.values()]
+    content_bytes = sum(len(content.encode('utf-8')) for content in contents)
+    image_paths = [os.path.join(lw.IMAGES_DIR, lw.get_image_filename(FIXTURE_IMAGE_URL + name))
+                   for name in FIXTURE_IMAGES]
+    image_bytes = sum(os.path.getsize(path) for path in image_paths)
+
+    def parse():
+        for url, page in pages.items():
+            lw._prefetched_pages[url] = page
+            lw.make_soup(url)
+
+    def extract():
+        for url, page in pages.items():
+            extract_post(url, page)
+
+    def clean_epub():
+        for content in contents:
+            lw.clean_html_for_epub(content)
+
+    def clean_kindle():
+        for content in contents:
+            lw.clean_html_for_kindle_compatibility(content)
+
+    def optimize():
+        for path in image_paths:
+            lw.optimize_image_for_epub(path)
+
+    # A book of args.posts chapters, cycling through the extracted fixture posts
+    extracted = [extract_post(url, page) for url, page in pages.items()]
+    book_posts = []
+    for i in range(args.posts):
+        post = dict(extracted[i % len(extracted)])
+        post['url'] = f"{post['url']}-{i}"
+        post['title'] = f"{post['title']} ({i + 1})"
+        book_posts.append(post)
+    book_bytes = sum(len(post['content'].encode('utf-8')) for post in book_posts)
+
+    def build(streaming):
+        def create():
+            lw.create_epub(book_posts, "benchmark.epub", streaming=streaming)
+        return create
+
+    return [
+        ("make_soup", "posts", len(pages), page_bytes, parse),
+        ("get_post_content", "posts", len(pages), page_bytes, extract),
+        ("clean_html_for_epub", "posts", len(contents), content_bytes, clean_epub),
+        ("clean_html_for_kindle_compatibility", "posts", len(contents), content_bytes, clean_kindle),
+        ("optimize_image_for_epub", "images", len(image_paths), image_bytes, optimize),
+        ("create_epub", "posts", len(book_posts), book_bytes, build(False)),
+        ("create_epub --streaming", "posts", len(book_posts), book_bytes, build(True)),
+    ]
+
+
+def get_git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, previous=None):
+    """Prints one line per benchmark, with the change against previous results when given."""
+    header = f"{'benchmark':<38} {'median ms':>10} {'throughput':>18} {'MB/s':>9}"
+    if previous:
+        header += f" {'vs previous':>12}"
+    print(header)
+    for name, result in results.items():
+        line = (f"{name:<38} {result['median_seconds'] * 1000:>10.2f} "
+                f"{result['items_per_second']:>10.1f} {result['unit'] + '/s':<7} {result['mb_per_second']:>9.2f}")
+        before = (previous or {}).get(name)
+        if before:
+            # Above 1.00x is faster than the previous run
+            line += f" {before['median_seconds'] / result['median_seconds']:>11.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for lw_to_epub.py.")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="Timed rounds per benchmark, after one warm-up round (default: 5)")
+    parser.add_argument('--posts', type=int, default=30,
+                        help="Chapters in the book built by the create_epub benchmarks (default: 30)")
+    parser.add_argument('--parser', choices=['lxml', 'html5lib', 'html.parser'], default=lw.HTML_PARSER,
+                        help=f"HTML parser to benchmark (default: {lw.HTML_PARSER})")
+    parser.add_argument('--only', nargs='+', metavar='NAME',
+                        help="Run only the benchmarks whose names start with one of these")
+    parser.add_argument('--json', metavar='PATH',
+                        help="Write the results to PATH as JSON, for --compare in later runs")
+    parser.add_argument('--compare', metavar='PATH',
+                        help="Show the change against results saved with --json")
+    args = parser.parse_args()
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)['results']
+
+    lw.HTML_PARSER = args.parser
+    results = {}
+    # Caches and outputs go to a scratch directory; the module's progress output is discarded
+    with tempfile.TemporaryDirectory() as workdir, open(os.devnull, 'w') as devnull:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            lw.setup_cache_dirs()
+            seed_image_cache()
+            with contextlib.redirect_stdout(devnull):
+                benchmarks = get_benchmarks(args)
+            for name, unit, items, size, function in benchmarks:
+                if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                    continue
+                with contextlib.redirect_stdout(devnull):
+                    timings = run_benchmark(function, max(1, args.repeat))
+                median = statistics.median(timings)
+                results[name] = {
+                    'unit': unit,
+                    'items': items,
+                    'bytes': size,
+                    'median_seconds': median,
+                    'min_seconds': min(timings),
+                    'items_per_second': items / median,
+                    'mb_per_second': size / median / (1024 * 1024),
+                }
+        finally:
+            os.chdir(cwd)
+
+    print_results(results, previous)
+
+    if args.json:
+        report = {
+            'meta': {
+                'git_revision': get_git_revision(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'parser': args.parser,
+                'repeat': args.repeat,
+                'posts': args.posts,
+                'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'results': results,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Startup benchmarks for the lw_to_epub.py command line.
+
+Times fresh interpreter runs of commands that should not need the heavy libraries
+(--help, cache stats, a bare import) and lists which of those libraries each one loaded.
+Runs in a scratch directory, so the cache being inspected is empty.
+
+    python benchmarks/import_time.py
+    git show HEAD~1:lw_to_epub.py > /tmp/old_lw_to_epub.py
+    python benchmarks/import_time.py --compare /tmp/old_lw_to_epub.py
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_PATH = os.path.join(os.path.dirname(BENCHMARK_DIR), "lw_to_epub.py")
+
+HEAVY_MODULES = ['requests', 'bs4', 'ebooklib', 'lxml', 'html5lib', 'PIL', 'aiohttp', 'asyncio']
+
+# Runs the script with the given arguments (or only imports it when the arguments are None),
+# then reports the heavy modules it loaded
+RUNNER = """
+import json, runpy, sys
+script, arguments, heavy = sys.argv[1], json.loads(sys.argv[2]), json.loads(sys.argv[3])
+sys.argv = [script] + (arguments or [])
+try:
+    runpy.run_path(script, run_name='lw_to_epub' if arguments is None else '__main__')
+except SystemExit:
+    pass
+print(json.dumps([name for name in heavy if name in sys.modules]), file=sys.stderr)
+"""
+
+COMMANDS = [
+    ("--help", ['--help']),
+    ("cache stats", ['cache', 'stats']),
+    ("--cache-stats", ['--cache-stats']),
+    ("import", None),
+]
+
+
+def time_command(script, arguments, workdir):
+    """Runs the script once in a fresh interpreter. Returns (seconds, heavy modules loaded)."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', RUNNER, script, json.dumps(arguments), json.dumps(HEAVY_MODULES)],
+                            cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    loaded = json.loads(result.stderr.strip().splitlines()[-1])
+    return elapsed, loaded
+
+
+def benchmark_script(script, repeat, workdir):
+    """Returns {command: (median seconds, heavy modules loaded)} for script."""
+    results = {}
+    for name, arguments in COMMANDS:
+        time_command(script, arguments, workdir)  # Warm the OS file cache
+        timings = []
+        for _ in range(repeat):
+            elapsed, loaded = time_command(script, arguments, workdir)
+            timings.append(elapsed)
+        results[name] = (statistics.median(timings), loaded)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup benchmarks for the lw_to_epub.py command line.")
+    parser.add_argument('--repeat', type=int, default=10,
+                        help="Timed runs per command, after one warm-up run (default: 10)")
+    parser.add_argument('--script', default=SCRIPT_PATH,
+                        help="Script to benchmark (default: lw_to_epub.py of this checkout)")
+    parser.add_argument('--compare', metavar='SCRIPT',
+                        help="Also benchmark another copy of the script, e.g. an older revision")
+    args = parser.parse_args()
+
+    repeat = max(1, args.repeat)
+    with tempfile.TemporaryDirectory() as workdir:
+        baseline = time_command(os.devnull, None, workdir)[0]
+        results = benchmark_script(os.path.abspath(args.script), repeat, workdir)
+        previous = benchmark_script(os.path.abspath(args.compare), repeat, workdir) if args.compare else None
+
+    print(f"Interpreter startup: {baseline * 1000:.0f} ms")
+    header = f"{'command':<16} {'median ms':>10}"
+    if previous:
+        header += f" {'compared':>10} {'speedup':>8}"
+    print(header + "  heavy modules loaded")
+    for name, (median, loaded) in results.items():
+        line = f"{name:<16} {median * 1000:>10.0f}"
+        if previous:
+            before = previous[name][0]
+            line += f" {before * 1000:>10.0f} {before / median:>7.1f}x"
+        print(f"{line}  {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
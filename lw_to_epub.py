@@ -1,27 +1,78 @@
 import argparse
-import requests
-from bs4 import BeautifulSoup
-from ebooklib import epub
+import importlib
+import importlib.util
 import time
 import os
 import re
 import json
 import hashlib
 from urllib.parse import urljoin, urlparse, parse_qs, urlencode
-import lxml.html
-import lxml.etree
 import html  # For html.escape
 import random
 import mimetypes
 import shutil
 import datetime
 import base64
-from PIL import Image, ImageDraw, ImageFont
+import zlib
+import sqlite3
 from io import BytesIO
 import subprocess
+import sys
+import threading
+import uuid
+import zipfile
+import atexit
+import cProfile
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import chain, islice, repeat
+
+
+class LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access, so commands that never
+    fetch, parse or build (cache maintenance, --help) don't pay for importing it.
+    Submodules not imported by their package (lxml.html) are imported on access too.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        try:
+            return getattr(self._module, attr)
+        except AttributeError:
+            try:
+                return importlib.import_module(f"{self._name}.{attr}")
+            except ImportError:
+                raise AttributeError(
+                    f"module '{self._name}' has no attribute '{attr}'") from None
+
+
+# Heavy dependencies, imported when first used
+requests = LazyModule('requests')
+bs4 = LazyModule('bs4')
+epub = LazyModule('ebooklib.epub')
+ebooklib_utils = LazyModule('ebooklib.utils')
+lxml = LazyModule('lxml')
+Image = LazyModule('PIL.Image')
+ImageDraw = LazyModule('PIL.ImageDraw')
+ImageFont = LazyModule('PIL.ImageFont')
+asyncio = LazyModule('asyncio')
+aiohttp = LazyModule('aiohttp')  # Optional, only needed for --fetch-backend async
+
+try:
+    import resource  # Unix only, used for the peak RSS in --profile reports
+except ImportError:
+    resource = None
 
 # --- Configuration ---
 BASE_URL = "https://www.lesswrong.com"
+GRAPHQL_URL = f"{BASE_URL}/graphql"
 USER_AGENT = "LessWrongEbookDownloader/1.0"
 # seconds between requests to be polite (reduced for faster testing, increase if issues)
 REQUEST_DELAY = 0.5
@@ -31,20 +82,220 @@ PAGE_CACHE_DIR = os.path.join(CACHE_DIR, "pages")  # Cached HTML pages
 POST_CACHE_DIR = os.path.join(CACHE_DIR, "posts")  # Cached post data
 SEQUENCE_CACHE_DIR = os.path.join(
     CACHE_DIR, "sequences")  # Cached sequence data
+DERIVATIVE_CACHE_DIR = os.path.join(
+    CACHE_DIR, "derivatives")  # Cached optimized images
+IMAGE_META_DIR = os.path.join(
+    CACHE_DIR, "image_meta")  # ETag/Last-Modified of downloaded images
+CACHE_DB_PATH = os.path.join(
+    CACHE_DIR, "cache.sqlite3")  # Single-file store for the sqlite backend
+CACHE_BACKEND = "files"  # "files" or "sqlite", see configure_cache_backend()
+# Where posts and sequence membership come from: "html" (post pages) or "graphql" (the GraphQL API)
+CONTENT_BACKEND = "html"
 MAX_RETRIES = 3  # Number of times to retry downloading an image
 RETRY_DELAY = 2  # Seconds to wait between retries
 CACHE_EXPIRY_DAYS = 30  # Default cache expiry (in days)
+DEFAULT_WORKERS = 1  # Number of posts fetched concurrently (1 = sequential)
+DEFAULT_PIPELINE_WINDOW = 16  # Posts fetched ahead of the EPUB writer when streaming
+IMAGE_DOWNLOAD_WORKERS = 4  # Max concurrent image downloads per post
+DEFAULT_IMAGE_WORKERS = 1  # Processes used to optimize images (1 = in the main process)
+DEFAULT_VOLUME_WORKERS = 1  # Processes used to build split volumes (1 = one after another)
+DEFAULT_MAX_POSTS_PER_FILE = 50  # Posts per volume when splitting by count
+BUILD_STATE_VERSION = 1  # Bump when chapter rendering changes, to invalidate incremental build state
+ZIP_ENTRY_DATE = (1980, 1, 1, 0, 0, 0)  # Date given to streamed zip entries, for reproducible output
+HTTP_POOL_SIZE = 10  # Keep-alive connections kept open per host
+DEFAULT_ASYNC_CONCURRENCY = 100  # Max in-flight requests for the async fetch backend
+DEFAULT_GRAPHQL_BATCH_SIZE = 50  # Posts requested per GraphQL query by the graphql backend
+# BeautifulSoup backend for pages and chapter cleaning: "lxml" (fastest), "html5lib" or "html.parser"
+HTML_PARSER = "lxml"
+# Extensions of the files making up cache entries (bodies, metadata sidecars and
+# legacy pages); longer suffixes first, as entry names can contain dots
+CACHE_FILE_SUFFIXES = ('.meta.json', '.json', '.page', '.bin', '.html')
+# Image hosts that are never downloaded
+SKIPPED_IMAGE_DOMAINS = [
+    'amazon-adsystem.com',
+    'googleadservices.com',
+    'doubleclick.net',
+    'analytics.com',
+]
+
+# Global politeness rate limit shared by all fetching threads
+_rate_limit_lock = threading.Lock()
+_last_request_time = 0.0
+
+# Keep-alive HTTP session shared by every fetch, see get_http_session()
+_http_session = None
+_http_session_lock = threading.Lock()
+
+# One SQLite connection per thread for the sqlite cache backend
+_cache_db_local = threading.local()
+
+# Access times of SQLite cache hits, written in one transaction by flush_cache_db_accesses()
+_cache_db_accesses = {}
+_cache_db_accesses_lock = threading.Lock()
+
+# Pages downloaded by the async backend while caching is disabled, consumed by make_soup
+_prefetched_pages = {}
+
+# Profiler collecting the --profile report, None when profiling is off
+_profiler = None
 
 # --- Helper Functions ---
 
 
 def setup_cache_dirs():
     """Create cache directory structure if it doesn't exist."""
-    for directory in [CACHE_DIR, PAGE_CACHE_DIR, POST_CACHE_DIR, SEQUENCE_CACHE_DIR, IMAGES_DIR]:
+    for directory in [CACHE_DIR, PAGE_CACHE_DIR, POST_CACHE_DIR, SEQUENCE_CACHE_DIR, DERIVATIVE_CACHE_DIR,
+                      IMAGE_META_DIR, IMAGES_DIR]:
         if not os.path.exists(directory):
             os.makedirs(directory)
 
 
+def wait_for_rate_limit():
+    """Block until at least REQUEST_DELAY seconds have passed since the last request started."""
+    global _last_request_time
+    with profile_stage('rate_limit_wait'), _rate_limit_lock:
+        wait_time = _last_request_time + REQUEST_DELAY - time.time()
+        if wait_time > 0:
+            time.sleep(wait_time)
+        _last_request_time = time.time()
+
+
+def configure_http_session(pool_size=HTTP_POOL_SIZE):
+    """(Re)creates the shared HTTP session with pool_size keep-alive connections per host."""
+    global _http_session
+    session = requests.Session()
+    session.headers.update({'User-Agent': USER_AGENT})
+    # pool_connections is the number of hosts to keep pools for, pool_maxsize the connections per host
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    with _http_session_lock:
+        old_session = _http_session
+        _http_session = session
+    if old_session is not None:
+        old_session.close()
+    return session
+
+
+def get_http_session():
+    """Returns the shared HTTP session so connections to each host are reused."""
+    with _http_session_lock:
+        session = _http_session
+    if session is None:
+        session = configure_http_session()
+    return session
+
+
+class Profiler:
+    """
+    Collects wall and CPU time per stage, per-request latency and size, and cache
+    hits and misses for the --profile report. Safe to use from several threads.
+    Work done in process pools is only visible in the child CPU and RSS totals.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.requests = []
+        self.cache = {}
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+
+    @contextmanager
+    def stage(self, name):
+        """Times the enclosed block. Nested stages are counted in their parents too."""
+        start_wall = time.perf_counter()
+        start_cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.thread_time() - start_cpu
+            with self.lock:
+                totals = self.stages.setdefault(
+                    name, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+                totals['calls'] += 1
+                totals['wall_seconds'] += wall
+                totals['cpu_seconds'] += cpu
+
+    def record_request(self, method, url, status, seconds, size):
+        with self.lock:
+            self.requests.append({'method': method, 'url': url, 'status': status,
+                                  'seconds': round(seconds, 6), 'bytes': size})
+
+    def record_cache(self, kind, hit):
+        with self.lock:
+            counts = self.cache.setdefault(kind, {'hits': 0, 'misses': 0})
+            counts['hits' if hit else 'misses'] += 1
+
+    def report(self):
+        """Returns the collected measurements as a JSON-serializable dict."""
+        with self.lock:
+            requests_made = list(self.requests)
+            stages = {name: dict(totals, wall_seconds=round(totals['wall_seconds'], 6),
+                                 cpu_seconds=round(totals['cpu_seconds'], 6))
+                      for name, totals in self.stages.items()}
+            cache = {kind: dict(counts) for kind, counts in self.cache.items()}
+
+        latencies = sorted(request['seconds'] for request in requests_made)
+
+        def percentile(fraction):
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] if latencies else None
+
+        report = {
+            'wall_seconds': round(time.perf_counter() - self.start_wall, 6),
+            'cpu_seconds': round(time.process_time() - self.start_cpu, 6),
+            'stages': stages,
+            'requests': {
+                'count': len(requests_made),
+                'bytes': sum(request['bytes'] or 0 for request in requests_made),
+                'latency_seconds': {'p50': percentile(0.5), 'p95': percentile(0.95),
+                                    'max': latencies[-1] if latencies else None},
+                'urls': requests_made,
+            },
+            'cache': cache,
+            'peak_rss_bytes': None,
+            'children_peak_rss_bytes': None,
+            'children_cpu_seconds': None,
+        }
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+            scale = 1 if sys.platform == 'darwin' else 1024
+            own = resource.getrusage(resource.RUSAGE_SELF)
+            children = resource.getrusage(resource.RUSAGE_CHILDREN)
+            report['peak_rss_bytes'] = own.ru_maxrss * scale
+            report['children_peak_rss_bytes'] = children.ru_maxrss * scale
+            report['children_cpu_seconds'] = round(
+                children.ru_utime + children.ru_stime, 6)
+        return report
+
+
+def write_profile_report(path):
+    """Writes the --profile report to path as JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(_profiler.report(), f, indent=2)
+    print(f"Profile report written to {path}")
+
+
+def profile_stage(name):
+    """Returns a context manager timing a --profile stage, or a no-op one when not profiling."""
+    return _profiler.stage(name) if _profiler is not None else nullcontext()
+
+
+def record_request(method, url, status, seconds, size):
+    """Records one HTTP request for --profile."""
+    if _profiler is not None:
+        _profiler.record_request(method, url, status, seconds, size)
+
+
+def record_cache(kind, hit):
+    """Records a cache hit or miss for --profile."""
+    if _profiler is not None:
+        _profiler.record_cache(kind, hit)
+
+
 def url_to_cache_key(url):
     """Convert a URL to a cache key."""
     # Use hash for a shorter filename while keeping uniqueness
@@ -52,67 +303,309 @@ def url_to_cache_key(url):
     return hashed
 
 
-def cache_page(url, content):
-    """Cache the content for a URL."""
+def mark_cache_access(*paths):
+    """Sets the access time of cache files explicitly, so LRU pruning also works on noatime mounts."""
+    now = time.time()
+    for path in paths:
+        try:
+            os.utime(path, (now, os.stat(path).st_mtime))
+        except OSError:
+            pass
+
+
+def configure_cache_backend(backend="files"):
+    """Selects where pages, posts and sequences are cached ("files" or "sqlite")."""
+    global CACHE_BACKEND
+    if backend == "sqlite" and CACHE_BACKEND != "sqlite":
+        atexit.register(flush_cache_db_accesses)
+    CACHE_BACKEND = backend
+    if backend == "sqlite":
+        get_cache_db()
+
+
+def get_cache_db():
+    """Returns this thread's connection to the SQLite cache, creating the schema on first use."""
+    conn = getattr(_cache_db_local, 'conn', None)
+    if conn is None:
+        if not os.path.exists(CACHE_DIR):
+            os.makedirs(CACHE_DIR, exist_ok=True)
+        conn = sqlite3.connect(CACHE_DB_PATH, timeout=30)
+        # The default rollback journal (unlike WAL) is safe on network filesystems
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                category TEXT NOT NULL,
+                cache_key TEXT NOT NULL,
+                url TEXT NOT NULL,
+                timestamp REAL NOT NULL,
+                meta TEXT,
+                data BLOB,
+                accessed REAL,
+                PRIMARY KEY (category, cache_key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_url ON cache_entries (url);
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_timestamp ON cache_entries (category, timestamp);
+        """)
+        # Databases created before LRU pruning have no access time column
+        columns = [row[1] for row in conn.execute(
+            "PRAGMA table_info(cache_entries)")]
+        if 'accessed' not in columns:
+            with conn:
+                conn.execute(
+                    "ALTER TABLE cache_entries ADD COLUMN accessed REAL")
+        _cache_db_local.conn = conn
+    return conn
+
+
+def db_cache_put(category, url, data, meta=None, timestamp=None):
+    """Stores a zlib-compressed cache entry in the SQLite cache."""
+    conn = get_cache_db()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (category, cache_key, url, timestamp, meta, data, accessed) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (category, url_to_cache_key(url), url, timestamp if timestamp is not None else time.time(),
+             json.dumps(meta or {}), zlib.compress(data), time.time()))
+
+
+def db_cache_get(category, url, max_age_days=CACHE_EXPIRY_DAYS):
+    """Returns (data, meta) for a fresh SQLite cache entry, or None. meta includes the entry's 'timestamp'."""
+    query = "SELECT data, meta, timestamp FROM cache_entries WHERE category = ? AND cache_key = ?"
+    params = [category, url_to_cache_key(url)]
+    if max_age_days > 0:
+        query += " AND timestamp >= ?"
+        params.append(time.time() - max_age_days * 60 * 60 * 24)
+
+    row = get_cache_db().execute(query, params).fetchone()
+    if row is None:
+        return None
+
+    # Record the access for LRU pruning without turning the read into a write transaction
+    with _cache_db_accesses_lock:
+        _cache_db_accesses[(category, params[1])] = time.time()
+    meta = json.loads(row[1] or '{}')
+    meta['timestamp'] = row[2]
+    return zlib.decompress(row[0]), meta
+
+
+def flush_cache_db_accesses():
+    """Writes the access times of the SQLite cache hits so far, used by LRU pruning."""
+    with _cache_db_accesses_lock:
+        accesses = list(_cache_db_accesses.items())
+        _cache_db_accesses.clear()
+    if not accesses:
+        return
+
+    conn = get_cache_db()
+    with conn:
+        conn.executemany("UPDATE cache_entries SET accessed = ? WHERE category = ? AND cache_key = ?",
+                         [(accessed, category, cache_key) for (category, cache_key), accessed in accesses])
+
+
+def db_cache_get_meta(category, url):
+    """Returns the metadata of a SQLite cache entry (with its 'timestamp') regardless of age, or None."""
+    row = get_cache_db().execute(
+        "SELECT timestamp, meta FROM cache_entries WHERE category = ? AND cache_key = ?",
+        (category, url_to_cache_key(url))).fetchone()
+    if row is None:
+        return None
+    meta = json.loads(row[1] or '{}')
+    meta['timestamp'] = row[0]
+    return meta
+
+
+def db_cache_refresh(category, url, meta):
+    """Marks a SQLite cache entry as fresh again without rewriting its data."""
+    conn = get_cache_db()
+    now = time.time()
+    with conn:
+        conn.execute("UPDATE cache_entries SET timestamp = ?, accessed = ?, meta = ? "
+                     "WHERE category = ? AND cache_key = ?",
+                     (now, now, json.dumps(meta), category, url_to_cache_key(url)))
+
+
+def get_response_validators(headers):
+    """Extracts the HTTP cache validators (ETag / Last-Modified) from response headers."""
+    validators = {}
+    if headers.get('ETag'):
+        validators['etag'] = headers['ETag']
+    if headers.get('Last-Modified'):
+        validators['last_modified'] = headers['Last-Modified']
+    return validators
+
+
+def get_conditional_headers(meta):
+    """Builds If-None-Match / If-Modified-Since request headers from cached validators."""
+    headers = {}
+    if meta and meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta and meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    return headers
+
+
+def get_page_cache_paths(url):
+    """Returns the (body, metadata) file paths of the page cache entry for a URL."""
     cache_key = url_to_cache_key(url)
-    cache_path = os.path.join(PAGE_CACHE_DIR, f"{cache_key}.html")
+    return (os.path.join(PAGE_CACHE_DIR, f"{cache_key}.page"),
+            os.path.join(PAGE_CACHE_DIR, f"{cache_key}.meta.json"))
 
-    # Convert bytes to base64 string for JSON serialization
-    if isinstance(content, bytes):
-        content_str = base64.b64encode(content).decode('ascii')
-        is_binary = True
-    else:
-        content_str = content
-        is_binary = False
 
-    # Store the page content along with a timestamp and original URL
-    cache_data = {
+def write_page_cache_meta(meta_path, meta):
+    """Atomically writes the metadata sidecar of a page cache entry."""
+    temp_path = f"{meta_path}.{threading.get_ident()}.part"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(temp_path, meta_path)
+
+
+def write_page_cache(url, content, timestamp, validators=None):
+    """Stores a page as a zlib-compressed body file plus a small JSON metadata sidecar."""
+    body_path, meta_path = get_page_cache_paths(url)
+
+    # Store text as UTF-8 bytes and remember to decode it on the way out
+    is_binary = isinstance(content, bytes)
+    raw_content = content if is_binary else content.encode('utf-8')
+
+    meta = {
         'url': url,
-        'timestamp': time.time(),
-        'content': content_str,
-        'is_binary': is_binary  # Flag to indicate if content was binary
+        'timestamp': timestamp,
+        'is_binary': is_binary,  # Flag to indicate if content was binary
+        'size': len(raw_content)
     }
+    meta.update(validators or {})
 
-    with open(cache_path, 'w', encoding='utf-8') as f:
-        json.dump(cache_data, f)
+    # The metadata is written last so a readable entry always has its body
+    temp_path = f"{body_path}.{threading.get_ident()}.part"
+    with open(temp_path, 'wb') as f:
+        f.write(zlib.compress(raw_content))
+    os.replace(temp_path, body_path)
+    write_page_cache_meta(meta_path, meta)
 
 
-def get_cached_page(url, max_age_days=CACHE_EXPIRY_DAYS):
-    """Get cached content for a URL if it exists and isn't too old."""
-    cache_key = url_to_cache_key(url)
-    cache_path = os.path.join(PAGE_CACHE_DIR, f"{cache_key}.html")
+def migrate_legacy_page_cache(url):
+    """Converts an old base64-in-JSON page cache entry for a URL to the compressed format."""
+    legacy_path = os.path.join(
+        PAGE_CACHE_DIR, f"{url_to_cache_key(url)}.html")
+    if not os.path.exists(legacy_path):
+        return False
 
-    if os.path.exists(cache_path):
-        try:
-            with open(cache_path, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
+    try:
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            cache_data = json.load(f)
 
-            # Check if cache is expired
-            cache_age = (
-                time.time() - cache_data['timestamp']) / (60 * 60 * 24)  # in days
-            if max_age_days > 0 and cache_age > max_age_days:
-                return None  # Cache is too old
+        # Convert back from base64 string to bytes if it was binary
+        if cache_data.get('is_binary', False):
+            content = base64.b64decode(cache_data['content'])
+        else:
+            content = cache_data['content']
+
+        write_page_cache(url, content, cache_data['timestamp'])
+        os.remove(legacy_path)
+        return True
+    except Exception as e:
+        print(f"Error migrating page cache for {url}: {e}")
+        return False
 
-            # Convert back from base64 string to bytes if it was binary
-            if cache_data.get('is_binary', False):
-                return base64.b64decode(cache_data['content'])
-            else:
-                return cache_data['content']
 
+def cache_page(url, content, validators=None):
+    """Cache the content for a URL, with its ETag/Last-Modified validators if known."""
+    if CACHE_BACKEND == "sqlite":
+        is_binary = isinstance(content, bytes)
+        meta = {'is_binary': is_binary}
+        meta.update(validators or {})
+        db_cache_put("pages", url, content if is_binary else content.encode('utf-8'),
+                     meta)
+        return
+
+    write_page_cache(url, content, time.time(), validators)
+
+
+def get_cached_page_meta(url):
+    """Returns the metadata of a cached page (timestamp, validators) regardless of its age, or None."""
+    try:
+        if CACHE_BACKEND == "sqlite":
+            return db_cache_get_meta("pages", url)
+
+        _, meta_path = get_page_cache_paths(url)
+        if not os.path.exists(meta_path) and not migrate_legacy_page_cache(url):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error reading cache metadata for {url}: {e}")
+        return None
+
+
+def refresh_cached_page(url, validators=None):
+    """Resets the age of a cached page after the server confirmed it is unchanged (HTTP 304)."""
+    meta = get_cached_page_meta(url)
+    if meta is None:
+        return
+    meta.update(validators or {})
+
+    if CACHE_BACKEND == "sqlite":
+        del meta['timestamp']
+        db_cache_refresh("pages", url, meta)
+        return
+
+    meta['timestamp'] = time.time()
+    write_page_cache_meta(get_page_cache_paths(url)[1], meta)
+
+
+def get_cached_page(url, max_age_days=CACHE_EXPIRY_DAYS):
+    """Get cached content for a URL if it exists and isn't too old."""
+    if CACHE_BACKEND == "sqlite":
+        try:
+            entry = db_cache_get("pages", url, max_age_days)
         except Exception as e:
             print(f"Error reading cache for {url}: {e}")
+            return None
+        if entry is None:
+            return None
+        content, meta = entry
+        return content if meta.get('is_binary', False) else content.decode('utf-8')
+
+    body_path, meta_path = get_page_cache_paths(url)
+
+    if not os.path.exists(meta_path) and not migrate_legacy_page_cache(url):
+        return None
+
+    try:
+        # The expiry check only needs the small metadata file
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        cache_age = (time.time() - meta['timestamp']) / \
+            (60 * 60 * 24)  # in days
+        if max_age_days > 0 and cache_age > max_age_days:
+            return None  # Cache is too old
+
+        with open(body_path, 'rb') as f:
+            content = zlib.decompress(f.read())
+        mark_cache_access(meta_path, body_path)
+
+        return content if meta.get('is_binary', False) else content.decode('utf-8')
+
+    except Exception as e:
+        print(f"Error reading cache for {url}: {e}")
 
     return None
 
 
-def cache_post_data(post_url, post_data):
-    """Cache the extracted post data."""
+def cache_post_data(post_url, post_data, timestamp=None):
+    """Cache the extracted post data (timestamp defaults to now)."""
+    if CACHE_BACKEND == "sqlite":
+        db_cache_put("posts", post_url, json.dumps(
+            post_data, ensure_ascii=False).encode('utf-8'), timestamp=timestamp)
+        return
+
     cache_key = url_to_cache_key(post_url)
     cache_path = os.path.join(POST_CACHE_DIR, f"{cache_key}.json")
 
     # Add timestamp for cache expiry checking
     post_data_with_meta = post_data.copy()
-    post_data_with_meta['_cache_timestamp'] = time.time()
+    post_data_with_meta['_cache_timestamp'] = timestamp if timestamp is not None else time.time()
 
     with open(cache_path, 'w', encoding='utf-8') as f:
         json.dump(post_data_with_meta, f, ensure_ascii=False, indent=2)
@@ -120,6 +613,18 @@ def cache_post_data(post_url, post_data):
 
 def get_cached_post_data(post_url, max_age_days=CACHE_EXPIRY_DAYS):
     """Get cached post data if it exists and isn't too old."""
+    if CACHE_BACKEND == "sqlite":
+        try:
+            entry = db_cache_get("posts", post_url, max_age_days)
+            if entry is None:
+                return None
+            post_data = upgrade_cached_post_data(post_url, json.loads(entry[0].decode('utf-8')),
+                                                 entry[1]['timestamp'])
+        except Exception as e:
+            print(f"Error reading post cache for {post_url}: {e}")
+            return None
+        return None if has_evicted_images(post_url, post_data) else post_data
+
     cache_key = url_to_cache_key(post_url)
     cache_path = os.path.join(POST_CACHE_DIR, f"{cache_key}.json")
 
@@ -136,18 +641,46 @@ def get_cached_post_data(post_url, max_age_days=CACHE_EXPIRY_DAYS):
                     return None  # Cache is too old
 
                 # Remove cache metadata before returning
-                if '_cache_timestamp' in post_data:
-                    del post_data['_cache_timestamp']
+                cache_timestamp = post_data.pop('_cache_timestamp', None)
 
-                return post_data
+                mark_cache_access(cache_path)
+
+                post_data = upgrade_cached_post_data(post_url, post_data, cache_timestamp)
+                return None if has_evicted_images(post_url, post_data) else post_data
         except Exception as e:
             print(f"Error reading post cache for {post_url}: {e}")
 
     return None
 
 
+def has_evicted_images(post_url, post_data):
+    """
+    Checks whether images a cached post refers to have been removed from IMAGES_DIR
+    (by pruning, for example), in which case the post is extracted again to download them.
+    """
+    missing = [image for image in post_data.get('images', [])
+               if not os.path.exists(os.path.join(IMAGES_DIR, image))]
+    if missing:
+        print(f"Cached post {post_url} refers to {len(missing)} evicted images, extracting it again")
+    return bool(missing)
+
+
+def upgrade_cached_post_data(post_url, post_data, cache_timestamp):
+    """Adds the image index to post data cached by older versions and stores it back, keeping its age."""
+    if 'images' not in post_data:
+        post_data['images'] = get_image_references(
+            post_data.get('content', ''))
+        cache_post_data(post_url, post_data, cache_timestamp)
+    return post_data
+
+
 def cache_sequence_urls(sequence_url, post_urls):
     """Cache the URLs extracted from a sequence."""
+    if CACHE_BACKEND == "sqlite":
+        db_cache_put("sequences", sequence_url, json.dumps(
+            post_urls, ensure_ascii=False).encode('utf-8'))
+        return
+
     cache_key = url_to_cache_key(sequence_url)
     cache_path = os.path.join(SEQUENCE_CACHE_DIR, f"{cache_key}.json")
 
@@ -163,6 +696,15 @@ def cache_sequence_urls(sequence_url, post_urls):
 
 def get_cached_sequence_urls(sequence_url, max_age_days=CACHE_EXPIRY_DAYS):
     """Get cached sequence URLs if they exist and aren't too old."""
+    if CACHE_BACKEND == "sqlite":
+        try:
+            entry = db_cache_get("sequences", sequence_url, max_age_days)
+            return json.loads(entry[0].decode('utf-8')) if entry else None
+        except Exception as e:
+            print(
+                f"Error reading sequence cache for {sequence_url}: {e}")
+            return None
+
     cache_key = url_to_cache_key(sequence_url)
     cache_path = os.path.join(SEQUENCE_CACHE_DIR, f"{cache_key}.json")
 
@@ -177,6 +719,7 @@ def get_cached_sequence_urls(sequence_url, max_age_days=CACHE_EXPIRY_DAYS):
             if max_age_days > 0 and cache_age > max_age_days:
                 return None  # Cache is too old
 
+            mark_cache_access(cache_path)
             return sequence_data['post_urls']
         except Exception as e:
             print(f"Error reading sequence cache for {sequence_url}: {e}")
@@ -184,32 +727,77 @@ def get_cached_sequence_urls(sequence_url, max_age_days=CACHE_EXPIRY_DAYS):
     return None
 
 
+def parse_page(content):
+    """Parses a page with the HTML_PARSER backend."""
+    with profile_stage('parse'):
+        return bs4.BeautifulSoup(content, HTML_PARSER)
+
+
+def timed_request(method, url, label=None, **kwargs):
+    """
+    Makes a (not streamed) request through the shared session, recording it for --profile
+    under label, which defaults to url.
+    """
+    with profile_stage('fetch'):
+        start = time.perf_counter()
+        response = get_http_session().request(method, url, **kwargs)
+    record_request(method, label or url, response.status_code,
+                   time.perf_counter() - start, len(response.content))
+    return response
+
+
 def make_soup(url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS):
-    """Fetches a URL and returns a BeautifulSoup object using html5lib parser with caching."""
+    """Fetches a URL and returns a BeautifulSoup object using the HTML_PARSER backend with caching."""
     print(f"Processing URL: {url}")
 
+    # Pages downloaded ahead of time by the async backend are used only once
+    prefetched_content = _prefetched_pages.pop(url, None)
+    if prefetched_content is not None:
+        print(f"Using prefetched version of: {url}")
+        return parse_page(prefetched_content)
+
     # Check cache first if enabled
     if use_cache:
         cached_content = get_cached_page(url, max_cache_age)
+        record_cache('pages', bool(cached_content))
         if cached_content:
             print(f"Using cached version of: {url}")
             # Make sure we're passing bytes to BeautifulSoup
             if not isinstance(cached_content, bytes):
                 cached_content = cached_content.encode('utf-8')
-            return BeautifulSoup(cached_content, 'html5lib')
+            return parse_page(cached_content)
+
+    # An expired entry can still be revalidated instead of downloaded again
+    headers = get_conditional_headers(
+        get_cached_page_meta(url)) if use_cache else {}
 
     print(f"Fetching: {url}")
     try:
-        headers = {'User-Agent': USER_AGENT}
-        response = requests.get(url, headers=headers, timeout=30)
+        wait_for_rate_limit()
+        response = timed_request('GET', url, headers=headers, timeout=30)
+
+        if response.status_code == 304:
+            cached_content = get_cached_page(url, 0)
+            if cached_content is not None:
+                print(f"Not modified, reusing cached version of: {url}")
+                refresh_cached_page(
+                    url, get_response_validators(response.headers))
+                if not isinstance(cached_content, bytes):
+                    cached_content = cached_content.encode('utf-8')
+                return parse_page(cached_content)
+
+            # The cached body is gone, fetch the page unconditionally
+            wait_for_rate_limit()
+            response = timed_request('GET', url, timeout=30)
+
         response.raise_for_status()
 
         # Cache the page content
         if use_cache:
-            cache_page(url, response.content)
+            cache_page(url, response.content,
+                       get_response_validators(response.headers))
 
-        time.sleep(REQUEST_DELAY)
-        return BeautifulSoup(response.content, 'html5lib')
+        return parse_page(response.content)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching {url}: {e}")
         return None
@@ -225,64 +813,42 @@ def sanitize_filename(name):
     return name[:100]
 
 
-def clean_html_for_epub(html_content):
-    """Clean HTML content to ensure it's valid for EPUB."""
-    if not html_content:
-        return ""
-
-    # First, try parsing with html5lib which is more forgiving
-    try:
-        soup = BeautifulSoup(html_content, 'html5lib')
-
-        # Fix SVG tags which might cause issues
-        for svg in soup.find_all('svg'):
-            # Either properly namespace SVG or replace with an img if reference exists
-            if svg.get('src'):
-                img = soup.new_tag('img')
-                img['src'] = svg['src']
-                img['alt'] = svg.get('alt', 'SVG Image')
-                svg.replace_with(img)
-
-        # Remove problematic elements and attributes
-        for script in soup.find_all(['script', 'style', 'iframe']):
-            script.decompose()
-
-        # Remove on* attributes (event handlers)
-        for tag in soup.find_all(True):
-            attrs_to_remove = [
-                attr for attr in tag.attrs if attr.startswith('on')]
-            for attr in attrs_to_remove:
-                del tag[attr]
+# --- HTML transformation passes ---
+# Each pass modifies a parsed tree in place: soup is the document (used to create
+# new tags) and root the element to work on (the whole document by default).
 
-        # Return the cleaned HTML
-        return str(soup)
 
-    except Exception as e:
-        print(f"Error during HTML cleaning with html5lib: {e}")
+def epub_cleanup_pass(soup, root=None):
+    """Replaces <svg src> with <img> and removes scripts, styles, iframes and event handlers."""
+    root = soup if root is None else root
 
-        # Fall back to more aggressive cleaning
-        try:
-            # Try lxml as a fallback
-            doc = lxml.html.fromstring(html_content)
-            # Convert back to string, which can help normalize HTML
-            clean_html = lxml.html.tostring(doc, encoding='unicode')
-            return clean_html
-        except Exception as e2:
-            print(f"Error during fallback HTML cleaning: {e2}")
+    # Fix SVG tags which might cause issues
+    for svg in root.find_all('svg'):
+        # Either properly namespace SVG or replace with an img if reference exists
+        if svg.get('src'):
+            img = soup.new_tag('img')
+            img['src'] = svg['src']
+            img['alt'] = svg.get('alt', 'SVG Image')
+            svg.replace_with(img)
 
-            # Last resort: basic entity escaping
-            return f"<p>Content could not be properly formatted. Error: {html.escape(str(e))}</p>"
+    # Remove problematic elements and attributes
+    for script in root.find_all(['script', 'style', 'iframe']):
+        script.decompose()
 
+    # Remove on* attributes (event handlers)
+    for tag in root.find_all(True):
+        attrs_to_remove = [
+            attr for attr in tag.attrs if attr.startswith('on')]
+        for attr in attrs_to_remove:
+            del tag[attr]
 
-def clean_html_for_kindle_compatibility(html_content):
-    """Clean HTML to ensure it's compatible with Kindle devices."""
-    if not html_content:
-        return ""
 
-    soup = BeautifulSoup(html_content, 'html.parser')
+def kindle_cleanup_pass(soup, root=None):
+    """Normalizes images and removes elements and attributes Kindle devices can't handle."""
+    root = soup if root is None else root
 
     # Fix img tags - ensure they have proper attributes
-    for img in soup.find_all('img'):
+    for img in root.find_all('img'):
         # Remove empty src attributes
         if not img.get('src'):
             img['src'] = "#"
@@ -301,19 +867,139 @@ def clean_html_for_kindle_compatibility(html_content):
             img['src'] = img['src'].replace(' ', '%20')
 
     # Remove potentially problematic elements for Kindle
-    for elem in soup.select('svg, canvas, video, audio, iframe, script, style'):
+    for elem in root.select('svg, canvas, video, audio, iframe, script, style'):
         elem.decompose()
 
     # Fix non-standard HTML that might cause issues
-    for tag in soup.find_all():
+    for tag in root.find_all():
         # Remove on* event attributes
         for attr in list(tag.attrs.keys()):
             if attr.startswith('on'):
                 del tag[attr]
 
+
+def excluded_images_pass(soup, excluded_images, placeholder_name, root=None):
+    """Points images that were left out of the book at the placeholder image."""
+    root = soup if root is None else root
+
+    for img in root.find_all('img'):
+        src = img.get('src', '')
+        if src.startswith('images/'):
+            img_filename = src.replace('images/', '')
+            if img_filename in excluded_images:
+                # Replace with placeholder
+                img['src'] = f"images/{placeholder_name}"
+                img['alt'] = f"[Image exceeded size limit: {img_filename}]"
+                img['class'] = img.get('class', []) + ['excluded-image']
+
+            # Ensure all image paths use forward slashes for Kindle compatibility
+            img['src'] = img['src'].replace('\\', '/')
+
+
+def remove_images_pass(soup, root=None):
+    """Replaces every image with its alt text in brackets (--no-images)."""
+    root = soup if root is None else root
+
+    for img in root.find_all('img'):
+        # Replace with alt text in brackets
+        alt_text = img.get('alt', 'Image')
+        replacement = soup.new_tag('span')
+        replacement['class'] = 'image-placeholder'
+        replacement.string = f"[{alt_text}]"
+        img.replace_with(replacement)
+
+
+def get_image_references(html_content):
+    """Returns the local image filenames (images/...) referenced by some HTML, in document order."""
+    if not html_content:
+        return []
+    soup = bs4.BeautifulSoup(html_content, 'html.parser')
+    return get_tree_image_references(soup)
+
+
+def get_tree_image_references(root):
+    """Returns the local image filenames (images/...) referenced inside a parsed tree, in document order."""
+    image_refs = []
+    for img in root.find_all('img'):
+        src = img.get('src', '')
+        if src.startswith('images/'):
+            image_refs.append(src.replace('images/', ''))
+    return list(dict.fromkeys(image_refs))
+
+
+def get_post_images(post):
+    """Returns a post's image index, parsing its content only for posts without one."""
+    if 'images' in post:
+        return post['images']
+    return get_image_references(post.get('content', ''))
+
+
+def transform_html(html_content, passes, parser=None):
+    """
+    Parses html_content once, applies each pass to the same tree and serializes once.
+    Returns the content unchanged when there are no passes to apply.
+    Markup the parser fails on is normalized like in clean_html_for_epub and parsed again,
+    but errors in a pass propagate, so no pass (removing images, say) is ever skipped.
+    """
+    if not html_content or not passes:
+        return html_content or ""
+
+    parser = parser or HTML_PARSER
+    try:
+        soup = bs4.BeautifulSoup(html_content, parser)
+    except Exception as e:
+        print(f"Error parsing HTML with {parser}: {e}")
+        soup = bs4.BeautifulSoup(get_fallback_html(html_content, e), 'html.parser')
+
+    for transform_pass in passes:
+        transform_pass(soup)
     return str(soup)
 
 
+def get_fallback_html(html_content, error):
+    """Normalizes HTML that couldn't be cleaned (error) with lxml, or reports the error as the content."""
+    try:
+        # Try lxml as a fallback
+        doc = lxml.html.fromstring(html_content)
+        # Convert back to string, which can help normalize HTML
+        clean_html = lxml.html.tostring(doc, encoding='unicode')
+        return clean_html
+    except Exception as e2:
+        print(f"Error during fallback HTML cleaning: {e2}")
+
+        # Last resort: basic entity escaping
+        return f"<p>Content could not be properly formatted. Error: {html.escape(str(error))}</p>"
+
+
+def clean_html_for_epub(html_content):
+    """Clean HTML content to ensure it's valid for EPUB."""
+    if not html_content:
+        return ""
+
+    # First, try the --parser backend (lxml by default, html5lib is the most forgiving);
+    # if that fails, normalize with lxml.html, and as a last resort report the error
+    try:
+        soup = bs4.BeautifulSoup(html_content, HTML_PARSER)
+        epub_cleanup_pass(soup)
+
+        # Return the cleaned HTML
+        return str(soup)
+
+    except Exception as e:
+        print(f"Error during HTML cleaning with {HTML_PARSER}: {e}")
+
+        # Fall back to more aggressive cleaning
+        return get_fallback_html(html_content, e)
+
+
+def clean_html_for_kindle_compatibility(html_content):
+    """Clean HTML to ensure it's compatible with Kindle devices."""
+    if not html_content:
+        return ""
+
+    return transform_html(html_content, [kindle_cleanup_pass], 'html.parser')
+
+
 def get_image_mimetype(image_url):
     """Determine the mimetype of an image based on its URL or extension."""
     # First, try to use the file extension
@@ -414,83 +1100,193 @@ def validate_image(img_path):
                 # Try to load image data - this can sometimes work when verify() fails
                 img.load()
             return True
+        except MemoryError:
+            # Not a sign of a broken file
+            raise
         except Exception as e:
             print(f"Invalid image file {os.path.basename(img_path)}: {e}")
             return False
 
 
-def download_image(image_url, images_dir=IMAGES_DIR):
-    """Download an image with retry logic and return its local filename."""
+def get_image_filename(image_url):
+    """
+    Returns the deterministic local filename for an image URL,
+    or None if the URL path has no usable file name.
+    """
+    basename = os.path.basename(urlparse(image_url).path)
+    image_name = sanitize_filename(basename)
+    if not basename or image_name == '_':
+        return None
+
+    # Use the hash of the URL as part of the filename to ensure uniqueness
+    url_hash = url_to_cache_key(image_url)[:12]  # Take first 12 chars of hash
+    return f"{url_hash}_{image_name}"
+
+
+def get_image_meta(image_name):
+    """Returns the stored download metadata (url, timestamp, validators) of a cached image, or None."""
+    meta_path = os.path.join(IMAGE_META_DIR, f"{image_name}.json")
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error reading image metadata for {image_name}: {e}")
+        return None
+
+
+def write_image_meta(image_name, image_url, validators):
+    """Stores the download time and ETag/Last-Modified validators of a cached image."""
+    if not os.path.exists(IMAGE_META_DIR):
+        os.makedirs(IMAGE_META_DIR, exist_ok=True)
+
+    meta = {'url': image_url, 'timestamp': time.time()}
+    meta.update(validators)
+    meta_path = os.path.join(IMAGE_META_DIR, f"{image_name}.json")
+    temp_path = f"{meta_path}.{threading.get_ident()}.part"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(temp_path, meta_path)
+
+
+def save_image_response(response, local_path):
+    """
+    Streams an image response to disk, through a temporary file so concurrent readers never see partial images.
+    Returns the number of bytes written.
+    """
+    temp_path = f"{local_path}.{threading.get_ident()}.part"
+    size = 0
+    with open(temp_path, 'wb') as f:
+        for chunk in response.iter_content(1024):
+            f.write(chunk)
+            size += len(chunk)
+    os.replace(temp_path, local_path)
+    return size
+
+
+def revalidate_image(image_url, image_name, local_path, max_age_days):
+    """Revalidates an expired cached image with a conditional request, replacing it only if it changed."""
+    meta = get_image_meta(image_name)
+    if not meta:
+        return  # Downloaded before validators were recorded, keep it as is
+
+    cache_age = (time.time() - meta['timestamp']) / (60 * 60 * 24)  # in days
+    headers = get_conditional_headers(meta)
+    if cache_age <= max_age_days or not headers:
+        return
+
+    try:
+        start = time.perf_counter()
+        with profile_stage('image_download'), \
+                get_http_session().get(image_url, headers=headers, stream=True, timeout=30) as response:
+            size = 0
+            if response.status_code == 304:
+                print(f"Image not modified: {image_name}")
+                validators = {key: meta[key] for key in [
+                    'etag', 'last_modified'] if key in meta}
+                validators.update(get_response_validators(response.headers))
+                write_image_meta(image_name, image_url, validators)
+            elif response.status_code == 200:
+                size = save_image_response(response, local_path)
+                write_image_meta(image_name, image_url,
+                                 get_response_validators(response.headers))
+                print(f"Updated changed image: {image_name}")
+            else:
+                print(
+                    f"Could not revalidate image {image_name}: HTTP {response.status_code}")
+        record_request('GET', image_url, response.status_code,
+                       time.perf_counter() - start, size)
+    except Exception as e:
+        # Keep using the cached copy if the server can't be reached
+        print(f"Error revalidating image {image_url}: {e}")
+
+
+def download_image(image_url, images_dir=IMAGES_DIR, max_cache_age=0):
+    """
+    Download an image with retry logic and return its local filename.
+    Cached images older than max_cache_age days (0 = never) are revalidated with a conditional request.
+    """
     # Skip data URLs and problematic URLs
     if image_url.startswith('data:'):
         return None
 
     # Skip URLs that typically fail or aren't needed
-    if any(domain in image_url for domain in [
-        'amazon-adsystem.com',
-        'googleadservices.com',
-        'doubleclick.net',
-        'analytics.com',
-    ]):
+    if any(domain in image_url for domain in SKIPPED_IMAGE_DOMAINS):
         print(f"Skipping known problematic URL: {image_url}")
         return create_error_image_entry(image_url, "Skipped ad/tracking image URL")
 
     if not os.path.exists(images_dir):
         os.makedirs(images_dir)
 
-    # Extract the filename from the URL and sanitize it
-    parsed_url = urlparse(image_url)
-    image_name = sanitize_filename(os.path.basename(parsed_url.path))
-
-    # If no valid filename, generate one
-    if not image_name or image_name == '_':
-        # Generate a unique filename based on the URL hash
-        url_hash = hash(image_url) % 100000
-        image_name = f"image_{url_hash}_{int(time.time())}_{random.randint(1000, 9999)}"
-
-        # Try to add an extension based on Content-Type
-        mime_type = get_image_mimetype(image_url)
-        if mime_type == 'image/jpeg':
-            image_name += '.jpg'
-        elif mime_type == 'image/png':
-            image_name += '.png'
-        elif mime_type == 'image/gif':
-            image_name += '.gif'
-        elif mime_type == 'image/svg+xml':
-            image_name += '.svg'
-        else:
-            image_name += '.jpg'  # Default extension
-
     # First check if we already have a cached version
-    # Use the hash of the URL as part of the filename to ensure uniqueness
-    url_hash = url_to_cache_key(image_url)[:12]  # Take first 12 chars of hash
-    hashed_image_name = f"{url_hash}_{image_name}"
+    hashed_image_name = get_image_filename(image_url)
+
+    if not hashed_image_name:
+        # Extract the filename from the URL and sanitize it
+        parsed_url = urlparse(image_url)
+        image_name = sanitize_filename(os.path.basename(parsed_url.path))
+
+        # If no valid filename, generate one
+        if not image_name or image_name == '_':
+            # Generate a unique filename based on the URL hash
+            url_hash = hash(image_url) % 100000
+            image_name = f"image_{url_hash}_{int(time.time())}_{random.randint(1000, 9999)}"
+
+            # Try to add an extension based on Content-Type
+            mime_type = get_image_mimetype(image_url)
+            if mime_type == 'image/jpeg':
+                image_name += '.jpg'
+            elif mime_type == 'image/png':
+                image_name += '.png'
+            elif mime_type == 'image/gif':
+                image_name += '.gif'
+            elif mime_type == 'image/svg+xml':
+                image_name += '.svg'
+            else:
+                image_name += '.jpg'  # Default extension
+
+        # Use the hash of the URL as part of the filename to ensure uniqueness
+        url_hash = url_to_cache_key(image_url)[:12]  # Take first 12 chars of hash
+        hashed_image_name = f"{url_hash}_{image_name}"
+
     local_path = os.path.join(images_dir, hashed_image_name)
 
     # If the file was already downloaded, just return the name
     if os.path.exists(local_path):
+        record_cache('images', True)
+        mark_cache_access(local_path)
+        if max_cache_age > 0:
+            revalidate_image(image_url, hashed_image_name,
+                             local_path, max_cache_age)
         print(f"Using cached image: {hashed_image_name}")
         return hashed_image_name
+    record_cache('images', False)
 
     error_message = None
 
     # Try to download the image with retries
     for attempt in range(MAX_RETRIES):
         try:
-            headers = {'User-Agent': USER_AGENT}
-            response = requests.get(
-                image_url, headers=headers, stream=True, timeout=30)
-
-            if response.status_code == 200:
-                with open(local_path, 'wb') as f:
-                    for chunk in response.iter_content(1024):
-                        f.write(chunk)
-                print(f"Downloaded image: {hashed_image_name}")
-                return hashed_image_name
-            else:
-                error_message = f"HTTP {response.status_code}"
-                print(
-                    f"Attempt {attempt+1}/{MAX_RETRIES} failed: {error_message}")
+            start = time.perf_counter()
+            with profile_stage('image_download'), \
+                    get_http_session().get(image_url, stream=True, timeout=30) as response:
+                if response.status_code == 200:
+                    size = save_image_response(response, local_path)
+                    record_request('GET', image_url, 200,
+                                   time.perf_counter() - start, size)
+                    validators = get_response_validators(response.headers)
+                    if validators:
+                        write_image_meta(
+                            hashed_image_name, image_url, validators)
+                    print(f"Downloaded image: {hashed_image_name}")
+                    return hashed_image_name
+                else:
+                    record_request('GET', image_url, response.status_code,
+                                   time.perf_counter() - start, 0)
+                    error_message = f"HTTP {response.status_code}"
+                    print(
+                        f"Attempt {attempt+1}/{MAX_RETRIES} failed: {error_message}")
 
         except Exception as e:
             error_message = str(e)
@@ -505,6 +1301,19 @@ def download_image(image_url, images_dir=IMAGES_DIR):
     return create_error_image_entry(image_url, error_message)
 
 
+def download_images(image_urls, max_workers=IMAGE_DOWNLOAD_WORKERS, max_cache_age=0):
+    """Downloads several images concurrently and returns a dict mapping each URL to its local filename."""
+    unique_urls = list(dict.fromkeys(image_urls))
+    if max_workers > 1 and len(unique_urls) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_urls))) as executor:
+            local_names = list(executor.map(download_image, unique_urls,
+                                            repeat(IMAGES_DIR), repeat(max_cache_age)))
+    else:
+        local_names = [download_image(url, IMAGES_DIR, max_cache_age)
+                       for url in unique_urls]
+    return dict(zip(unique_urls, local_names))
+
+
 def create_error_image_entry(image_url, error_message):
     """Create a placeholder image for a failed download and return its filename."""
     # Generate a unique name based on the URL
@@ -522,139 +1331,283 @@ def create_error_image_entry(image_url, error_message):
         error_text = f"Image could not be loaded\n{display_url}\nError: {error_message}"
         placeholder_img_data = create_placeholder_image(error_text)
 
-        with open(error_image_path, 'wb') as f:
+        temp_path = f"{error_image_path}.{threading.get_ident()}.part"
+        with open(temp_path, 'wb') as f:
             f.write(placeholder_img_data)
+        os.replace(temp_path, error_image_path)
 
         print(f"Created placeholder for failed image: {error_image_name}")
 
     return error_image_name
 
 
-def optimize_image_for_epub(source_path, max_width=800, jpeg_quality=75, png_compression=9, max_size_mb=5.0):
+def encode_image_for_epub(source_path, max_width=800, jpeg_quality=75, png_compression=9, max_size_mb=5.0):
     """
-    Creates an optimized copy of an image specifically for EPUB inclusion.
-    Returns the optimized image data as bytes or None if image should be excluded.
+    Does the work of optimize_image_for_epub, but raises errors instead of excluding the image,
+    so get_optimized_image only caches exclusions that the size and validation limits decided.
     """
-    try:
-        # Check file size before processing
-        file_size_mb = os.path.getsize(
-            source_path) / (1024 * 1024)  # Convert to MB
-        if file_size_mb > max_size_mb:
-            print(
-                f"Excluding large image ({file_size_mb:.2f} MB): {os.path.basename(source_path)}")
-            return None, None
-
-        # Validate the image before processing
-        if not validate_image(source_path):
-            print(f"Excluding invalid image: {os.path.basename(source_path)}")
-            return None, None
-
-        # Get the file extension to determine image type
-        file_ext = os.path.splitext(source_path)[1].lower()
+    # Check file size before processing
+    file_size_mb = os.path.getsize(
+        source_path) / (1024 * 1024)  # Convert to MB
+    if file_size_mb > max_size_mb:
+        print(
+            f"Excluding large image ({file_size_mb:.2f} MB): {os.path.basename(source_path)}")
+        return None, None
 
-        # For SVG files, convert to PNG for Kindle compatibility
-        if file_ext == '.svg':
-            try:
-                # Return the original SVG which won't work on Kindle
-                print(
-                    f"Warning: SVG files not fully supported on all readers: {os.path.basename(source_path)}")
-                with open(source_path, 'rb') as f:
-                    return f.read(), 'image/svg+xml'
-            except Exception as e:
-                print(
-                    f"Error processing SVG {os.path.basename(source_path)}: {e}")
-                return None, None
+    # Validate the image before processing
+    if not validate_image(source_path):
+        print(f"Excluding invalid image: {os.path.basename(source_path)}")
+        return None, None
 
-        # For GIF files, check if they're too large
-        if file_ext == '.gif':
-            with open(source_path, 'rb') as f:
-                content = f.read()
-                if len(content) > max_size_mb * 1024 * 1024:
-                    print(
-                        f"GIF exceeds size limit: {os.path.basename(source_path)}")
-                    return None, None
-                return content, 'image/gif'
-
-        # For JPEG, PNG, and WEBP files, optimize
-        if file_ext in ['.jpg', '.jpeg', '.png', '.webp']:
-            img = Image.open(source_path)
-
-            # Convert RGBA to RGB if needed (for JPEGs)
-            if img.mode == 'RGBA' and file_ext in ['.jpg', '.jpeg']:
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[3])  # Use alpha as mask
-                img = background
-
-            # Resize if larger than max_width
-            if img.width > max_width:
-                ratio = max_width / img.width
-                new_height = int(img.height * ratio)
-                try:
-                    # For Pillow >= 9.1.0
-                    img = img.resize((max_width, new_height),
-                                     Image.Resampling.LANCZOS)
-                except AttributeError:
-                    # For older Pillow
-                    img = img.resize((max_width, new_height), Image.LANCZOS)
-
-            # Save to bytes IO
-            output = BytesIO()
-
-            if file_ext in ['.jpg', '.jpeg']:
-                img.save(output, format='JPEG',
-                         optimize=True, quality=jpeg_quality)
-                mime_type = 'image/jpeg'
-            elif file_ext == '.webp':
-                # Convert WEBP to JPEG for better compatibility
-                img.save(output, format='JPEG',
-                         optimize=True, quality=jpeg_quality)
-                mime_type = 'image/jpeg'
-            elif file_ext == '.png':
-                img.save(output, format='PNG', optimize=True,
-                         compress_level=png_compression)
-                mime_type = 'image/png'
-
-            output.seek(0)
-            result = output.getvalue()
-
-            # Check if the optimized image is still too large
-            if len(result) > max_size_mb * 1024 * 1024:
-                print(
-                    f"Optimized image still too large ({len(result)/(1024*1024):.2f} MB): {os.path.basename(source_path)}")
-                return None, None
+    # Get the file extension to determine image type
+    file_ext = os.path.splitext(source_path)[1].lower()
 
-            return result, mime_type
+    # For SVG files, convert to PNG for Kindle compatibility
+    if file_ext == '.svg':
+        # Return the original SVG which won't work on Kindle
+        print(
+            f"Warning: SVG files not fully supported on all readers: {os.path.basename(source_path)}")
+        with open(source_path, 'rb') as f:
+            return f.read(), 'image/svg+xml'
 
-        # For unsupported formats, return original if not too large
+    # For GIF files, check if they're too large
+    if file_ext == '.gif':
         with open(source_path, 'rb') as f:
             content = f.read()
             if len(content) > max_size_mb * 1024 * 1024:
                 print(
-                    f"Unsupported image format too large: {os.path.basename(source_path)}")
+                    f"GIF exceeds size limit: {os.path.basename(source_path)}")
                 return None, None
-            return content, mimetypes.guess_type(source_path)[0] or 'application/octet-stream'
+            return content, 'image/gif'
+
+    # For JPEG, PNG, and WEBP files, optimize
+    if file_ext in ['.jpg', '.jpeg', '.png', '.webp']:
+        img = Image.open(source_path)
+
+        # Convert RGBA to RGB if needed (for JPEGs)
+        if img.mode == 'RGBA' and file_ext in ['.jpg', '.jpeg']:
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[3])  # Use alpha as mask
+            img = background
+
+        # Resize if larger than max_width
+        if img.width > max_width:
+            ratio = max_width / img.width
+            new_height = int(img.height * ratio)
+            try:
+                # For Pillow >= 9.1.0
+                img = img.resize((max_width, new_height),
+                                 Image.Resampling.LANCZOS)
+            except AttributeError:
+                # For older Pillow
+                img = img.resize((max_width, new_height), Image.LANCZOS)
+
+        # Save to bytes IO
+        output = BytesIO()
+
+        if file_ext in ['.jpg', '.jpeg']:
+            img.save(output, format='JPEG',
+                     optimize=True, quality=jpeg_quality)
+            mime_type = 'image/jpeg'
+        elif file_ext == '.webp':
+            # Convert WEBP to JPEG for better compatibility
+            img.save(output, format='JPEG',
+                     optimize=True, quality=jpeg_quality)
+            mime_type = 'image/jpeg'
+        elif file_ext == '.png':
+            img.save(output, format='PNG', optimize=True,
+                     compress_level=png_compression)
+            mime_type = 'image/png'
+
+        output.seek(0)
+        result = output.getvalue()
+
+        # Check if the optimized image is still too large
+        if len(result) > max_size_mb * 1024 * 1024:
+            print(
+                f"Optimized image still too large ({len(result)/(1024*1024):.2f} MB): {os.path.basename(source_path)}")
+            return None, None
+
+        return result, mime_type
+
+    # For unsupported formats, return original if not too large
+    with open(source_path, 'rb') as f:
+        content = f.read()
+        if len(content) > max_size_mb * 1024 * 1024:
+            print(
+                f"Unsupported image format too large: {os.path.basename(source_path)}")
+            return None, None
+        return content, mimetypes.guess_type(source_path)[0] or 'application/octet-stream'
+
 
+def optimize_image_for_epub(source_path, max_width=800, jpeg_quality=75, png_compression=9, max_size_mb=5.0):
+    """
+    Creates an optimized copy of an image specifically for EPUB inclusion.
+    Returns the optimized image data as bytes or None if image should be excluded.
+    """
+    try:
+        return encode_image_for_epub(source_path, max_width, jpeg_quality, png_compression, max_size_mb)
     except Exception as e:
         print(f"Error optimizing image {os.path.basename(source_path)}: {e}")
         return None, None
 
 
-def format_date(date_str):
-    """Format a date string in a consistent way."""
-    if not date_str:
-        return "Unknown date"
+def get_derivative_settings(max_width=800, jpeg_quality=75, png_compression=9, max_size_mb=5.0,
+                            kindle_compatible=False):
+    """Returns the part of a derivative cache key that stands for the encode settings."""
+    mode = 'kindle' if kindle_compatible else 'epub'
+    return f"w{max_width}_q{jpeg_quality}_c{png_compression}_s{max_size_mb}_{mode}"
 
-    try:
-        # Parse ISO format date
-        dt = datetime.datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-        # Format as "Month Day, Year"
+
+def get_derivative_cache_key(source_path, max_width=800, jpeg_quality=75, png_compression=9, max_size_mb=5.0,
+                             kindle_compatible=False):
+    """Builds the derivative cache key from the image content hash and the encode settings."""
+    hasher = hashlib.sha256()
+    with open(source_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(chunk)
+
+    settings = get_derivative_settings(max_width, jpeg_quality, png_compression, max_size_mb,
+                                       kindle_compatible)
+    return f"{hasher.hexdigest()}_{settings}"
+
+
+def cache_derivative(cache_key, content, media_type):
+    """Stores an optimized image (or the decision to exclude it, when content is None)."""
+    data_path = os.path.join(DERIVATIVE_CACHE_DIR, f"{cache_key}.bin")
+    meta_path = os.path.join(DERIVATIVE_CACHE_DIR, f"{cache_key}.json")
+
+    if not os.path.exists(DERIVATIVE_CACHE_DIR):
+        os.makedirs(DERIVATIVE_CACHE_DIR, exist_ok=True)
+
+    # Write through temporary files, several processes may store the same image
+    temp_suffix = f".{os.getpid()}.{threading.get_ident()}.part"
+    if content is not None:
+        with open(data_path + temp_suffix, 'wb') as f:
+            f.write(content)
+        os.replace(data_path + temp_suffix, data_path)
+
+    # The metadata is written last so a readable entry always has its data
+    with open(meta_path + temp_suffix, 'w', encoding='utf-8') as f:
+        json.dump({'media_type': media_type,
+                  'excluded': content is None}, f)
+    os.replace(meta_path + temp_suffix, meta_path)
+
+
+def get_cached_derivative(cache_key, as_path=False):
+    """
+    Returns (found, content, media_type) for a derivative cache entry.
+    Excluded images are found with content and media_type set to None.
+    With as_path, content is the path of the cached file instead of its bytes.
+    """
+    meta_path = os.path.join(DERIVATIVE_CACHE_DIR, f"{cache_key}.json")
+    if not os.path.exists(meta_path):
+        return False, None, None
+
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('excluded'):
+            mark_cache_access(meta_path)
+            return True, None, None
+
+        data_path = os.path.join(DERIVATIVE_CACHE_DIR, f"{cache_key}.bin")
+        if as_path:
+            if not os.path.isfile(data_path):
+                return False, None, None
+            content = data_path
+        else:
+            with open(data_path, 'rb') as f:
+                content = f.read()
+        mark_cache_access(meta_path, data_path)
+        return True, content, meta['media_type']
+    except Exception as e:
+        print(f"Error reading derivative cache {cache_key}: {e}")
+        return False, None, None
+
+
+def get_optimized_image(source_path, max_width=800, jpeg_quality=75, png_compression=9, max_size_mb=5.0,
+                        kindle_compatible=False, as_path=False):
+    """
+    Returns the optimize_image_for_epub result for an image, reusing the derivative
+    cache when the same image was already optimized with the same settings.
+    Images that fail to optimize are excluded from this build only, not cached as excluded.
+    With as_path, content is the path of the derivative cache file when there is one,
+    so the caller can stream it instead of holding it in memory.
+    """
+    try:
+        cache_key = get_derivative_cache_key(source_path, max_width, jpeg_quality, png_compression,
+                                             max_size_mb, kindle_compatible)
+    except OSError as e:
+        print(f"Error reading image {os.path.basename(source_path)}: {e}")
+        return None, None
+
+    mark_cache_access(source_path)
+    found, content, media_type = get_cached_derivative(cache_key, as_path)
+    record_cache('derivatives', found)
+    if found:
+        return content, media_type
+
+    try:
+        with profile_stage('image_optimize'):
+            content, media_type = encode_image_for_epub(
+                source_path, max_width, jpeg_quality, png_compression, max_size_mb)
+    except Exception as e:
+        # Failures such as running out of memory may not happen next time, so they aren't cached
+        print(f"Error optimizing image {os.path.basename(source_path)}: {e}")
+        return None, None
+
+    try:
+        cache_derivative(cache_key, content, media_type)
+    except OSError as e:
+        print(
+            f"Error caching optimized image {os.path.basename(source_path)}: {e}")
+        return content, media_type
+
+    if as_path and content is not None:
+        return os.path.join(DERIVATIVE_CACHE_DIR, f"{cache_key}.bin"), media_type
+    return content, media_type
+
+
+def optimize_images(image_paths, max_width=800, jpeg_quality=75, png_compression=9, max_size_mb=5.0,
+                    kindle_compatible=False, workers=DEFAULT_IMAGE_WORKERS, as_path=False):
+    """
+    Runs get_optimized_image over several images, spread across a process pool when workers > 1.
+    Returns a list of (content, media_type) tuples in the same order as image_paths.
+    """
+    if workers > 1 and len(image_paths) > 1:
+        workers = min(workers, len(image_paths))
+        print(f"Optimizing {len(image_paths)} images with {workers} processes...")
+        # Hand out several images per task to keep inter-process overhead low
+        chunksize = max(1, len(image_paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(get_optimized_image, image_paths, repeat(max_width),
+                                     repeat(jpeg_quality), repeat(
+                                         png_compression), repeat(max_size_mb),
+                                     repeat(kindle_compatible), repeat(as_path), chunksize=chunksize))
+
+    return [get_optimized_image(path, max_width, jpeg_quality, png_compression, max_size_mb, kindle_compatible,
+                                as_path)
+            for path in image_paths]
+
+
+def format_date(date_str):
+    """Format a date string in a consistent way."""
+    if not date_str:
+        return "Unknown date"
+
+    try:
+        # Parse ISO format date
+        dt = datetime.datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+        # Format as "Month Day, Year"
         return dt.strftime("%B %d, %Y")
     except Exception as e:
         # Return the original if parsing fails
         return date_str
 
 
-def get_post_content(post_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS):
+def get_post_content(post_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS,
+                     image_workers=IMAGE_DOWNLOAD_WORKERS):
     """
     Fetches a single post and extracts its title, author, date, and content.
     Returns a dictionary with all post details or None.
@@ -665,10 +1618,29 @@ def get_post_content(post_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS):
     # Check cache first if enabled
     if use_cache:
         cached_post = get_cached_post_data(post_url, max_cache_age)
+        record_cache('posts', bool(cached_post))
         if cached_post:
             print(f"Using cached version of post: {post_url}")
             return cached_post
 
+    with profile_stage('extract'):
+        if CONTENT_BACKEND == "graphql":
+            post_data = get_post_content_from_graphql(
+                post_url, use_cache, max_cache_age, image_workers)
+        else:
+            post_data = get_post_content_from_page(
+                post_url, use_cache, max_cache_age, image_workers)
+
+    # Cache the post data for future use
+    if post_data and use_cache:
+        cache_post_data(post_url, post_data)
+
+    return post_data
+
+
+def get_post_content_from_page(post_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS,
+                               image_workers=IMAGE_DOWNLOAD_WORKERS):
+    """Extracts a post's details from its server-rendered page."""
     soup = make_soup(post_url, use_cache, max_cache_age)
     if not soup:
         return None
@@ -743,15 +1715,27 @@ def get_post_content(post_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS):
         if not title_text.strip():
             title_text = f"Untitled Post ({post_url.split('/')[-1] if post_url else 'Unknown URL'})"
 
+    if not content_div_to_render:
+        print(f"Could not find content_div_to_render for {post_url}.")
+
+    return render_post_data(soup, content_div_to_render, post_url, title_text, author, date_str,
+                            use_cache, max_cache_age, image_workers)
+
+
+def render_post_data(soup, content_div_to_render, post_url, title_text, author, date_str, use_cache=True,
+                     max_cache_age=CACHE_EXPIRY_DAYS, image_workers=IMAGE_DOWNLOAD_WORKERS):
+    """
+    Turns a post's body (content_div_to_render, inside soup) and its details into the post data dict:
+    downloads and relinks the images, cleans the markup for EPUB and adds the post header.
+    """
     # Clean up any extra spaces in title
     title_text = re.sub(r'\s+', ' ', title_text).strip()
     escaped_title = html.escape(title_text)
 
     # --- Content rendering ---
     rendered_html_part = ""
-    if not content_div_to_render:
-        print(f"Could not find content_div_to_render for {post_url}.")
-    else:
+    image_refs = []
+    if content_div_to_render:
         # Clean up common UI elements from the content before stringifying
         selectors_to_remove = [
             'div.commentOnSelection', '.AudioToggle-audioIcon', '.VoteArrowIconSolid-root',
@@ -762,13 +1746,19 @@ def get_post_content(post_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS):
             for element_to_remove in content_div_to_render.select(selector):
                 element_to_remove.decompose()
 
-        # Process and download images
-        for img_tag in content_div_to_render.find_all('img'):
+        # Download all images of the post concurrently before rewriting any tags
+        img_tags = content_div_to_render.find_all('img')
+        svg_tags = content_div_to_render.find_all('svg')
+        image_urls = [urljoin(post_url, tag['src'])
+                      for tag in img_tags + svg_tags if tag.get('src')]
+        local_image_names = download_images(image_urls, image_workers,
+                                            max_cache_age if use_cache else 0)
+
+        # Point images at the downloaded files
+        for img_tag in img_tags:
             if img_tag.get('src'):
                 img_url = urljoin(post_url, img_tag['src'])
-
-                # Download the image
-                local_img_name = download_image(img_url)
+                local_img_name = local_image_names[img_url]
 
                 if local_img_name:
                     # Update the src to point to the local file
@@ -793,11 +1783,11 @@ def get_post_content(post_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS):
                 noscript_parent.replace_with(img_tag)
 
         # Process SVG elements
-        for svg_tag in content_div_to_render.find_all('svg'):
+        for svg_tag in svg_tags:
             # Convert SVG to img if possible, or ensure it has proper namespaces
             if svg_tag.get('src'):
                 img_url = urljoin(post_url, svg_tag['src'])
-                local_svg_name = download_image(img_url)
+                local_svg_name = local_image_names[img_url]
 
                 # Create a new img tag to replace the svg
                 new_img = soup.new_tag('img')
@@ -819,6 +1809,15 @@ def get_post_content(post_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS):
         for s_tag in content_div_to_render.select('script, style, noscript'):
             s_tag.decompose()
 
+        # Clean HTML to make it valid for EPUB on the tree we already have,
+        # rather than serializing and parsing the whole post again
+        cleanup_error = None
+        try:
+            epub_cleanup_pass(soup, content_div_to_render)
+        except Exception as e:
+            print(f"Error during HTML cleaning for {post_url}: {e}")
+            cleanup_error = e
+
         try:
             rendered_html_part = str(content_div_to_render)
         except Exception as e_str:
@@ -826,6 +1825,15 @@ def get_post_content(post_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS):
                 f"Error stringifying content_div_to_render for {post_url}: {e_str}")
             rendered_html_part = "<p>Error: Could not render content due to stringification error.</p>"
 
+        # Index the local images so create_epub doesn't have to parse the content
+        if cleanup_error is None:
+            image_refs = get_tree_image_references(content_div_to_render)
+        else:
+            # Fall back like clean_html_for_epub
+            rendered_html_part = get_fallback_html(
+                rendered_html_part, cleanup_error)
+            image_refs = get_image_references(rendered_html_part)
+
     # --- Create the post header with title, author, date and link ---
     post_header = f"""<h1>{escaped_title}</h1>
     <div class="post-metadata">
@@ -848,10 +1856,7 @@ def get_post_content(post_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS):
         post_body_html = f"{post_header}{rendered_html_part}"
 
     # Ensure 'content' is never None and always a string
-    final_content_for_body = post_body_html if post_body_html is not None else f"{post_header}<p>Fallback: Content was None.</p>"
-
-    # Clean HTML to make it valid for EPUB
-    cleaned_content = clean_html_for_epub(final_content_for_body)
+    cleaned_content = post_body_html if post_body_html is not None else f"{post_header}<p>Fallback: Content was None.</p>"
 
     # Prepare final post data
     post_data = {
@@ -859,16 +1864,205 @@ def get_post_content(post_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS):
         'content': cleaned_content,
         'url': post_url,
         'author': author,
-        'date': date_str
+        'date': date_str,
+        'images': image_refs
     }
 
-    # Cache the post data for future use
-    if use_cache:
-        cache_post_data(post_url, post_data)
-
     return post_data
 
 
+def extract_post_id(url):
+    """Returns the post _id in a /posts/<id>/... or /s/<sequence>/p/<id> URL, or None."""
+    match = re.search(r'/(?:posts|p)/([A-Za-z0-9]+)', urlparse(url).path)
+    return match.group(1) if match else None
+
+
+def extract_sequence_id(url):
+    """Returns the sequence _id in a /s/<id> URL, or None."""
+    match = re.search(r'/s/([A-Za-z0-9]+)', urlparse(url).path)
+    return match.group(1) if match else None
+
+
+def get_graphql_cache_url(query, variables):
+    """Returns the URL a GraphQL response is cached under, naming the query and its variables."""
+    query_hash = hashlib.sha256(query.encode('utf-8')).hexdigest()[:16]
+    return f"{GRAPHQL_URL}?{urlencode(dict(variables, query=query_hash))}"
+
+
+def graphql_request(query, variables, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS, timeout=30):
+    """
+    Runs a query against GRAPHQL_URL and returns its 'data', or None on failure, including
+    responses reporting errors for part of the query.
+    Responses are kept in the page cache under get_graphql_cache_url().
+    """
+    cache_url = get_graphql_cache_url(query, variables)
+
+    # Responses fetched ahead of time in a batch are used only once
+    content = _prefetched_pages.pop(cache_url, None)
+    if content is None and use_cache:
+        content = get_cached_page(cache_url, max_cache_age)
+        record_cache('pages', bool(content))
+    fetched = not content
+    if not fetched:
+        print(f"Using cached GraphQL response: {cache_url}")
+    else:
+        print(f"Querying GraphQL: {cache_url}")
+        try:
+            wait_for_rate_limit()
+            response = timed_request('POST', GRAPHQL_URL, label=cache_url,
+                                     json={'query': query, 'variables': variables}, timeout=timeout)
+            response.raise_for_status()
+            content = response.content
+        except requests.exceptions.RequestException as e:
+            print(f"Error querying {GRAPHQL_URL}: {e}")
+            return None
+
+    try:
+        payload = json.loads(content)
+    except ValueError as e:
+        print(f"Invalid GraphQL response for {cache_url}: {e}")
+        return None
+    if payload.get('errors') or not payload.get('data'):
+        print(
+            f"GraphQL errors for {cache_url}: {payload.get('errors') or 'no data'}")
+        return None
+
+    if use_cache and fetched:
+        cache_page(cache_url, content)
+    return payload['data']
+
+
+POST_FIELDS = "_id title slug postedAt user { displayName } contents { html }"
+
+POST_QUERY = """
+query Post($id: String) {
+  post(input: {selector: {_id: $id}}) {
+    result { %s }
+  }
+}
+""" % POST_FIELDS
+
+SEQUENCE_QUERY = """
+query Sequence($id: String) {
+  sequence(input: {selector: {_id: $id}}) {
+    result { _id title chapters { posts { _id slug } } }
+  }
+}
+"""
+
+
+def prefetch_posts_graphql(post_urls, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS,
+                           batch_size=DEFAULT_GRAPHQL_BATCH_SIZE):
+    """
+    Fetches the posts behind post_urls from the GraphQL API, batch_size per request, and stores
+    each one as the response of its single-post query (in the page cache, or an in-memory store
+    when caching is off). get_post_content then renders them without further round trips.
+    Posts with fresh post data or a fresh cached response are not requested. Nothing is stored
+    from a batch whose response reports errors; get_post_content queries its posts one by one.
+    """
+    post_ids = []
+    for url in post_urls:
+        url = url if url.startswith('http') else urljoin(BASE_URL, url)
+        post_id = extract_post_id(url)
+        if not post_id:
+            continue
+        if use_cache and (get_cached_post_data(url, max_cache_age) or
+                          get_cached_page(get_graphql_cache_url(POST_QUERY, {'id': post_id}), max_cache_age)):
+            continue
+        post_ids.append(post_id)
+    post_ids = list(dict.fromkeys(post_ids))
+
+    if not post_ids:
+        return
+    print(
+        f"Fetching {len(post_ids)} posts from GraphQL in batches of {batch_size}...")
+
+    for start in range(0, len(post_ids), batch_size):
+        batch = post_ids[start:start + batch_size]
+        # One aliased post field per id, all in a single request
+        query = "query Posts(%s) {\n%s}\n" % (
+            ", ".join(f"$id{i}: String" for i in range(len(batch))),
+            "".join(f"  p{i}: post(input: {{selector: {{_id: $id{i}}}}}) {{\n    result {{ {POST_FIELDS} }}\n  }}\n"
+                    for i in range(len(batch))))
+        variables = {f"id{i}": post_id for i, post_id in enumerate(batch)}
+
+        print(f"Querying GraphQL for posts {start + 1}-{start + len(batch)}")
+        # The batch isn't cached as a whole, each post is stored under its single-post query below
+        data = graphql_request(query, variables, use_cache=False, timeout=60)
+        if data is None:
+            # The posts are fetched one by one by get_post_content instead
+            print("Batch failed, its posts will be queried one by one.")
+            continue
+
+        for i, post_id in enumerate(batch):
+            result = (data.get(f"p{i}") or {}).get('result')
+            if not result:
+                continue
+            content = json.dumps({'data': {'post': {'result': result}}},
+                                 ensure_ascii=False).encode('utf-8')
+            cache_url = get_graphql_cache_url(POST_QUERY, {'id': post_id})
+            if use_cache:
+                cache_page(cache_url, content)
+            else:
+                _prefetched_pages[cache_url] = content
+
+
+def get_post_content_from_graphql(post_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS,
+                                  image_workers=IMAGE_DOWNLOAD_WORKERS):
+    """Fetches a post's details from the GraphQL API instead of its page."""
+    post_id = extract_post_id(post_url)
+    if not post_id:
+        print(f"Could not find a post id in {post_url}.")
+        return None
+
+    data = graphql_request(POST_QUERY, {'id': post_id},
+                           use_cache, max_cache_age)
+    post = ((data or {}).get('post') or {}).get('result')
+    if not post:
+        print(f"No post returned by GraphQL for {post_url}.")
+        return None
+
+    title_text = post.get('title') or ""
+    if not title_text.strip():
+        title_text = f"Untitled Post ({post_url.split('/')[-1]})"
+    author = (post.get('user') or {}).get('displayName') or "Unknown author"
+    date_str = format_date(post.get('postedAt'))
+
+    # Wrap the body so it renders like the content div of a post page
+    body_html = (post.get('contents') or {}).get('html') or ""
+    soup = bs4.BeautifulSoup(f"<div>{body_html}</div>", HTML_PARSER)
+    content_div_to_render = soup.find('div') if body_html.strip() else None
+    if not content_div_to_render:
+        print(f"Post body returned by GraphQL is empty for {post_url}.")
+
+    return render_post_data(soup, content_div_to_render, post_url, title_text, author, date_str,
+                            use_cache, max_cache_age, image_workers)
+
+
+def get_urls_from_sequence_graphql(sequence_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS):
+    """Returns the post URLs of a sequence, in chapter order, from the GraphQL API."""
+    sequence_id = extract_sequence_id(sequence_url)
+    if not sequence_id:
+        print(f"Could not find a sequence id in {sequence_url}.")
+        return []
+
+    data = graphql_request(SEQUENCE_QUERY, {'id': sequence_id},
+                           use_cache, max_cache_age)
+    sequence = ((data or {}).get('sequence') or {}).get('result')
+    if not sequence:
+        print(f"No sequence returned by GraphQL for {sequence_url}.")
+        return []
+
+    post_urls = []
+    for chapter in sequence.get('chapters') or []:
+        for post in chapter.get('posts') or []:
+            # Same form as the links on sequence pages, so both backends share cache entries
+            full_url = f"{BASE_URL}/s/{sequence_id}/p/{post['_id']}"
+            if full_url not in post_urls:
+                post_urls.append(full_url)
+    return post_urls
+
+
 def get_urls_from_file(filepath):
     urls = []
     try:
@@ -893,12 +2087,21 @@ def get_urls_from_sequence(sequence_url, use_cache=True, max_cache_age=CACHE_EXP
     # Check cache first if enabled
     if use_cache:
         cached_urls = get_cached_sequence_urls(sequence_url, max_cache_age)
+        record_cache('sequences', bool(cached_urls))
         if cached_urls:
             print(f"Using cached sequence data for: {sequence_url}")
             print(f"Found {len(cached_urls)} posts in cached sequence.")
             return cached_urls
 
     print(f"Fetching sequence: {sequence_url}")
+    if CONTENT_BACKEND == "graphql":
+        post_urls = get_urls_from_sequence_graphql(
+            sequence_url, use_cache, max_cache_age)
+        print(f"Found {len(post_urls)} posts in sequence.")
+        if use_cache and post_urls:
+            cache_sequence_urls(sequence_url, post_urls)
+        return post_urls
+
     soup = make_soup(sequence_url, use_cache, max_cache_age)
     if not soup:
         return []
@@ -966,6 +2169,7 @@ def get_urls_from_bestof(year="all", category="all", use_cache=True, max_cache_a
     # Check cache first if enabled
     if use_cache:
         cached_urls = get_cached_sequence_urls(cache_url, max_cache_age)
+        record_cache('sequences', bool(cached_urls))
         if cached_urls:
             print(f"Using cached Best Of data for: {bestof_url}")
             print(f"Found {len(cached_urls)} posts in cached Best Of page.")
@@ -1001,10 +2205,12 @@ def get_urls_from_bestof(year="all", category="all", use_cache=True, max_cache_a
     return post_urls
 
 
-def get_urls_from_sequence_list(list_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS):
+def get_urls_from_sequence_list(list_url, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS,
+                                workers=DEFAULT_WORKERS):
     """
     Fetches a page containing links to multiple sequences and returns
-    all post URLs from all sequences found.
+    all post URLs from all sequences found. With workers > 1, the sequences
+    are expanded concurrently, still under the global rate limit.
     """
     if not list_url.startswith('http'):
         list_url = urljoin(BASE_URL, list_url)
@@ -1012,6 +2218,7 @@ def get_urls_from_sequence_list(list_url, use_cache=True, max_cache_age=CACHE_EX
     # Check cache first if enabled
     if use_cache:
         cached_urls = get_cached_sequence_urls(list_url, max_cache_age)
+        record_cache('sequences', bool(cached_urls))
         if cached_urls:
             print(f"Using cached sequence list data for: {list_url}")
             print(f"Found {len(cached_urls)} posts in cached sequence list.")
@@ -1056,11 +2263,21 @@ def get_urls_from_sequence_list(list_url, use_cache=True, max_cache_age=CACHE_EX
         f"Found {len(sequence_links)} unique sequences. Fetching posts from each sequence...")
 
     # Get posts from each sequence
-    all_post_urls = []
-    for sequence_url in sequence_links:
+    def expand_sequence(sequence_url):
         print(f"\n--- Processing sequence: {sequence_url} ---")
-        posts_in_sequence = get_urls_from_sequence(
-            sequence_url, use_cache, max_cache_age)
+        return get_urls_from_sequence(sequence_url, use_cache, max_cache_age)
+
+    if workers > 1 and len(sequence_links) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(sequence_links))) as executor:
+            # executor.map yields results in submission order, keeping the sequence order
+            sequence_post_urls = list(
+                executor.map(expand_sequence, sequence_links))
+    else:
+        sequence_post_urls = [expand_sequence(
+            sequence_url) for sequence_url in sequence_links]
+
+    all_post_urls = []
+    for posts_in_sequence in sequence_post_urls:
         all_post_urls.extend(posts_in_sequence)
 
     # Deduplicate post URLs
@@ -1074,16 +2291,614 @@ def get_urls_from_sequence_list(list_url, use_cache=True, max_cache_age=CACHE_EX
     return all_post_urls
 
 
+def extract_image_urls(page_url, content):
+    """Returns the absolute URLs of images inside the post body of a raw HTML page."""
+    try:
+        doc = lxml.html.fromstring(content)
+    except (lxml.etree.ParserError, ValueError):
+        return []
+
+    # Only look inside the post body so avatars and UI icons aren't downloaded
+    containers = doc.xpath('//div[@id="postContent"]')
+    if not containers:
+        containers = doc.xpath(
+            '//div[contains(concat(" ", normalize-space(@class), " "), " ContentStyles-base ")]')
+    if not containers:
+        containers = [doc]
+
+    image_urls = []
+    for container in containers:
+        for src in container.xpath('.//img/@src | .//svg/@src'):
+            image_urls.append(urljoin(page_url, src))
+    return list(dict.fromkeys(image_urls))
+
+
+async def _async_wait_for_rate_limit(lock):
+    """Async counterpart of wait_for_rate_limit, sharing the same global timestamp."""
+    global _last_request_time
+    async with lock:
+        wait_time = _last_request_time + REQUEST_DELAY - time.time()
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+        _last_request_time = time.time()
+
+
+async def _async_fetch(session, semaphore, url, rate_limit_lock=None, headers=None):
+    """
+    Fetches a URL with retries. Returns (status, body, validators) for a 200 or 304
+    response (body is None for 304), or None on failure.
+    """
+    error_message = None
+    async with semaphore:
+        for attempt in range(MAX_RETRIES):
+            if rate_limit_lock is not None:
+                await _async_wait_for_rate_limit(rate_limit_lock)
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 200:
+                        return 200, await response.read(), get_response_validators(response.headers)
+                    if response.status == 304 and headers:
+                        return 304, None, get_response_validators(response.headers)
+                    error_message = f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error_message = str(e) or type(e).__name__
+
+            # Wait before retrying
+            if attempt < MAX_RETRIES - 1:
+                await asyncio.sleep(RETRY_DELAY)
+
+    print(f"Async fetch failed for {url}: {error_message}")
+    return None
+
+
+async def _async_prefetch_image(session, semaphore, image_url, images_dir):
+    """Downloads one image into the image cache under the name download_image would use."""
+    image_name = get_image_filename(image_url)
+    local_path = os.path.join(images_dir, image_name)
+    if os.path.exists(local_path):
+        mark_cache_access(local_path)
+        return
+
+    result = await _async_fetch(session, semaphore, image_url)
+    if result is None:
+        return  # download_image will retry and create a placeholder
+
+    _, content, validators = result
+    temp_path = f"{local_path}.{threading.get_ident()}.part"
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, local_path)
+    if validators:
+        write_image_meta(image_name, image_url, validators)
+    print(f"Prefetched image: {image_name}")
+
+
+async def _async_prefetch_post(session, semaphore, rate_limit_lock, post_url, seen_images,
+                               use_cache, max_cache_age, images_dir):
+    """Downloads one post page, then all of its images concurrently."""
+    content = None
+    if use_cache:
+        if get_cached_post_data(post_url, max_cache_age):
+            return  # Post data is cached, the page isn't needed at all
+        content = get_cached_page(post_url, max_cache_age)
+
+    if content is None:
+        # Expired entries are revalidated rather than downloaded again
+        headers = get_conditional_headers(
+            get_cached_page_meta(post_url)) if use_cache else {}
+        result = await _async_fetch(session, semaphore, post_url, rate_limit_lock, headers)
+        if result is None:
+            return  # make_soup will retry and report the error
+
+        status, content, validators = result
+        if status == 304:
+            content = get_cached_page(post_url, 0)
+            if content is None:
+                return  # make_soup will fetch it unconditionally
+            print(f"Not modified: {post_url}")
+            refresh_cached_page(post_url, validators)
+        else:
+            print(f"Prefetched page: {post_url}")
+            if use_cache:
+                cache_page(post_url, content, validators)
+            else:
+                _prefetched_pages[post_url] = content
+
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+
+    image_tasks = []
+    for image_url in extract_image_urls(post_url, content):
+        if image_url in seen_images or image_url.startswith('data:'):
+            continue
+        if any(domain in image_url for domain in SKIPPED_IMAGE_DOMAINS):
+            continue
+        if not get_image_filename(image_url):
+            continue  # Name isn't deterministic, leave it to download_image
+        seen_images.add(image_url)
+        image_tasks.append(_async_prefetch_image(
+            session, semaphore, image_url, images_dir))
+    await asyncio.gather(*image_tasks)
+
+
+async def _async_prefetch(post_urls, use_cache, max_cache_age, concurrency, images_dir):
+    semaphore = asyncio.Semaphore(concurrency)
+    rate_limit_lock = asyncio.Lock()
+    seen_images = set()
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=30)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                     headers={'User-Agent': USER_AGENT}) as session:
+        await asyncio.gather(*[
+            _async_prefetch_post(session, semaphore, rate_limit_lock, post_url, seen_images,
+                                 use_cache, max_cache_age, images_dir)
+            for post_url in post_urls
+        ])
+
+
+def async_prefetch(post_urls, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS,
+                   concurrency=DEFAULT_ASYNC_CONCURRENCY, images_dir=IMAGES_DIR):
+    """
+    Downloads post pages and their images on a single asyncio event loop.
+    Pages land in the page cache (or an in-memory store when caching is off) for
+    make_soup, and images land in images_dir for download_image, so the regular
+    extraction that follows is served without network round trips.
+    Returns False if the async backend is unavailable.
+    """
+    if importlib.util.find_spec('aiohttp') is None:
+        print("The async fetch backend requires aiohttp (pip install aiohttp).")
+        return False
+
+    if not os.path.exists(images_dir):
+        os.makedirs(images_dir)
+
+    post_urls = [url if url.startswith('http') else urljoin(BASE_URL, url)
+                 for url in post_urls]
+    print(
+        f"Prefetching {len(post_urls)} posts with up to {concurrency} concurrent requests...")
+    asyncio.run(_async_prefetch(post_urls, use_cache,
+                max_cache_age, concurrency, images_dir))
+    return True
+
+
+# Options of the book being built, saved in a run journal and restored when it is resumed
+JOURNAL_OPTIONS = ['output', 'title', 'author', 'max_image_width', 'jpeg_quality', 'png_compression',
+                   'max_image_size', 'no_images', 'kindle_compatible', 'split', 'max_posts_per_file',
+                   'max_volume_mb', 'create_mobi', 'parser', 'backend']
+
+
+class RunJournal:
+    """
+    Append-only JSON-lines record of a run: the resolved URL list with the build options,
+    then each completed post and each optimized image. A run interrupted part way can be
+    continued with --resume, which rebuilds from the journaled posts with the same options,
+    takes the journaled images from the derivative cache and only fetches the rest.
+    Each record is written with a single O_APPEND write, so volume worker processes
+    can share the journal and a crash leaves at most the last record incomplete.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.urls = None
+        self.options = {}
+        # Image filename -> derivative cache key of its optimized version
+        self.images = {}
+        self.finished = False
+        # Byte offsets of post records, read back one at a time so posts aren't all held in memory
+        self.post_offsets = {}
+        if resume:
+            self._load()
+        elif os.path.exists(path):
+            os.remove(path)
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _load(self):
+        """Reads an existing journal, dropping a last record left incomplete by a crash."""
+        valid_end = 0
+        with open(self.path, 'rb') as f:
+            for line in iter(f.readline, b''):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                event = record.get('event')
+                if event == 'urls':
+                    self.urls = record['urls']
+                    self.options = record.get('options', {})
+                elif event == 'post':
+                    self.post_offsets[record['url']] = valid_end
+                elif event == 'image':
+                    self.images[record['file']] = record['key']
+                elif event == 'finished':
+                    self.finished = True
+                valid_end += len(line)
+        if os.path.getsize(self.path) != valid_end:
+            print(f"Discarding an incomplete record at the end of {self.path}")
+            os.truncate(self.path, valid_end)
+        if self.urls is None:
+            raise ValueError(f"{self.path} has no URL list; it is not a run journal")
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['fd']
+        return state
+
+    def __setstate__(self, state):
+        # Reopen in processes the journal is handed to
+        self.__dict__.update(state)
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+
+    def _write(self, record):
+        data = (json.dumps(record) + '\n').encode('utf-8')
+        while data:
+            data = data[os.write(self.fd, data):]
+
+    def record_urls(self, urls, options=None):
+        self.urls = list(urls)
+        self.options = dict(options or {})
+        self._write({'event': 'urls', 'urls': self.urls, 'options': self.options})
+
+    def has_post(self, url):
+        return url in self.post_offsets
+
+    def get_post(self, url):
+        """Returns the journaled post data for url, or None."""
+        offset = self.post_offsets.get(url)
+        if offset is None:
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())['post']
+
+    def record_post(self, url, post_data):
+        self.post_offsets[url] = os.lseek(self.fd, 0, os.SEEK_END)
+        self._write({'event': 'post', 'url': url, 'post': post_data})
+
+    def get_image(self, img_file, settings):
+        """Returns the derivative cache key journaled for img_file with these encode settings, or None."""
+        cache_key = self.images.get(img_file)
+        if cache_key is None or not cache_key.endswith(f"_{settings}"):
+            return None
+        return cache_key
+
+    def record_image(self, img_file, cache_key, media_type):
+        """Records an optimized image, media_type None meaning it was excluded."""
+        self.images[img_file] = cache_key
+        self._write({'event': 'image', 'file': img_file, 'key': cache_key,
+                     'media_type': media_type})
+
+    def record_finished(self, epub_paths):
+        self.finished = True
+        self._write({'event': 'finished', 'outputs': epub_paths})
+
+    def close(self):
+        os.close(self.fd)
+
+
+def iter_posts(post_urls, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS, workers=DEFAULT_WORKERS,
+               image_workers=IMAGE_DOWNLOAD_WORKERS, window=DEFAULT_PIPELINE_WINDOW, journal=None):
+    """
+    Yields the successfully retrieved posts in the same order as post_urls, fetching them
+    with get_post_content, optionally on a thread pool.
+    At most window posts are fetched ahead of the consumer, so only that many are held at once.
+    With a journal, posts it already has are read from it and newly fetched posts are recorded.
+    """
+    def fetch_one(url):
+        if journal is not None and journal.has_post(url):
+            return journal.get_post(url)
+        # Failures are reported like those of the sequential loop; other errors are bugs and propagate
+        try:
+            return get_post_content(url, use_cache, max_cache_age, image_workers)
+        except (requests.exceptions.RequestException, bs4.ParserRejectedMarkup) as e:
+            print(f"Error processing post {url}: {e}")
+            return None
+
+    def results():
+        if workers <= 1:
+            for url in post_urls:
+                yield url, fetch_one(url)
+            return
+
+        print(f"Fetching posts with {workers} workers...")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for url in post_urls:
+                pending.append((url, executor.submit(fetch_one, url)))
+                if len(pending) >= max(window, workers):
+                    url, future = pending.popleft()
+                    yield url, future.result()
+            while pending:
+                url, future = pending.popleft()
+                yield url, future.result()
+
+    for url, post_data in results():
+        if post_data:
+            if journal is not None and not journal.has_post(url):
+                journal.record_post(url, post_data)
+            yield post_data
+        else:
+            print(f"Failed to retrieve or parse post: {url}")
+
+
+def fetch_posts(post_urls, use_cache=True, max_cache_age=CACHE_EXPIRY_DAYS, workers=DEFAULT_WORKERS,
+                image_workers=IMAGE_DOWNLOAD_WORKERS, journal=None):
+    """
+    Fetches all posts with get_post_content, optionally on a thread pool.
+    Returns the successfully retrieved posts in the same order as post_urls.
+    """
+    return list(iter_posts(post_urls, use_cache, max_cache_age, workers, image_workers,
+                           window=max(1, len(post_urls)), journal=journal))
+
+
+class FixedDateZipFile(zipfile.ZipFile):
+    """ZipFile that dates every entry ZIP_ENTRY_DATE instead of now, so the same content gives the same bytes."""
+
+    def get_zip_info(self, name):
+        """Returns the ZipInfo for a new regular file entry."""
+        zinfo = zipfile.ZipInfo(name, date_time=ZIP_ENTRY_DATE)
+        zinfo.compress_type = self.compression
+        zinfo.external_attr = 0o600 << 16
+        return zinfo
+
+    def writestr(self, zinfo_or_arcname, data, compress_type=None, compresslevel=None):
+        if not isinstance(zinfo_or_arcname, zipfile.ZipInfo):
+            zinfo_or_arcname = self.get_zip_info(zinfo_or_arcname)
+            if compresslevel is None:
+                compresslevel = self.compresslevel
+        super().writestr(zinfo_or_arcname, data, compress_type, compresslevel)
+
+
+_streaming_epub_writer_class = None
+
+
+def get_streaming_epub_writer_class():
+    """
+    Returns the StreamingEpubWriter class. It subclasses ebooklib's EpubWriter,
+    so it is only defined once a book is built.
+    """
+    global _streaming_epub_writer_class
+    if _streaming_epub_writer_class is not None:
+        return _streaming_epub_writer_class
+
+    class StreamingEpubWriter(epub.EpubWriter):
+        """
+        EpubWriter that writes each item into the zip as soon as it is added, instead of
+        serializing the whole book at the end. Added items are kept in the book without
+        their content, so only the manifest and TOC metadata stay in memory.
+        The package document, nav and NCX are written by close().
+        """
+
+        def __init__(self, name, book, options=None):
+            super().__init__(name, book, options)
+            # Build next to the destination and move it in place once complete
+            self.temp_name = f"{name}.{os.getpid()}.part"
+            self.out = FixedDateZipFile(self.temp_name, 'w', zipfile.ZIP_DEFLATED,
+                                        compresslevel=self.options['compresslevel'])
+            self.out.writestr("mimetype", "application/epub+zip",
+                              compress_type=zipfile.ZIP_STORED)
+            self._write_container()
+            self._nav_error = None
+            # Page markers of every chapter written, by file name, as (id, label) pairs
+            self.chapter_pages = {}
+
+        def _get_entry_name(self, item):
+            return f"{self.book.FOLDER_NAME}/{item.file_name}"
+
+        def _open_entry(self, item):
+            """Opens a new zip entry for item. Images are stored as is, deflating them gains next to nothing."""
+            zinfo = self.out.get_zip_info(self._get_entry_name(item))
+            if item.media_type in ('image/jpeg', 'image/png', 'image/gif'):
+                zinfo.compress_type = zipfile.ZIP_STORED
+            return self.out.open(zinfo, 'w')
+
+        def add_item(self, item):
+            """Adds an item to the book and writes its content to the zip right away."""
+            self.book.add_item(item)
+            if isinstance(item, (epub.EpubNcx, epub.EpubNav)):
+                return  # Generated from the TOC in close()
+            self.out.writestr(self._get_entry_name(item), item.get_content())
+            if isinstance(item, epub.EpubHtml):
+                self._set_page_markers(item, self._get_pages(item))
+            else:
+                item.content = b''
+
+        def add_file(self, item, path):
+            """Adds an item whose content is the file at path, copied into the zip in chunks."""
+            self.book.add_item(item)
+            with open(path, 'rb') as src, self._open_entry(item) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+
+        def copy_item(self, item, source_zip, pages=None):
+            """
+            Adds an item whose content is copied from the same entry of a previously written EPUB.
+            For chapters, pages are the page markers recorded for that entry.
+            """
+            self.book.add_item(item)
+            with source_zip.open(self._get_entry_name(item)) as src, self._open_entry(item) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            if isinstance(item, epub.EpubHtml):
+                self._set_page_markers(item, pages or [])
+
+        def _get_pages(self, item):
+            """Returns the (id, label) page markers of a chapter, the one part of its body the nav reads."""
+            try:
+                return [(page_id, label) for _, page_id, label in ebooklib_utils.get_pages(item)]
+            except lxml.etree.ParserError as e:
+                # Raised from close(), where write_epub would have failed on it
+                self._nav_error = self._nav_error or e
+                return []
+
+        def _set_page_markers(self, item, pages):
+            """Replaces a written chapter's content with a stand-in holding only its page markers."""
+            self.chapter_pages[item.file_name] = pages
+            markers = ''.join(f'<span epub:type="pagebreak" id="{html.escape(page_id)}" '
+                              f'aria-label="{html.escape(label)}"></span>'
+                              for page_id, label in pages)
+            item.content = f"<html><body><div>{markers}</div></body></html>"
+
+        def close(self):
+            """Writes the package document, nav and NCX, and moves the finished EPUB in place."""
+            if self._nav_error is not None:
+                raise self._nav_error
+            self._write_opf()
+            for item in self.book.get_items():
+                if isinstance(item, epub.EpubNcx):
+                    self.out.writestr(self._get_entry_name(item), self._get_ncx())
+                elif isinstance(item, epub.EpubNav):
+                    self.out.writestr(
+                        self._get_entry_name(item), self._get_nav(item))
+            self.out.close()
+            os.replace(self.temp_name, self.file_name)
+
+        def abort(self):
+            """Discards a partially written EPUB."""
+            try:
+                self.out.close()
+            except Exception:
+                pass
+            if os.path.exists(self.temp_name):
+                os.remove(self.temp_name)
+
+    _streaming_epub_writer_class = StreamingEpubWriter
+    return StreamingEpubWriter
+
+
+def get_book_identifier(book_title, book_author, post_urls):
+    """Returns a urn:uuid identifier derived from the book metadata and post URLs, stable across rebuilds."""
+    key = '\n'.join([book_title, book_author] + list(post_urls))
+    return f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, key)}"
+
+
+def get_write_options():
+    """
+    Returns the EpubWriter options. SOURCE_DATE_EPOCH, when set, replaces the current time
+    as the book's modification date, as reproducible builds expect.
+    """
+    source_date_epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    if not source_date_epoch:
+        return {}
+    return {'mtime': datetime.datetime.fromtimestamp(int(source_date_epoch), datetime.timezone.utc)}
+
+
+def get_build_state_path(epub_filename):
+    """Returns the path of the build state saved next to an EPUB by incremental builds."""
+    return f"{epub_filename}.build.json"
+
+
+def get_chapter_fingerprint(chapter_title, chapter_filename, content, settings, excluded_images):
+    """Fingerprints everything a rendered chapter depends on: its content, names and build settings."""
+    hasher = hashlib.sha256()
+    hasher.update(json.dumps([BUILD_STATE_VERSION, chapter_title, chapter_filename, settings,
+                              sorted(excluded_images)]).encode('utf-8'))
+    hasher.update(content.encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def load_build_state(epub_filename):
+    """
+    Returns (state, zip file) for the previous incremental build of epub_filename,
+    or (None, None) when there is none or it doesn't match the EPUB on disk.
+    """
+    state_path = get_build_state_path(epub_filename)
+    if not os.path.exists(state_path) or not os.path.exists(epub_filename):
+        return None, None
+
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') != BUILD_STATE_VERSION or state.get('epub_size') != os.path.getsize(epub_filename):
+            print(f"Build state {state_path} doesn't match {epub_filename}, rebuilding everything")
+            return None, None
+        return state, zipfile.ZipFile(epub_filename)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        print(f"Error reading build state {state_path}: {e}")
+        return None, None
+
+
+def save_build_state(epub_filename, state):
+    """Saves the build state of a just written EPUB next to it."""
+    state_path = get_build_state_path(epub_filename)
+    state = dict(state, version=BUILD_STATE_VERSION,
+                 epub_size=os.path.getsize(epub_filename))
+    temp_path = f"{state_path}.{os.getpid()}.part"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, state_path)
+
+
 def create_epub(posts_data, epub_filename="lesswrong_ebook.epub", book_title="LessWrong Collection",
                 book_author="LessWrong Community", max_image_width=800, jpeg_quality=75,
-                png_compression=9, max_image_size_mb=5.0, kindle_compatible=False):
-    if not posts_data:
+                png_compression=9, max_image_size_mb=5.0, kindle_compatible=False,
+                optimize_workers=DEFAULT_IMAGE_WORKERS, no_images=False, streaming=False, incremental=False,
+                window=None, journal=None):
+    """
+    Builds the EPUB for posts_data. With streaming, chapters and images are written into
+    the zip as soon as they are ready rather than collected in memory first.
+    With incremental (which implies streaming), chapters and images whose fingerprints
+    match the previous build of epub_filename are copied from it instead of being rebuilt.
+    posts_data can be any iterable, such as iter_posts(). With window, posts are taken from it
+    that many at a time and, when streaming, released once their chapters are written.
+    With a journal, optimized images are recorded in it and images it already has are
+    taken from the derivative cache without being optimized again.
+    """
+    posts_data = iter(posts_data)
+    first_post = next(posts_data, None)
+    if first_post is None:
         print("No posts to add to EPUB. Exiting.")
         return
+    posts_data = chain([first_post], posts_data)
+
+    previous_state, previous_zip = None, None
+    if incremental:
+        streaming = True
+        previous_state, previous_zip = load_build_state(epub_filename)
+    elif os.path.exists(get_build_state_path(epub_filename)):
+        # The EPUB is about to be replaced, so its build state no longer describes it
+        os.remove(get_build_state_path(epub_filename))
 
     book = epub.EpubBook()
-    book.set_identifier(
-        f"urn:uuid:{sanitize_filename(book_title)}-lw-{int(time.time())}")
+    writer = get_streaming_epub_writer_class()(
+        epub_filename, book, get_write_options()) if streaming else None
+    try:
+        with profile_stage('build_epub'):
+            return build_epub(book, writer, posts_data, epub_filename, book_title, book_author,
+                              max_image_width, jpeg_quality, png_compression, max_image_size_mb,
+                              kindle_compatible, optimize_workers, no_images, incremental,
+                              previous_state, previous_zip, window, journal)
+    finally:
+        if writer is not None and os.path.exists(writer.temp_name):
+            writer.abort()
+        if previous_zip is not None:
+            previous_zip.close()
+
+
+def build_epub(book, writer, posts_data, epub_filename, book_title, book_author, max_image_width,
+               jpeg_quality, png_compression, max_image_size_mb, kindle_compatible, optimize_workers,
+               no_images, incremental=False, previous_state=None, previous_zip=None, window=None,
+               journal=None):
+    """
+    Fills in book for create_epub, writing items through writer when streaming.
+    For incremental builds, entries matching previous_state are copied from previous_zip.
+    Posts are handled window at a time (all at once without one): first their new images,
+    then their chapters.
+    """
+    add_item = writer.add_item if writer is not None else book.add_item
+
+    # Fingerprints of this build's chapters and images, saved for the next incremental build
+    build_state = {'chapters': {}, 'images': {}} if incremental else None
+    previous_entries = set(previous_zip.namelist()) if previous_zip else set()
+
+    def get_previous_entry(kind, file_name, fingerprint):
+        """Returns the previous build's state for an entry with the same fingerprint, or None."""
+        entry = (previous_state or {}).get(kind, {}).get(file_name)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return None
+        if f"{book.FOLDER_NAME}/{file_name}" not in previous_entries:
+            return None
+        return entry
+
     book.set_title(book_title)
     book.set_language('en')
     book.add_author(book_author)
@@ -1096,8 +2911,11 @@ def create_epub(posts_data, epub_filename="lesswrong_ebook.epub", book_title="Le
         text="Image excluded\n(exceeded size limit)", width=400, height=200)
     excluded_img_name = "image_size_exceeded_placeholder.png"
     excluded_img_path = os.path.join(IMAGES_DIR, excluded_img_name)
-    with open(excluded_img_path, 'wb') as f:
+    # Volumes built in parallel all write the placeholder, so write it atomically
+    temp_path = f"{excluded_img_path}.{os.getpid()}.part"
+    with open(temp_path, 'wb') as f:
         f.write(excluded_image_placeholder)
+    os.replace(temp_path, excluded_img_path)
 
     # Add placeholder to the book
     placeholder_item = epub.EpubItem(
@@ -1106,58 +2924,134 @@ def create_epub(posts_data, epub_filename="lesswrong_ebook.epub", book_title="Le
         media_type="image/png",
         content=excluded_image_placeholder
     )
-    book.add_item(placeholder_item)
-
-    # Track which images are referenced in the current posts
-    referenced_images = set()
-
-    # First pass: find all image references in the HTML content
-    for post in posts_data:
-        content = post.get('content', '')
-        soup = BeautifulSoup(content, 'html.parser')
-        for img in soup.find_all('img'):
-            src = img.get('src', '')
-            if src.startswith('images/'):
-                img_filename = src.replace('images/', '')
-                referenced_images.add(img_filename)
-
-    print(
-        f"Found {len(referenced_images)} images referenced in the selected posts")
+    add_item(placeholder_item)
 
     # Track which images are added and which are excluded
     added_images = set()
     excluded_images = set()
-
-    # Only add images that are actually referenced in the posts
-    if os.path.exists(IMAGES_DIR):
-        print(f"Adding referenced images to EPUB...")
-        for img_file in referenced_images:
+    reused_images_count = 0
+    derivative_settings = get_derivative_settings(max_image_width, jpeg_quality, png_compression,
+                                                  max_image_size_mb, kindle_compatible)
+
+    def add_images(referenced_images):
+        """Optimizes (or reuses) and adds the given referenced images, recording exclusions."""
+        nonlocal reused_images_count
+        if not os.path.exists(IMAGES_DIR):
+            return
+
+        image_files = []
+        for img_file in sorted(referenced_images):
             # Skip the placeholder (it's already added)
             if img_file == excluded_img_name:
                 continue
 
-            img_path = os.path.join(IMAGES_DIR, img_file)
-            if os.path.isfile(img_path):
-                # Use optimized version for EPUB
-                img_content, media_type = optimize_image_for_epub(
-                    img_path, max_image_width, jpeg_quality, png_compression, max_image_size_mb)
-
-                if img_content is not None and media_type is not None:
-                    img_item = epub.EpubItem(
-                        uid=f"image_{sanitize_filename(img_file)}",
-                        file_name=f"images/{img_file}",
-                        media_type=media_type,
-                        content=img_content
-                    )
-                    book.add_item(img_item)
-                    added_images.add(img_file)
-                else:
+            if os.path.isfile(os.path.join(IMAGES_DIR, img_file)):
+                image_files.append(img_file)
+            else:
+                # Cached posts with evicted images are extracted again, so this only happens to
+                # images removed while the run is going or posts read back from a journal
+                excluded_images.add(img_file)
+
+        # Images unchanged since the previous incremental build are copied from it
+        reused_images = {}
+        if incremental:
+            for img_file in image_files:
+                try:
+                    # The derivative cache key covers the source image and every encode setting
+                    fingerprint = get_derivative_cache_key(os.path.join(IMAGES_DIR, img_file), max_image_width,
+                                                           jpeg_quality, png_compression, max_image_size_mb,
+                                                           kindle_compatible)
+                except OSError:
+                    continue
+                build_state['images'][f"images/{img_file}"] = {
+                    'fingerprint': fingerprint}
+                previous_entry = get_previous_entry(
+                    'images', f"images/{img_file}", fingerprint)
+                if previous_entry is not None:
+                    reused_images[img_file] = previous_entry['media_type']
+            reused_images_count += len(reused_images)
+
+        new_images = [
+            img_file for img_file in image_files if img_file not in reused_images]
+
+        # Images journaled before an interruption come straight from the derivative cache
+        optimized_images = {}
+        if journal is not None:
+            for img_file in new_images:
+                cache_key = journal.get_image(img_file, derivative_settings)
+                if cache_key is None:
+                    continue
+                found, content, media_type = get_cached_derivative(
+                    cache_key, as_path=writer is not None)
+                if found:
+                    optimized_images[img_file] = (content, media_type)
+        images_to_optimize = [
+            img_file for img_file in new_images if img_file not in optimized_images]
+
+        # Use optimized versions for EPUB
+        # When streaming, ask for derivative cache paths so images are copied from disk
+        newly_optimized = optimize_images([os.path.join(IMAGES_DIR, img_file) for img_file in images_to_optimize],
+                                          max_image_width, jpeg_quality, png_compression, max_image_size_mb,
+                                          kindle_compatible, optimize_workers, as_path=writer is not None)
+        optimized_images.update(zip(images_to_optimize, newly_optimized))
+        if journal is not None:
+            for img_file in images_to_optimize:
+                try:
+                    cache_key = get_derivative_cache_key(os.path.join(IMAGES_DIR, img_file), max_image_width,
+                                                         jpeg_quality, png_compression, max_image_size_mb,
+                                                         kindle_compatible)
+                except OSError:
+                    continue
+                journal.record_image(img_file, cache_key, optimized_images[img_file][1])
+
+        for img_file in image_files:
+            img_item = epub.EpubItem(
+                uid=f"image_{sanitize_filename(img_file)}",
+                file_name=f"images/{img_file}"
+            )
+            if img_file in reused_images:
+                img_item.media_type = reused_images[img_file]
+                writer.copy_item(img_item, previous_zip)
+            else:
+                img_content, img_item.media_type = optimized_images[img_file]
+                if img_content is None or img_item.media_type is None:
                     excluded_images.add(img_file)
+                    if incremental:
+                        build_state['images'].pop(img_item.file_name, None)
+                    continue
+                if isinstance(img_content, str):
+                    writer.add_file(img_item, img_content)
+                else:
+                    img_item.content = img_content
+                    add_item(img_item)
+
+            if incremental and img_item.file_name in build_state['images']:
+                build_state['images'][img_item.file_name]['media_type'] = img_item.media_type
+            added_images.add(img_file)
+
+    # Cleaners applied to every chapter, in order
+    chapter_passes = []
+    if no_images:
+        chapter_passes.append(remove_images_pass)
+    if kindle_compatible:
+        # Content was already cleaned for EPUB at extraction, but Kindle output is cleaned again
+        chapter_passes.extend([epub_cleanup_pass, kindle_cleanup_pass])
+    if not no_images:
+        chapter_passes.append(lambda soup: excluded_images_pass(
+            soup, excluded_images, excluded_img_name))
+
+    # Everything besides its own content that changes how a chapter is rendered
+    chapter_settings = [HTML_PARSER, kindle_compatible, no_images]
+    reused_chapters = 0
+    referenced_images = set()
+    post_urls = []
 
-    for i, post in enumerate(posts_data):
-        chapter_title = post.get('title', f"Untitled Chapter {i+1}")
+    def add_chapter(post, number):
+        """Renders one post as chapter number, or copies it from the previous incremental build."""
+        nonlocal reused_chapters
+        chapter_title = post.get('title', f"Untitled Chapter {number}")
         if not chapter_title.strip():
-            chapter_title = f"Untitled Chapter {i+1} (Original URL: {post.get('url', 'N/A')})"
+            chapter_title = f"Untitled Chapter {number} (Original URL: {post.get('url', 'N/A')})"
 
         # Clean up any extra spaces in the title
         chapter_title = re.sub(r'\s+', ' ', chapter_title).strip()
@@ -1185,44 +3079,72 @@ def create_epub(posts_data, epub_filename="lesswrong_ebook.epub", book_title="Le
             <p>[Content was unexpectedly empty/None at EPUB creation.]</p>
             """
 
-        # First clean HTML for EPUB
-        chapter_content = clean_html_for_epub(
-            str(chapter_body_content_from_post))
-
-        # Then apply additional Kindle-specific cleaning if requested
-        if kindle_compatible:
-            chapter_content = clean_html_for_kindle_compatibility(
-                chapter_content)
-        else:
-            chapter_content = chapter_body_content_from_post
-
-        # Update image references in HTML content for excluded images
-        soup = BeautifulSoup(chapter_content, 'html.parser')
-        for img in soup.find_all('img'):
-            src = img.get('src', '')
-            if src.startswith('images/'):
-                img_filename = src.replace('images/', '')
-                if img_filename in excluded_images:
-                    # Replace with placeholder
-                    img['src'] = f"images/{excluded_img_name}"
-                    img['alt'] = f"[Image exceeded size limit: {img_filename}]"
-                    img['class'] = img.get('class', []) + ['excluded-image']
-
-                # Ensure all image paths use forward slashes for Kindle compatibility
-                img['src'] = img['src'].replace('\\', '/')
-
         # Make sure chapter filename is safe for the filesystem
-        chapter_filename = f"chap_{i+1:03d}_{sanitize_filename(chapter_title)}.xhtml"
+        chapter_filename = f"chap_{number:03d}_{sanitize_filename(chapter_title)}.xhtml"
 
-        # Create the chapter with the updated content
         chapter = epub.EpubHtml(title=chapter_title,
                                 file_name=chapter_filename)
-        chapter.content = str(soup)
-
         chapters.append(chapter)
-        book.add_item(chapter)
         toc_links.append(epub.Link(chapter_filename,
-                         chapter_title, f"chap{i+1}"))
+                         chapter_title, f"chap{number}"))
+
+        if incremental:
+            fingerprint = get_chapter_fingerprint(chapter_title, chapter_filename,
+                                                  str(chapter_body_content_from_post), chapter_settings,
+                                                  excluded_images.intersection(get_post_images(post)))
+            build_state['chapters'][chapter_filename] = {
+                'fingerprint': fingerprint}
+            previous_entry = get_previous_entry(
+                'chapters', chapter_filename, fingerprint)
+            if previous_entry is not None:
+                writer.copy_item(chapter, previous_zip,
+                                 previous_entry['pages'])
+                reused_chapters += 1
+                return
+
+        # Apply every cleaner to a single parse of the chapter
+        with profile_stage('clean'):
+            chapter.content = transform_html(
+                str(chapter_body_content_from_post), chapter_passes)
+        add_item(chapter)
+
+    i = 0
+    while True:
+        batch = list(islice(posts_data, window))
+        if not batch:
+            break
+
+        # Images referenced by this batch that earlier batches didn't already add
+        batch_images = set()
+        for post in ([] if no_images else batch):
+            batch_images.update(get_post_images(post))
+        batch_images -= referenced_images
+        referenced_images |= batch_images
+        if window is None:
+            # Without a window the whole book is one batch, reported as before pipelining
+            print(
+                f"Found {len(batch_images)} images referenced in the selected posts")
+        if batch_images:
+            print("Adding referenced images to EPUB..." if window is None else
+                  f"Adding {len(batch_images)} referenced images to EPUB...")
+            add_images(batch_images)
+
+        for post in batch:
+            post_urls.append(post.get('url', ''))
+            i += 1
+            add_chapter(post, i)
+        # Release this batch's posts before taking the next ones
+        del batch
+
+    if window is not None:
+        print(
+            f"Found {len(referenced_images)} images referenced in the selected posts")
+    if incremental:
+        print(
+            f"Reused {reused_images_count} images and {reused_chapters} of {i} chapters from the previous build")
+
+    book.set_identifier(get_book_identifier(
+        book_title, book_author, post_urls))
 
     style_content = '''
 @namespace epub "http://www.idpf.org/2007/ops";
@@ -1252,11 +3174,11 @@ small { font-size: 0.85em; color: #777; }
 '''
     default_css = epub.EpubItem(
         uid="style_default", file_name="style.css", media_type="text/css", content=style_content)
-    book.add_item(default_css)
+    add_item(default_css)
 
     book.toc = tuple(toc_links)
-    book.add_item(epub.EpubNcx())
-    book.add_item(epub.EpubNav())
+    add_item(epub.EpubNcx())
+    add_item(epub.EpubNav())
     book.spine = ['nav'] + chapters
 
     # Report statistics
@@ -1270,12 +3192,23 @@ small { font-size: 0.85em; color: #777; }
                 print(f"  ... and {len(excluded_images) - 5} more")
                 break
             img_path = os.path.join(IMAGES_DIR, img)
+            if not os.path.exists(img_path):
+                print(f"  - {img} (missing from image cache)")
+                continue
             size_mb = os.path.getsize(img_path) / (1024 * 1024)
             print(f"  - {img} ({size_mb:.2f} MB)")
 
     print("Attempting to write EPUB...")
     try:
-        epub.write_epub(epub_filename, book, {})
+        with profile_stage('epub_write'):
+            if writer is not None:
+                writer.close()
+            else:
+                epub.write_epub(epub_filename, book, get_write_options())
+        if incremental:
+            for chapter_filename, chapter_state in build_state['chapters'].items():
+                chapter_state['pages'] = writer.chapter_pages[chapter_filename]
+            save_build_state(epub_filename, build_state)
         print(f"EPUB created: {epub_filename}")
         return epub_filename  # Return the filename for potential conversion
     except lxml.etree.ParserError as e_write_lxml:
@@ -1337,6 +3270,15 @@ def convert_to_mobi(epub_path):
 
 def clear_cache(cache_type="all"):
     """Clear specified cache or all caches."""
+    # Entries of the sqlite backend live in one database file
+    if os.path.exists(CACHE_DB_PATH) and cache_type in ["all", "pages", "posts", "sequences"]:
+        categories = ["pages", "posts",
+                      "sequences"] if cache_type == "all" else [cache_type]
+        conn = get_cache_db()
+        with conn:
+            conn.executemany("DELETE FROM cache_entries WHERE category = ?",
+                             [(category,) for category in categories])
+
     if cache_type in ["all", "pages"]:
         if os.path.exists(PAGE_CACHE_DIR):
             print(f"Clearing page cache...")
@@ -1355,6 +3297,12 @@ def clear_cache(cache_type="all"):
             shutil.rmtree(SEQUENCE_CACHE_DIR)
             os.makedirs(SEQUENCE_CACHE_DIR)
 
+    if cache_type in ["all", "derivatives"]:
+        if os.path.exists(DERIVATIVE_CACHE_DIR):
+            print(f"Clearing optimized image cache...")
+            shutil.rmtree(DERIVATIVE_CACHE_DIR)
+            os.makedirs(DERIVATIVE_CACHE_DIR)
+
     if cache_type in ["all", "images"]:
         if os.path.exists(IMAGES_DIR):
             print(f"Clearing image cache...")
@@ -1365,33 +3313,382 @@ def clear_cache(cache_type="all"):
         print("All caches cleared.")
 
 
-def split_epub_by_size(posts_data, max_posts_per_file=50, base_filename="lesswrong"):
-    """Split posts into multiple EPUBs to keep file sizes manageable."""
-    if len(posts_data) <= max_posts_per_file:
-        return [{"filename": f"{base_filename}.epub", "posts": posts_data}]
+def iter_file_cache_entries(category):
+    """Yields (url, timestamp, paths) for each entry of a file cache category."""
+    directory = {"pages": PAGE_CACHE_DIR, "posts": POST_CACHE_DIR,
+                 "sequences": SEQUENCE_CACHE_DIR}[category]
+    if not os.path.exists(directory):
+        return
+
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if name.endswith('.meta.json'):
+                # Compressed page entry: metadata sidecar plus body file
+                with open(path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                body_path = path[:-len('.meta.json')] + '.page'
+                yield meta.get('url'), meta['timestamp'], [path, body_path]
+            elif name.endswith('.json') or name.endswith('.html'):
+                # Post/sequence entries and legacy page entries are single JSON files
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                timestamp = data.get(
+                    '_cache_timestamp', data.get('timestamp', 0))
+                yield data.get('url'), timestamp, [path]
+        except Exception as e:
+            print(f"Error reading cache entry {path}: {e}")
+
+
+def get_cache_stats(max_age_days=CACHE_EXPIRY_DAYS):
+    """Returns entry, expired-entry and byte counts for the page, post and sequence caches."""
+    cutoff = time.time() - max_age_days * 60 * 60 * 24 if max_age_days > 0 else 0
+    stats = {category: {'entries': 0, 'expired': 0, 'bytes': 0}
+             for category in ["pages", "posts", "sequences"]}
+
+    if CACHE_BACKEND == "sqlite":
+        # A single indexed aggregate query instead of opening every entry
+        rows = get_cache_db().execute(
+            "SELECT category, COUNT(*), SUM(timestamp < ?), SUM(LENGTH(data)) "
+            "FROM cache_entries GROUP BY category", (cutoff,)).fetchall()
+        for category, entries, expired, size in rows:
+            stats[category] = {'entries': entries,
+                               'expired': expired or 0, 'bytes': size or 0}
+        return stats
+
+    for category in stats:
+        for url, timestamp, paths in iter_file_cache_entries(category):
+            stats[category]['entries'] += 1
+            if timestamp < cutoff:
+                stats[category]['expired'] += 1
+            stats[category]['bytes'] += sum(os.path.getsize(path)
+                                            for path in paths if os.path.exists(path))
+    return stats
+
+
+def print_cache_stats(max_age_days=CACHE_EXPIRY_DAYS):
+    """Print a summary of the cache contents."""
+    print(f"Cache statistics ({CACHE_BACKEND} backend):")
+    for category, category_stats in get_cache_stats(max_age_days).items():
+        print(f"  {category}: {category_stats['entries']} entries, "
+              f"{category_stats['expired']} expired, {category_stats['bytes'] / (1024 * 1024):.2f} MB")
+
+
+def invalidate_cache(older_than_days=None, sequence_url=None):
+    """
+    Removes part of the page, post and sequence caches: entries older than
+    older_than_days, and/or a sequence together with the pages and posts it lists.
+    Returns the number of removed entries.
+    """
+    removed = 0
+
+    if sequence_url and not sequence_url.startswith('http'):
+        sequence_url = urljoin(BASE_URL, sequence_url)
+
+    if CACHE_BACKEND == "sqlite":
+        conn = get_cache_db()
+        with conn:
+            if older_than_days is not None:
+                cutoff = time.time() - older_than_days * 60 * 60 * 24
+                removed += conn.execute(
+                    "DELETE FROM cache_entries WHERE timestamp < ?", (cutoff,)).rowcount
+
+            if sequence_url:
+                post_urls = get_cached_sequence_urls(sequence_url, 0) or []
+                keys = [(url_to_cache_key(url),) for url in post_urls]
+                removed += conn.executemany(
+                    "DELETE FROM cache_entries WHERE category IN ('pages', 'posts') AND cache_key = ?",
+                    keys).rowcount
+                removed += conn.execute(
+                    "DELETE FROM cache_entries WHERE category = 'sequences' AND cache_key = ?",
+                    (url_to_cache_key(sequence_url),)).rowcount
+        return removed
+
+    if older_than_days is not None:
+        cutoff = time.time() - older_than_days * 60 * 60 * 24
+        for category in ["pages", "posts", "sequences"]:
+            for url, timestamp, paths in list(iter_file_cache_entries(category)):
+                if timestamp < cutoff:
+                    for path in paths:
+                        if os.path.exists(path):
+                            os.remove(path)
+                    removed += 1
+
+    if sequence_url:
+        post_urls = get_cached_sequence_urls(sequence_url, 0) or []
+        for url in post_urls:
+            cache_key = url_to_cache_key(url)
+            paths = [os.path.join(POST_CACHE_DIR, f"{cache_key}.json"),
+                     os.path.join(PAGE_CACHE_DIR, f"{cache_key}.html")]
+            paths.extend(get_page_cache_paths(url))
+            existing_paths = [path for path in paths if os.path.exists(path)]
+            for path in existing_paths:
+                os.remove(path)
+            # A compressed page body belongs to the entry of its metadata file
+            removed += len([path for path in existing_paths
+                           if not path.endswith('.page')])
+        sequence_path = os.path.join(
+            SEQUENCE_CACHE_DIR, f"{url_to_cache_key(sequence_url)}.json")
+        if os.path.exists(sequence_path):
+            os.remove(sequence_path)
+            removed += 1
+
+    return removed
+
+
+def get_cache_entry_name(name):
+    """Returns the name of the cache entry a file belongs to, its file name without the CACHE_FILE_SUFFIXES."""
+    for suffix in CACHE_FILE_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def get_lru_entries(directory, group_by_stem=True):
+    """
+    Lists the files of a cache directory as eviction candidates, grouping files that
+    share an entry name (e.g. a page body and its metadata) into one entry.
+    Returns a list of dicts with 'paths', 'size' and 'accessed' (latest access time).
+    """
+    entries = {}
+    if not os.path.exists(directory):
+        return []
+
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            # Skip in-progress writes and the sqlite database, which is pruned row by row
+            if name.endswith('.part') or path.startswith(CACHE_DB_PATH):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            stem = os.path.join(root, get_cache_entry_name(
+                name)) if group_by_stem else path
+            entry = entries.setdefault(
+                stem, {'paths': [], 'size': 0, 'accessed': 0})
+            entry['paths'].append(path)
+            entry['size'] += stat.st_size
+            entry['accessed'] = max(entry['accessed'], stat.st_atime)
+
+    return list(entries.values())
+
+
+def prune_cache(max_cache_mb=None, max_images_mb=None):
+    """
+    Evicts least recently used entries until lw_cache and IMAGES_DIR fit within
+    their size limits (in MB, None = unlimited). Returns the number of removed entries.
+    """
+    removed = 0
+
+    if max_cache_mb is not None:
+        candidates = get_lru_entries(CACHE_DIR)
+        if os.path.exists(CACHE_DB_PATH):
+            flush_cache_db_accesses()
+            rows = get_cache_db().execute(
+                "SELECT category, cache_key, LENGTH(data), COALESCE(accessed, timestamp) "
+                "FROM cache_entries").fetchall()
+            for category, cache_key, size, accessed in rows:
+                candidates.append({'db_key': (category, cache_key),
+                                   'size': size or 0, 'accessed': accessed})
+
+        total_size = sum(entry['size'] for entry in candidates)
+        limit = max_cache_mb * 1024 * 1024
+        evicted_db_keys = []
+        for entry in sorted(candidates, key=lambda entry: entry['accessed']):
+            if total_size <= limit:
+                break
+            if 'db_key' in entry:
+                evicted_db_keys.append(entry['db_key'])
+            else:
+                for path in entry['paths']:
+                    os.remove(path)
+            total_size -= entry['size']
+            removed += 1
+
+        if evicted_db_keys:
+            conn = get_cache_db()
+            with conn:
+                conn.executemany(
+                    "DELETE FROM cache_entries WHERE category = ? AND cache_key = ?", evicted_db_keys)
+            conn.execute("VACUUM")  # Give the freed pages back to the filesystem
+
+        print(
+            f"Cache size after pruning: {total_size / (1024 * 1024):.2f} MB (limit {max_cache_mb} MB)")
+
+    if max_images_mb is not None:
+        candidates = get_lru_entries(IMAGES_DIR, group_by_stem=False)
+        total_size = sum(entry['size'] for entry in candidates)
+        limit = max_images_mb * 1024 * 1024
+        for entry in sorted(candidates, key=lambda entry: entry['accessed']):
+            if total_size <= limit:
+                break
+            for path in entry['paths']:
+                os.remove(path)
+            total_size -= entry['size']
+            removed += 1
+
+        print(
+            f"Image cache size after pruning: {total_size / (1024 * 1024):.2f} MB (limit {max_images_mb} MB)")
+
+    return removed
+
+
+def estimate_image_sizes(posts_data, max_width=800, jpeg_quality=75, png_compression=9, max_size_mb=5.0,
+                         kindle_compatible=False, workers=DEFAULT_IMAGE_WORKERS):
+    """
+    Returns {image filename: bytes} with the optimized size of every image the posts reference.
+    Images that are missing or would be excluded count as 0. The optimized images land in the
+    derivative cache, so create_epub reuses them.
+    """
+    image_files = []
+    for post in posts_data:
+        image_files.extend(get_post_images(post))
+    image_files = [img_file for img_file in dict.fromkeys(image_files)
+                   if os.path.isfile(os.path.join(IMAGES_DIR, img_file))]
+
+    optimized_images = optimize_images([os.path.join(IMAGES_DIR, img_file) for img_file in image_files],
+                                       max_width, jpeg_quality, png_compression, max_size_mb,
+                                       kindle_compatible, workers, as_path=True)
+    image_sizes = {}
+    for img_file, (img_content, _) in zip(image_files, optimized_images):
+        if img_content is None:
+            image_sizes[img_file] = 0
+        elif isinstance(img_content, str):
+            image_sizes[img_file] = os.path.getsize(img_content)
+        else:
+            image_sizes[img_file] = len(img_content)
+    return image_sizes
+
 
+def split_epub_by_size(posts_data, max_posts_per_file=50, base_filename="lesswrong", max_volume_mb=None,
+                       image_sizes=None):
+    """
+    Split posts into multiple EPUBs to keep file sizes manageable.
+    With max_volume_mb, posts are packed in order into volumes whose estimated size
+    (compressed chapter content plus the optimized size of each image it references,
+    counted once per volume) stays within the budget. max_posts_per_file then is an
+    optional secondary cap. A single post larger than the budget gets a volume of its own.
+    """
+    if max_volume_mb is None:
+        if len(posts_data) <= max_posts_per_file:
+            return [{"filename": f"{base_filename}.epub", "posts": posts_data}]
+
+        volumes = []
+        for i in range(0, len(posts_data), max_posts_per_file):
+            chunk = posts_data[i:i+max_posts_per_file]
+            volumes.append({
+                "filename": f"{base_filename}_vol{i//max_posts_per_file + 1}.epub",
+                "posts": chunk
+            })
+        return volumes
+
+    budget = max_volume_mb * 1024 * 1024
+    image_sizes = image_sizes or {}
     volumes = []
-    for i in range(0, len(posts_data), max_posts_per_file):
-        chunk = posts_data[i:i+max_posts_per_file]
-        volumes.append({
-            "filename": f"{base_filename}_vol{i//max_posts_per_file + 1}.epub",
-            "posts": chunk
-        })
-    return volumes
+    current = None
+    for post in posts_data:
+        # Chapters are deflated in the zip, so their compressed size is what counts
+        content_size = len(zlib.compress(
+            str(post.get('content') or '').encode('utf-8')))
+        post_images = get_post_images(post)
+
+        if current is not None:
+            new_images = [img for img in post_images if img not in current["images"]]
+            added_size = content_size + \
+                sum(image_sizes.get(img, 0) for img in new_images)
+            over_budget = current["size"] + added_size > budget
+            over_count = max_posts_per_file is not None and len(
+                current["posts"]) >= max_posts_per_file
+            if over_budget or over_count:
+                current = None
+
+        if current is None:
+            current = {"posts": [], "images": set(), "size": 0}
+            volumes.append(current)
+            added_size = content_size + \
+                sum(image_sizes.get(img, 0) for img in set(post_images))
+
+        current["posts"].append(post)
+        current["images"].update(post_images)
+        current["size"] += added_size
+
+    for i, volume in enumerate(volumes):
+        volume["filename"] = f"{base_filename}.epub" if len(
+            volumes) == 1 else f"{base_filename}_vol{i + 1}.epub"
+        print(f"Planned {volume['filename']}: {len(volume['posts'])} posts, "
+              f"~{volume['size'] / (1024 * 1024):.2f} MB")
+    return [{"filename": volume["filename"], "posts": volume["posts"]} for volume in volumes]
+
+
+def init_volume_worker(html_parser, cache_backend):
+    """Carries the runtime settings from the command line over to a volume worker process."""
+    global HTML_PARSER
+    HTML_PARSER = html_parser
+    configure_cache_backend(cache_backend)
+
+
+def create_volume(volume, volume_number, volume_count, book_title, book_author, epub_options):
+    """Runs create_epub for one volume from split_epub_by_size. Returns (epub_path, seconds)."""
+    print(
+        f"\nCreating volume {volume_number} of {volume_count}: {volume['filename']}")
+    start = time.perf_counter()
+    epub_path = create_epub(volume["posts"], volume["filename"], book_title, book_author,
+                            **epub_options)
+    return epub_path, time.perf_counter() - start
 
 
-# --- Main Execution ---
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(
-        description="Download LessWrong posts and create an EPUB.")
-    parser.add_argument(
-        '-o', '--output', default="lesswrong_ebook.epub", help="Output EPUB filename.")
-    parser.add_argument(
-        '--title', default="LessWrong Collection", help="Title of the EPUB book.")
-    parser.add_argument('--author', default="LessWrong Community",
-                        help="Author of the EPUB book.")
+def create_volumes(volumes, book_title, book_author, epub_options, workers=DEFAULT_VOLUME_WORKERS):
+    """
+    Builds every volume from split_epub_by_size, in a process pool when workers > 1.
+    epub_options are passed through to create_epub. Prints the time each volume took
+    and returns the EPUB paths (None for failed volumes) in volume order.
+    """
+    start = time.perf_counter()
+    jobs = []
+    for i, volume in enumerate(volumes):
+        vol_title = f"{book_title} - Vol {i+1}" if len(
+            volumes) > 1 else book_title
+        jobs.append((volume, i + 1, len(volumes), vol_title,
+                    book_author, epub_options))
+
+    if workers > 1 and len(volumes) > 1:
+        workers = min(workers, len(volumes))
+        print(f"\nBuilding {len(volumes)} volumes with {workers} processes...")
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_volume_worker,
+                                 initargs=(HTML_PARSER, CACHE_BACKEND)) as executor:
+            futures = [executor.submit(create_volume, *job) for job in jobs]
+            results = []
+            for job, future in zip(jobs, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"Error creating volume {job[0]['filename']}: {e}")
+                    results.append((None, None))
+    else:
+        results = [create_volume(*job) for job in jobs]
+
+    print("\nVolume build times:")
+    for volume, (epub_path, seconds) in zip(volumes, results):
+        status = f"{seconds:.2f}s" if seconds is not None else "crashed"
+        if epub_path is None and seconds is not None:
+            status += " (failed)"
+        print(f"  {volume['filename']}: {status}")
+    print(f"  Total: {time.perf_counter() - start:.2f}s")
+
+    return [epub_path for epub_path, _ in results]
 
-    group = parser.add_mutually_exclusive_group(required=True)
+
+# --- Command Line ---
+COMMANDS = ('build', 'prefetch', 'cache')
+CACHE_TYPES = ['all', 'pages', 'posts', 'sequences', 'images', 'derivatives']
+
+
+def add_source_arguments(parser, required=False):
+    """Adds the options choosing which posts to download."""
+    group = parser.add_mutually_exclusive_group(required=required)
     group.add_argument(
         '--file', help="Path to a text file containing post URLs.")
     group.add_argument('--sequence', help="URL of a LessWrong sequence.")
@@ -1399,19 +3696,87 @@ if __name__ == "__main__":
         '--sequence-list', help="URL of a page containing multiple sequences (like /codex, /highlights, etc.)")
     group.add_argument('--bestof', action='store_true',
                        help="Download from 'The Best of LessWrong'. Use with --year/--category.")
-
-    # Cache control arguments
-    parser.add_argument('--no-cache', action='store_true',
-                        help="Don't use cached data, fetch everything fresh.")
-    parser.add_argument('--clear-cache', choices=['all', 'pages', 'posts', 'sequences', 'images'],
-                        help="Clear specified cache before running.")
-    parser.add_argument('--cache-days', type=int, default=CACHE_EXPIRY_DAYS,
-                        help=f"Number of days before cache expires (default: {CACHE_EXPIRY_DAYS}, 0 = never expire).")
-
+    group.add_argument('--resume', metavar='JOURNAL',
+                       help="Continue the run recorded in JOURNAL (see --journal): its URL list, build "
+                       "options, completed posts and optimized images are reused and only the remaining "
+                       "posts are fetched.")
+    parser.add_argument('--journal', metavar='PATH',
+                        help="Record the resolved URL list, the build options, each completed post and each "
+                        "optimized image in PATH (JSON lines), so an interrupted run can be continued with "
+                        "--resume PATH. An existing journal is not replaced without --overwrite-journal.")
+    parser.add_argument('--overwrite-journal', action='store_true',
+                        help="Start --journal PATH over even if it holds the progress of an earlier run.")
     parser.add_argument('--year', default="all",
                         help="Year for 'Best of' (e.g., 2023, all).")
     parser.add_argument('--category', default="all", help="Category for 'Best of' (e.g., 'AI Strategy', all). "
                         "Valid: Rationality, World, Optimization, AI Strategy, Technical AI Safety, Practical, All.")
+    parser.add_argument('--limit', type=int,
+                        help="Limit number of posts to download")
+
+
+def add_cache_arguments(parser, no_cache=True):
+    """Adds the options selecting and bypassing the cache."""
+    if no_cache:
+        parser.add_argument('--no-cache', action='store_true',
+                            help="Don't use cached data, fetch everything fresh.")
+    parser.add_argument('--cache-days', type=int, default=CACHE_EXPIRY_DAYS,
+                        help=f"Number of days before cache expires (default: {CACHE_EXPIRY_DAYS}, 0 = never expire).")
+    parser.add_argument('--cache-backend', choices=['files', 'sqlite'], default='files',
+                        help=f"Store pages, posts and sequences as files or in one SQLite database "
+                        f"({CACHE_DB_PATH}, default: files)")
+
+
+def add_cache_size_arguments(parser, when="after each run"):
+    """Adds the cache size limits applied by prune_cache."""
+    parser.add_argument('--cache-max-size', type=float, metavar='MB',
+                        help=f"Evict least recently used entries from lw_cache beyond this size {when}.")
+    parser.add_argument('--images-max-size', type=float, metavar='MB',
+                        help=f"Evict least recently used images from {IMAGES_DIR} beyond this size {when}.")
+
+
+def add_fetch_arguments(parser):
+    """Adds the options controlling how posts are fetched and parsed."""
+    parser.add_argument('--parser', choices=['lxml', 'html5lib', 'html.parser'], default=HTML_PARSER,
+                        help=f"HTML parser used for pages and chapter cleaning (default: {HTML_PARSER}; "
+                        "html5lib is slowest but most browser-like)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"Number of posts (and sequences of a --sequence-list) to fetch concurrently "
+                        f"(default: {DEFAULT_WORKERS}). "
+                        f"Requests stay globally rate limited to one every {REQUEST_DELAY}s.")
+    parser.add_argument('--image-download-workers', type=int, default=IMAGE_DOWNLOAD_WORKERS,
+                        help=f"Max concurrent image downloads per post (default: {IMAGE_DOWNLOAD_WORKERS})")
+    parser.add_argument('--pool-size', type=int, default=HTTP_POOL_SIZE,
+                        help=f"Keep-alive connections per host in the shared HTTP session (default: {HTTP_POOL_SIZE})")
+    parser.add_argument('--backend', choices=['html', 'graphql'], default=CONTENT_BACKEND,
+                        help="Where posts and sequence contents come from: the post pages ('html') or "
+                             f"LessWrong's GraphQL API ('graphql', compact JSON, default: {CONTENT_BACKEND})")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_GRAPHQL_BATCH_SIZE,
+                        help="Posts requested per GraphQL query with --backend graphql "
+                             f"(default: {DEFAULT_GRAPHQL_BATCH_SIZE})")
+    parser.add_argument('--fetch-backend', choices=['requests', 'async'], default='requests',
+                        help="'async' prefetches pages and images on one asyncio event loop "
+                        "before extraction (requires aiohttp, default: requests)")
+    parser.add_argument('--async-concurrency', type=int, default=DEFAULT_ASYNC_CONCURRENCY,
+                        help=f"Max concurrent requests for the async backend (default: {DEFAULT_ASYNC_CONCURRENCY})")
+
+
+def add_profile_arguments(parser):
+    """Adds the --profile options."""
+    parser.add_argument('--profile', metavar='PATH',
+                        help="Write a JSON report of wall and CPU time per stage, per-request latency and "
+                        "size, cache hits and misses and peak RSS to PATH.")
+    parser.add_argument('--profile-cprofile', metavar='PATH',
+                        help="Also dump cProfile statistics of the main thread to PATH (read with pstats).")
+
+
+def add_build_arguments(parser):
+    """Adds the options of the EPUB being built."""
+    parser.add_argument(
+        '-o', '--output', default="lesswrong_ebook.epub", help="Output EPUB filename.")
+    parser.add_argument(
+        '--title', default="LessWrong Collection", help="Title of the EPUB book.")
+    parser.add_argument('--author', default="LessWrong Community",
+                        help="Author of the EPUB book.")
 
     # Image optimization settings
     parser.add_argument('--max-image-width', type=int, default=800,
@@ -1424,70 +3789,240 @@ if __name__ == "__main__":
                         help="Maximum image size in MB. Images larger than this will be excluded (default: 5.0)")
     parser.add_argument('--no-images', action='store_true',
                         help="Exclude all images from the EPUB")
+    parser.add_argument('--image-workers', type=int, default=DEFAULT_IMAGE_WORKERS,
+                        help=f"Number of processes used to optimize images (default: {DEFAULT_IMAGE_WORKERS})")
 
     # Kindle compatibility
     parser.add_argument('--kindle-compatible', action='store_true',
                         help="Apply additional optimizations for Kindle compatibility")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Write chapters and images into the EPUB as they are ready instead of "
+                             "building the whole book in memory (lower peak memory for large books)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Reuse unchanged chapters and images from the previous build of the output "
+                             "file, tracked in <output>.build.json (implies --streaming)")
     parser.add_argument('--create-mobi', action='store_true',
                         help="Attempt to convert EPUB to MOBI using Calibre (if installed)")
 
     # Splitting options
     parser.add_argument('--split', action='store_true',
                         help="Split into multiple volumes for large collections")
-    parser.add_argument('--max-posts-per-file', type=int, default=50,
-                        help="Maximum number of posts per EPUB file when splitting (default: 50)")
-    parser.add_argument('--limit', type=int,
-                        help="Limit number of posts to download")
-
-    args = parser.parse_args()
-    all_post_urls = []
-
-    # Setup cache directories
+    parser.add_argument('--max-posts-per-file', type=int,
+                        help="Maximum number of posts per EPUB file when splitting "
+                             f"(default: {DEFAULT_MAX_POSTS_PER_FILE}, or no limit with --max-volume-mb)")
+    parser.add_argument('--max-volume-mb', type=float, metavar='MB',
+                        help="Split (implies --split) on an estimated output size per volume, based on "
+                             "each post's content and the optimized size of its images")
+    parser.add_argument('--volume-workers', type=int, default=DEFAULT_VOLUME_WORKERS,
+                        help="Number of processes used to build split volumes concurrently "
+                             f"(default: {DEFAULT_VOLUME_WORKERS})")
+    parser.add_argument('--pipeline-window', type=int, default=DEFAULT_PIPELINE_WINDOW,
+                        help="With --streaming or --incremental (and no splitting), posts are fetched at most "
+                        "this many ahead of the EPUB writer and released once written "
+                        f"(default: {DEFAULT_PIPELINE_WINDOW})")
+
+
+def build_legacy_parser():
+    """
+    Returns the parser for the original single-command interface, where cache
+    maintenance options run before an optional build.
+    """
+    parser = argparse.ArgumentParser(
+        description="Download LessWrong posts and create an EPUB.",
+        epilog=f"Subcommands: {', '.join(COMMANDS)} (see '%(prog)s COMMAND --help'). "
+        "Without one, the options above build a book after any cache maintenance they ask for.")
+    add_build_arguments(parser)
+    # Not required so cache maintenance options can run without building a book
+    add_source_arguments(parser)
+    add_profile_arguments(parser)
+    add_cache_arguments(parser)
+    parser.add_argument('--clear-cache', choices=CACHE_TYPES,
+                        help="Clear specified cache before running.")
+    parser.add_argument('--cache-stats', action='store_true',
+                        help="Print entry counts, expired entries and sizes of the cache.")
+    parser.add_argument('--invalidate-older-than', type=float, metavar='DAYS',
+                        help="Remove page, post and sequence cache entries older than DAYS.")
+    add_cache_size_arguments(parser)
+    parser.add_argument('--prune', action='store_true',
+                        help="Apply --cache-max-size/--images-max-size now; can run without building a book.")
+    parser.add_argument('--invalidate-sequence', metavar='URL',
+                        help="Remove a cached sequence (or sequence list) and the pages and posts it lists.")
+    add_fetch_arguments(parser)
+    return parser
+
+
+def build_parser():
+    """Returns the parser for the build, prefetch and cache subcommands."""
+    parser = argparse.ArgumentParser(
+        description="Download LessWrong posts and create an EPUB.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="Download posts and create an EPUB.",
+                                description="Download posts and create an EPUB.")
+    add_build_arguments(build)
+    add_source_arguments(build, required=True)
+    add_profile_arguments(build)
+    add_cache_arguments(build)
+    add_cache_size_arguments(build)
+    add_fetch_arguments(build)
+
+    prefetch = commands.add_parser('prefetch', help="Download posts and their images into the cache.",
+                                   description="Download posts and their images into the cache "
+                                   "without building a book, so later builds run from the cache.")
+    add_source_arguments(prefetch, required=True)
+    add_profile_arguments(prefetch)
+    add_cache_arguments(prefetch, no_cache=False)
+    add_cache_size_arguments(prefetch)
+    add_fetch_arguments(prefetch)
+
+    cache = commands.add_parser('cache', help="Inspect and maintain the cache.",
+                                description="Inspect and maintain the cache.")
+    cache_commands = cache.add_subparsers(dest='cache_command', required=True)
+    clear = cache_commands.add_parser('clear', help="Clear a cache.")
+    clear.add_argument('cache_type', nargs='?', choices=CACHE_TYPES, default='all',
+                       help="Cache to clear (default: all)")
+    stats = cache_commands.add_parser('stats', help="Print entry counts, expired entries and sizes of the cache.")
+    prune = cache_commands.add_parser('prune', help="Evict least recently used entries beyond size limits.")
+    add_cache_size_arguments(prune, when="")
+    invalidate = cache_commands.add_parser('invalidate', help="Remove stale or selected cache entries.")
+    invalidate.add_argument('--older-than', type=float, metavar='DAYS',
+                            help="Remove page, post and sequence cache entries older than DAYS.")
+    invalidate.add_argument('--sequence', metavar='URL',
+                            help="Remove a cached sequence (or sequence list) and the pages and posts it lists.")
+    for subparser in [clear, stats, prune, invalidate]:
+        add_cache_arguments(subparser, no_cache=False)
+
+    # Errors are reported with the usage of the subcommand that raised them
+    for subparser in [build, prefetch, clear, stats, prune, invalidate]:
+        subparser.set_defaults(command_parser=subparser)
+    return parser
+
+
+def configure_run(args):
+    """Applies the settings shared by every command: parser, backend and profiling."""
+    global HTML_PARSER, CONTENT_BACKEND, _profiler
+    HTML_PARSER = getattr(args, 'parser', HTML_PARSER)
+    CONTENT_BACKEND = getattr(args, 'backend', CONTENT_BACKEND)
+
+    # Reports are written at exit, so interrupted and failed runs are profiled too
+    if getattr(args, 'profile', None):
+        _profiler = Profiler()
+        atexit.register(write_profile_report, args.profile)
+    if getattr(args, 'profile_cprofile', None):
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+        atexit.register(cprofiler.dump_stats, args.profile_cprofile)
+
+
+def prepare_cache(args):
+    """
+    Creates the cache directories and selects the cache backend. Handlers call this once
+    their arguments are checked, so invalid invocations don't leave a cache behind.
+    """
     setup_cache_dirs()
+    configure_cache_backend(args.cache_backend)
 
-    # Handle cache clearing if requested
-    if args.clear_cache:
-        clear_cache(args.clear_cache)
 
-    # Determine cache settings
-    use_cache = not args.no_cache
-    cache_days = args.cache_days
+def restore_journal_options(args, parser, journal):
+    """
+    Applies the build options saved in the journal being resumed to args. Options given on
+    the command line must match them, since the journaled posts were built that way.
+    """
+    global HTML_PARSER, CONTENT_BACKEND
+    restored = []
+    for dest, value in journal.options.items():
+        if not hasattr(args, dest):
+            continue
+        current, flag = getattr(args, dest), '--' + dest.replace('_', '-')
+        if current != parser.get_default(dest) and current != value:
+            parser.error(f"{flag} differs from the resumed run ({value}); "
+                         "leave it out to resume with the journaled options")
+        if current != value:
+            setattr(args, dest, value)
+            restored.append(flag if value is True else f"{flag} {value}")
+    HTML_PARSER = getattr(args, 'parser', HTML_PARSER)
+    CONTENT_BACKEND = getattr(args, 'backend', CONTENT_BACKEND)
+    if restored:
+        print(f"Restored the journaled options: {' '.join(restored)}")
+
+
+def get_bestof_filter(args):
+    """Checks --year and --category, returning them as get_urls_from_bestof expects."""
+    valid_years = [str(y) for y in range(2018, 2025)] + ["all"]
+    valid_categories_lower = ["rationality", "world", "optimization", "ai strategy",
+                              "technical ai safety", "practical", "all"]
+
+    year_arg_lower = args.year.lower()
+    if year_arg_lower not in valid_years:
+        print(f"Invalid year: {args.year}. Valid: {valid_years}.")
+        exit(1)
 
-    if args.file:
-        all_post_urls = get_urls_from_file(args.file)
-    elif args.sequence:
-        all_post_urls = get_urls_from_sequence(
-            args.sequence, use_cache, cache_days)
-    elif args.sequence_list:
-        all_post_urls = get_urls_from_sequence_list(
-            args.sequence_list, use_cache, cache_days)
-    elif args.bestof:
-        valid_years = [str(y) for y in range(2018, 2025)] + ["all"]
-        valid_categories_lower = ["rationality", "world", "optimization", "ai strategy",
-                                  "technical ai safety", "practical", "all"]
-
-        year_arg_lower = args.year.lower()
-        if year_arg_lower not in valid_years:
-            print(f"Invalid year: {args.year}. Valid: {valid_years}.")
+    category_arg_lower = args.category.lower()
+    # Ensure we use the properly cased category name if a valid lowercase alias is given
+    category_to_use = args.category
+    if category_arg_lower != "all":  # "all" doesn't need case matching
+        found_cat = False
+        for cat_proper_case in ["Rationality", "World", "Optimization", "AI Strategy", "Technical AI Safety", "Practical"]:
+            if category_arg_lower == cat_proper_case.lower():
+                category_to_use = cat_proper_case
+                found_cat = True
+                break
+        if not found_cat:
+            print(
+                f"Invalid category: {args.category}. Valid (case-insensitive): {valid_categories_lower}.")
             exit(1)
 
-        category_arg_lower = args.category.lower()
-        # Ensure we use the properly cased category name if a valid lowercase alias is given
-        category_to_use = args.category
-        if category_arg_lower != "all":  # "all" doesn't need case matching
-            found_cat = False
-            for cat_proper_case in ["Rationality", "World", "Optimization", "AI Strategy", "Technical AI Safety", "Practical"]:
-                if category_arg_lower == cat_proper_case.lower():
-                    category_to_use = cat_proper_case
-                    found_cat = True
-                    break
-            if not found_cat:
-                print(
-                    f"Invalid category: {args.category}. Valid (case-insensitive): {valid_categories_lower}.")
-                exit(1)
+    return year_arg_lower, category_to_use if category_arg_lower != "all" else "all"
+
+
+def collect_post_urls(args, parser, use_cache, cache_days):
+    """
+    Resolves the posts to download from the source options (or the journal being resumed),
+    deduplicated and limited. Returns (post URLs, journal or None).
+    """
+    # A journal holds the progress of a run, so it is only started over on request
+    if args.journal and not args.resume and os.path.exists(args.journal) and not args.overwrite_journal:
+        parser.error(f"{args.journal} already exists; continue its run with --resume {args.journal} "
+                     "or pass --overwrite-journal to start it over")
 
-        all_post_urls = get_urls_from_bestof(
-            year_arg_lower, category_to_use if category_arg_lower != "all" else "all", use_cache, cache_days)
+    # Share one keep-alive session, with at least one connection per download thread
+    configure_http_session(
+        max(args.pool_size, args.workers * args.image_download_workers))
+
+    all_post_urls = []
+    journal = None
+    with profile_stage('collect_urls'):
+        if args.resume:
+            if args.journal and args.journal != args.resume:
+                parser.error("--resume keeps journaling to JOURNAL; don't pass a different --journal")
+            try:
+                journal = RunJournal(args.resume, resume=True)
+            except (OSError, ValueError) as e:
+                print(f"Cannot resume from {args.resume}: {e}")
+                exit(1)
+            done = sum(journal.has_post(url) for url in journal.urls)
+            print(f"Resuming from {args.resume}: {done} of {len(journal.urls)} posts and "
+                  f"{len(journal.images)} optimized images already done"
+                  + (" (the journaled run had finished)" if journal.finished else ""))
+            restore_journal_options(args, parser, journal)
+            all_post_urls = journal.urls
+        elif args.file:
+            all_post_urls = get_urls_from_file(args.file)
+        elif args.bestof:
+            bestof_year, bestof_category = get_bestof_filter(args)
+
+        # The options (and a --file or journal to read URLs from) are all checked by now,
+        # so rejected runs leave no cache behind
+        if all_post_urls or not (args.resume or args.file):
+            prepare_cache(args)
+        if args.sequence:
+            all_post_urls = get_urls_from_sequence(
+                args.sequence, use_cache, cache_days)
+        elif args.sequence_list:
+            all_post_urls = get_urls_from_sequence_list(
+                args.sequence_list, use_cache, cache_days, max(1, args.workers))
+        elif args.bestof:
+            all_post_urls = get_urls_from_bestof(bestof_year, bestof_category, use_cache, cache_days)
 
     if not all_post_urls:
         print("No URLs to process. Exiting.")
@@ -1495,7 +4030,6 @@ if __name__ == "__main__":
 
     print(
         f"\nCollected {len(set(all_post_urls))} unique post URLs. Fetching content...")  # Use set for unique count display
-    posts_data = []
     processed_urls = set()  # Use a set for efficient duplicate checking
 
     # Deduplicate URLs before processing
@@ -1510,60 +4044,210 @@ if __name__ == "__main__":
         unique_urls_ordered = unique_urls_ordered[:args.limit]
         print(f"Limiting to first {args.limit} posts as requested.")
 
-    # Reset processed_urls for the fetching loop if needed, or just use unique_urls_ordered
-    # For clarity, we'll iterate unique_urls_ordered and re-use processed_urls for actual fetching status
-    processed_urls_during_fetch = set()
+    if args.journal and not args.resume:
+        journal = RunJournal(args.journal)
+        journal.record_urls(unique_urls_ordered, {dest: getattr(args, dest) for dest in JOURNAL_OPTIONS
+                                                  if hasattr(args, dest)})
 
-    for url_to_process in unique_urls_ordered:
-        # This check is somewhat redundant now if unique_urls_ordered is truly unique,
-        # but kept for safety / if all_post_urls was not pre-deduplicated.
-        if url_to_process in processed_urls_during_fetch:
-            # Should not happen with unique_urls_ordered
-            print(f"Skipping already processed URL: {url_to_process}")
-            continue
+    return unique_urls_ordered, journal
 
-        post_data = get_post_content(url_to_process, use_cache, cache_days)
-        if post_data:
-            posts_data.append(post_data)
-            processed_urls_during_fetch.add(url_to_process)
-        else:
-            print(f"Failed to retrieve or parse post: {url_to_process}")
-
-    if posts_data:
-        if args.no_images:
-            # Process HTML to remove image references
-            for post in posts_data:
-                soup = BeautifulSoup(post['content'], 'html.parser')
-                for img in soup.find_all('img'):
-                    # Replace with alt text in brackets
-                    alt_text = img.get('alt', 'Image')
-                    replacement = soup.new_tag('span')
-                    replacement['class'] = 'image-placeholder'
-                    replacement.string = f"[{alt_text}]"
-                    img.replace_with(replacement)
-                post['content'] = str(soup)
-            print("Images have been removed from content as requested.")
-
-        if args.split:
-            volumes = split_epub_by_size(posts_data, args.max_posts_per_file,
-                                         os.path.splitext(args.output)[0])
-            for i, volume in enumerate(volumes):
-                vol_title = f"{args.title} - Vol {i+1}" if len(
-                    volumes) > 1 else args.title
-                print(
-                    f"\nCreating volume {i+1} of {len(volumes)}: {volume['filename']}")
-                epub_path = create_epub(volume["posts"], volume["filename"], vol_title, args.author,
+
+def prefetch_for_backend(args, post_urls, use_cache, cache_days):
+    """Batch-fetches post_urls ahead of extraction, as the chosen backends allow."""
+    if args.backend == 'graphql':
+        prefetch_posts_graphql(post_urls, use_cache, cache_days,
+                               max(1, args.batch_size))
+        if args.fetch_backend == 'async':
+            print("--fetch-backend async prefetches post pages, which the graphql backend doesn't use. Skipping.")
+    elif args.fetch_backend == 'async':
+        if not async_prefetch(post_urls, use_cache, cache_days,
+                              max(1, args.async_concurrency)):
+            exit(1)
+
+
+def prune_after_run(args):
+    """Keeps disk usage bounded; entries used by this run are the most recently accessed."""
+    if args.cache_max_size is not None or args.images_max_size is not None:
+        removed = prune_cache(args.cache_max_size, args.images_max_size)
+        print(f"Pruned {removed} cache entries.")
+
+
+def run_build(args, parser):
+    """Downloads the selected posts and builds the EPUB (or volumes)."""
+    # Determine cache settings
+    use_cache = not args.no_cache
+    cache_days = args.cache_days
+
+    unique_urls_ordered, journal = collect_post_urls(
+        args, parser, use_cache, cache_days)
+
+    # Journaled posts don't need prefetching
+    urls_to_fetch = [url for url in unique_urls_ordered
+                     if journal is None or not journal.has_post(url)]
+    prefetch_for_backend(args, urls_to_fetch, use_cache, cache_days)
+
+    split = args.split or args.max_volume_mb is not None
+    if args.no_images:
+        print("Images will be removed from content as requested.")
+
+    if (args.streaming or args.incremental) and not split:
+        # Pipeline posts straight into the streaming writer, window posts at a time
+        window = max(1, args.pipeline_window)
+        posts = iter_posts(unique_urls_ordered, use_cache, cache_days, max(1, args.workers),
+                           max(1, args.image_download_workers), window, journal)
+        epub_path = create_epub(posts, args.output, args.title, args.author,
+                                args.max_image_width, args.jpeg_quality, args.png_compression,
+                                args.max_image_size, args.kindle_compatible, args.image_workers,
+                                args.no_images, args.streaming, args.incremental, window, journal)
+        epub_paths = [epub_path]
+
+        if args.create_mobi and epub_path:
+            convert_to_mobi(epub_path)
+    else:
+        posts_data = fetch_posts(unique_urls_ordered, use_cache, cache_days,
+                                 max(1, args.workers), max(1, args.image_download_workers), journal)
+        epub_paths = []
+
+        if posts_data:
+            if split:
+                image_sizes = None
+                if args.max_volume_mb is not None and not args.no_images:
+                    print("Estimating optimized image sizes to plan volumes...")
+                    image_sizes = estimate_image_sizes(posts_data, args.max_image_width, args.jpeg_quality,
+                                                       args.png_compression, args.max_image_size,
+                                                       args.kindle_compatible, args.image_workers)
+                max_posts_per_file = args.max_posts_per_file
+                if max_posts_per_file is None and args.max_volume_mb is None:
+                    max_posts_per_file = DEFAULT_MAX_POSTS_PER_FILE
+                volumes = split_epub_by_size(posts_data, max_posts_per_file,
+                                             os.path.splitext(args.output)[0], args.max_volume_mb,
+                                             image_sizes)
+                epub_options = dict(max_image_width=args.max_image_width, jpeg_quality=args.jpeg_quality,
+                                    png_compression=args.png_compression, max_image_size_mb=args.max_image_size,
+                                    kindle_compatible=args.kindle_compatible, optimize_workers=args.image_workers,
+                                    no_images=args.no_images, streaming=args.streaming,
+                                    incremental=args.incremental, journal=journal)
+                epub_paths = create_volumes(volumes, args.title, args.author, epub_options,
+                                            args.volume_workers)
+
+                for epub_path in epub_paths:
+                    if args.create_mobi and epub_path:
+                        convert_to_mobi(epub_path)
+            else:
+                epub_path = create_epub(posts_data, args.output, args.title, args.author,
                                         args.max_image_width, args.jpeg_quality, args.png_compression,
-                                        args.max_image_size, args.kindle_compatible)
+                                        args.max_image_size, args.kindle_compatible, args.image_workers,
+                                        args.no_images, args.streaming, args.incremental,
+                                        journal=journal)
+                epub_paths = [epub_path]
 
                 if args.create_mobi and epub_path:
                     convert_to_mobi(epub_path)
         else:
-            epub_path = create_epub(posts_data, args.output, args.title, args.author,
-                                    args.max_image_width, args.jpeg_quality, args.png_compression,
-                                    args.max_image_size, args.kindle_compatible)
+            print("No post content successfully retrieved. EPUB not created.")
+
+    if journal is not None:
+        if epub_paths and all(epub_paths):
+            journal.record_finished(epub_paths)
+        journal.close()
+
+    prune_after_run(args)
+
+
+def run_prefetch(args, parser):
+    """Downloads the selected posts and their images into the cache without building a book."""
+    cache_days = args.cache_days
+    unique_urls_ordered, journal = collect_post_urls(
+        args, parser, True, cache_days)
+
+    urls_to_fetch = [url for url in unique_urls_ordered
+                     if journal is None or not journal.has_post(url)]
+    prefetch_for_backend(args, urls_to_fetch, True, cache_days)
+
+    fetched = 0
+    for _ in iter_posts(unique_urls_ordered, True, cache_days, max(1, args.workers),
+                        max(1, args.image_download_workers), journal=journal):
+        fetched += 1
+    print(f"\nCached {fetched} of {len(unique_urls_ordered)} posts.")
+
+    if journal is not None:
+        journal.close()
+
+    prune_after_run(args)
+
+
+def run_cache(args, parser):
+    """Runs a cache subcommand."""
+    if args.cache_command == 'prune' and args.cache_max_size is None and args.images_max_size is None:
+        parser.error("cache prune requires --cache-max-size and/or --images-max-size")
+    if args.cache_command == 'invalidate' and args.older_than is None and not args.sequence:
+        parser.error("cache invalidate requires --older-than and/or --sequence")
+    prepare_cache(args)
+
+    if args.cache_command == 'clear':
+        clear_cache(args.cache_type)
+    elif args.cache_command == 'stats':
+        print_cache_stats(args.cache_days)
+    elif args.cache_command == 'prune':
+        removed = prune_cache(args.cache_max_size, args.images_max_size)
+        print(f"Pruned {removed} cache entries.")
+    elif args.cache_command == 'invalidate':
+        removed = invalidate_cache(args.older_than, args.sequence)
+        print(f"Removed {removed} cache entries.")
+
+
+def run_legacy(args, parser):
+    """Runs the original interface: the requested cache maintenance, then a build if a source is given."""
+    maintenance = args.clear_cache or args.cache_stats or args.invalidate_older_than is not None \
+        or args.invalidate_sequence or args.prune
+    has_source = args.file or args.sequence or args.sequence_list or args.bestof or args.resume
+    if args.prune and args.cache_max_size is None and args.images_max_size is None:
+        parser.error("--prune requires --cache-max-size and/or --images-max-size")
+    if not (has_source or maintenance):
+        parser.error(
+            "one of the arguments --file --sequence --sequence-list --bestof --resume is required")
+    if maintenance:
+        prepare_cache(args)
+
+    # Handle cache clearing if requested
+    if args.clear_cache:
+        clear_cache(args.clear_cache)
+
+    if args.invalidate_older_than is not None or args.invalidate_sequence:
+        removed = invalidate_cache(
+            args.invalidate_older_than, args.invalidate_sequence)
+        print(f"Removed {removed} cache entries.")
+
+    if args.cache_stats:
+        print_cache_stats(args.cache_days)
+
+    if not has_source:
+        if args.prune:
+            removed = prune_cache(args.cache_max_size, args.images_max_size)
+            print(f"Pruned {removed} cache entries.")
+        exit(0)  # Cache maintenance only
+
+    run_build(args, parser)
 
-            if args.create_mobi and epub_path:
-                convert_to_mobi(epub_path)
+
+def main(argv=None):
+    """Runs a subcommand, or the original interface when the first argument isn't one."""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        parser = build_parser()
+        args = parser.parse_args(argv)
+        handler = {'build': run_build, 'prefetch': run_prefetch,
+                   'cache': run_cache}[args.command]
+        parser = args.command_parser
     else:
-        print("No post content successfully retrieved. EPUB not created.")
+        parser = build_legacy_parser()
+        args = parser.parse_args(argv)
+        handler = run_legacy
+
+    configure_run(args)
+    handler(args, parser)
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Shared fixtures: a scratch working directory for the caches, and a local stand-in for
+LessWrong serving the pages and images in benchmarks/fixtures over http.server.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(REPO_DIR, "benchmarks", "fixtures")
+sys.path.insert(0, REPO_DIR)
+
+import lw_to_epub as lw  # noqa: E402
+
+# Paths the fixture pages are served under; their images point at FIXTURE_IMAGE_URL
+FIXTURE_POSTS = {
+    "post_long.html": "/posts/benchlong/updating-on-weak-evidence",
+    "post_short.html": "/posts/benchshort/a-short-note",
+    "post_messy.html": "/posts/benchmessy/legacy-post",
+}
+FIXTURE_IMAGES = {
+    "diagram.png": "image/png",
+    "photo.jpg": "image/jpeg",
+    "chart.png": "image/png",
+    "animation.gif": "image/gif",
+}
+FIXTURE_IMAGE_URL = "https://res.cloudinary.com/lesswrong-2-0/image/upload/v1/benchmark/"
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Keep connections open between requests, like the real site
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.stand_in.connections += 1
+
+    def do_GET(self):
+        stand_in = self.server.stand_in
+        stand_in.requests.append(('GET', self.path))
+        time.sleep(stand_in.delays.get(self.path, 0))
+        route = stand_in.routes.get(self.path)
+        if route is None:
+            self.send_error(404)
+            return
+        content_type, body = route
+        etag = stand_in.etags.get(self.path)
+        if etag is not None and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        stand_in = self.server.stand_in
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        stand_in.requests.append(('POST', self.path))
+        if self.path != '/graphql' or stand_in.graphql is None:
+            self.send_error(404)
+            return
+        body = json.dumps(stand_in.graphql(payload)).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer:
+    """
+    Serves routes ({path: (content type, body)}) over HTTP on a free local port, answers
+    POSTs to /graphql with graphql(payload) and records every request in requests.
+    Paths in etags ({path: ETag}) are answered with 304 when the request has a matching
+    If-None-Match. Paths in delays ({path: seconds}) are answered that much later.
+    connections counts the connections accepted.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.etags = {}
+        self.delays = {}
+        self.requests = []
+        self.connections = 0
+        self.graphql = None
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        self.httpd.stand_in = self
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return self.base_url + path
+
+    def add_fixture_posts(self):
+        """Serves the fixture posts, with their images on this server. Returns the post URLs in order."""
+        for name, content_type in FIXTURE_IMAGES.items():
+            self.routes[f"/images/{name}"] = (content_type, read_fixture(name))
+        post_urls = []
+        for name, path in FIXTURE_POSTS.items():
+            page = read_fixture(name).replace(FIXTURE_IMAGE_URL.encode(), self.url('/images/').encode())
+            self.routes[path] = ('text/html; charset=utf-8', page)
+            post_urls.append(self.url(path))
+        return post_urls
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Runs the test in an empty directory, so the caches and outputs start empty, without request delays."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(lw, 'REQUEST_DELAY', 0)
+    monkeypatch.setattr(lw, 'RETRY_DELAY', 0)
+    monkeypatch.setattr(lw, 'HTML_PARSER', lw.HTML_PARSER)
+    monkeypatch.setattr(lw, 'CONTENT_BACKEND', 'html')
+    monkeypatch.setattr(lw, '_prefetched_pages', {})
+    # SQLite connections are per thread and the database path is relative to the working directory
+    monkeypatch.setattr(lw, '_cache_db_local', threading.local())
+    monkeypatch.setattr(lw, '_cache_db_accesses', {})
+    lw.setup_cache_dirs()
+    lw.configure_cache_backend('files')
+    return tmp_path
+
+
+@pytest.fixture
+def server(monkeypatch):
+    stand_in = StandInServer()
+    monkeypatch.setattr(lw, 'BASE_URL', stand_in.base_url)
+    monkeypatch.setattr(lw, 'GRAPHQL_URL', stand_in.url('/graphql'))
+    yield stand_in
+    stand_in.close()
+
+
+def fresh_workdir(tmp_path, name):
+    """Switches to a new empty directory under tmp_path, for comparing runs with separate caches."""
+    path = tmp_path / name
+    path.mkdir()
+    os.chdir(path)
+    lw.setup_cache_dirs()
+    return path
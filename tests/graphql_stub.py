@@ -0,0 +1,71 @@
+"""
+A stand-in for LessWrong's GraphQL endpoint. It answers the post and sequence queries
+lw_to_epub sends, single or aliased in batches, from posts and sequences held in memory.
+"""
+import re
+
+import lxml.html
+
+# A post or sequence field of a query: "[alias:] post(input: {selector: {_id: $var}})"
+FIELD = re.compile(r'(?:(\w+)\s*:\s*)?(post|sequence)\s*\(\s*input:\s*\{\s*selector:\s*\{\s*_id:\s*(\$\w+|"[^"]*")\s*\}\s*\}\s*\)')
+
+
+class GraphQLStub:
+    """
+    Called with a request payload, returns the response payload. Posts in failing_ids are
+    answered with a null result and an entry in 'errors', like a partly failed query.
+    """
+
+    def __init__(self):
+        self.posts = {}
+        self.sequences = {}
+        self.failing_ids = set()
+        self.queries = []
+
+    def add_post(self, post_id, title, author, posted_at, body_html):
+        self.posts[post_id] = {
+            '_id': post_id,
+            'title': title,
+            'slug': post_id,
+            'postedAt': posted_at,
+            'user': {'displayName': author},
+            'contents': {'html': body_html},
+        }
+
+    def add_post_from_page(self, post_id, page):
+        """Adds the post shown on a server-rendered post page, as the API would return it."""
+        doc = lxml.html.fromstring(page)
+        body = doc.xpath('//div[@id="postContent"]//div[contains(@class, "InlineReactSelectionWrapper-root")]/div')[0]
+        body_html = (body.text or "") + "".join(
+            lxml.html.tostring(child, encoding='unicode') for child in body)
+        self.add_post(post_id,
+                      doc.xpath('string(//h1[contains(@class, "PostsPageTitle-root")])').strip(),
+                      doc.xpath('string(//*[contains(@class, "PostsAuthors-authorName")])').strip(),
+                      doc.xpath('string(//time/@datetime)'),
+                      body_html)
+
+    def add_sequence(self, sequence_id, chapters):
+        """Adds a sequence; chapters is a list of lists of post ids."""
+        self.sequences[sequence_id] = {
+            '_id': sequence_id,
+            'title': sequence_id,
+            'chapters': [{'posts': [{'_id': post_id, 'slug': post_id} for post_id in chapter]}
+                         for chapter in chapters],
+        }
+
+    def __call__(self, payload):
+        self.queries.append(payload)
+        variables = payload.get('variables') or {}
+        data, errors = {}, []
+        for alias, kind, ref in FIELD.findall(payload['query']):
+            value = variables.get(ref[1:]) if ref.startswith('$') else ref.strip('"')
+            if kind == 'post' and value in self.failing_ids:
+                data[alias or kind] = None
+                errors.append({'message': f"Post {value} failed", 'path': [alias or kind]})
+                continue
+            result = self.posts.get(value) if kind == 'post' else self.sequences.get(value)
+            data[alias or kind] = {'result': result}
+        response = {'data': data}
+        if errors:
+            response['errors'] = errors
+        return response
@@ -0,0 +1,76 @@
+"""Tests for the offline benchmark suite in benchmarks/benchmark.py."""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import REPO_DIR, lw
+
+BENCHMARK_PATH = os.path.join(REPO_DIR, "benchmarks", "benchmark.py")
+
+
+@pytest.fixture
+def benchmark(workdir, monkeypatch):
+    spec = importlib.util.spec_from_file_location("benchmark", BENCHMARK_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    def no_network():
+        raise AssertionError("the benchmarks run without network")
+    monkeypatch.setattr(lw, 'get_http_session', no_network)
+    module.seed_image_cache()
+    return module
+
+
+def test_benchmarks_run_offline_on_the_fixtures(benchmark):
+    benchmarks = benchmark.get_benchmarks(argparse.Namespace(posts=4))
+
+    assert [name for name, *_ in benchmarks] == [
+        "make_soup", "get_post_content", "clean_html_for_epub", "clean_html_for_kindle_compatibility",
+        "optimize_image_for_epub", "create_epub", "create_epub --streaming"]
+    for name, unit, items, size, function in benchmarks:
+        assert items > 0 and size > 0, name
+        function()
+    assert os.path.getsize("benchmark.epub") > 0
+
+
+def test_fixture_posts_use_the_seeded_images(benchmark):
+    seeded = {lw.get_image_filename(benchmark.FIXTURE_IMAGE_URL + name) for name in benchmark.FIXTURE_IMAGES}
+    referenced = set()
+    for name, url in benchmark.FIXTURE_PAGES.items():
+        post = benchmark.extract_post(url, benchmark.read_fixture(name))
+
+        assert post['title'] and post['content'], name
+        referenced.update(post['images'])
+
+    assert referenced == seeded
+
+
+def run_suite(tmp_path, *argv):
+    result = subprocess.run([sys.executable, BENCHMARK_PATH, '--repeat', '1', '--posts', '3', *argv],
+                            cwd=tmp_path, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+
+def test_results_can_be_saved_and_compared(tmp_path):
+    run_suite(tmp_path, '--json', 'results.json')
+
+    report = json.loads((tmp_path / "results.json").read_text())
+    assert report['meta']['repeat'] == 1 and report['meta']['posts'] == 3
+    assert len(report['results']) == 7
+    for name, result in report['results'].items():
+        assert result['items_per_second'] > 0 and result['mb_per_second'] > 0, name
+    # Runs leave nothing behind in the working directory
+    assert os.listdir(tmp_path) == ["results.json"]
+
+    output = run_suite(tmp_path, '--only', 'clean_html', '--compare', 'results.json')
+    lines = output.splitlines()
+    assert "vs previous" in lines[0]
+    assert [line.split()[0] for line in lines[1:]] == ["clean_html_for_epub",
+                                                      "clean_html_for_kindle_compatibility"]
+    assert all(line.endswith("x") for line in lines[1:])
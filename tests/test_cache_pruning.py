@@ -0,0 +1,78 @@
+"""Tests for least recently used cache pruning (--cache-max-size, --images-max-size, cache prune)."""
+import os
+
+import pytest
+
+from conftest import lw
+
+
+def write_file(path, size, accessed):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    os.utime(path, (accessed, accessed))
+
+
+@pytest.mark.parametrize('backend', ['files', 'sqlite'])
+def test_post_with_evicted_images_is_extracted_again(workdir, server, backend):
+    lw.configure_cache_backend(backend)
+    post_url = server.add_fixture_posts()[0]
+    post = lw.get_post_content(post_url, use_cache=True)
+    assert post['images']
+
+    # Evict every image, keeping the cached page and post
+    assert lw.prune_cache(max_images_mb=0) == len(post['images'])
+    assert lw.get_cached_post_data(post_url) is None
+
+    server.requests.clear()
+    assert lw.get_post_content(post_url, use_cache=True) == post
+    for image in post['images']:
+        assert os.path.isfile(os.path.join(lw.IMAGES_DIR, image))
+    # The page came from the page cache, only the images were downloaded again
+    assert sorted(path for _, path in server.requests) == sorted(
+        f"/images/{image.split('_', 1)[1]}" for image in post['images'])
+
+
+def test_cached_post_with_its_images_is_a_hit(workdir, server):
+    post_url = server.add_fixture_posts()[0]
+    post = lw.get_post_content(post_url, use_cache=True)
+
+    assert lw.get_cached_post_data(post_url) == post
+
+
+def test_lru_entries_group_only_the_files_of_one_entry(workdir):
+    key = "0123abcd_w800_q75_c9"
+    derivatives = {
+        f"{key}_s5.0_epub": 100,
+        f"{key}_s5.0_kindle": 200,
+        f"{key}_s2.5_epub": 400,
+    }
+    for name, size in derivatives.items():
+        write_file(os.path.join(lw.DERIVATIVE_CACHE_DIR, f"{name}.bin"), size, 1000)
+        write_file(os.path.join(lw.DERIVATIVE_CACHE_DIR, f"{name}.json"), 10, 1000)
+    write_file(os.path.join(lw.PAGE_CACHE_DIR, "page1.page"), 50, 1000)
+    write_file(os.path.join(lw.PAGE_CACHE_DIR, "page1.meta.json"), 5, 2000)
+    write_file(os.path.join(lw.IMAGE_META_DIR, "abc_photo.jpg.json"), 7, 1000)
+    write_file(os.path.join(lw.IMAGE_META_DIR, "abc_photo.png.json"), 9, 1000)
+
+    entries = {tuple(sorted(os.path.basename(path) for path in entry['paths'])): entry
+               for entry in lw.get_lru_entries(lw.CACHE_DIR)}
+
+    expected = {(f"{name}.bin", f"{name}.json"): size + 10 for name, size in derivatives.items()}
+    expected[("page1.meta.json", "page1.page")] = 55
+    expected[("abc_photo.jpg.json",)] = 7
+    expected[("abc_photo.png.json",)] = 9
+    assert {files: entry['size'] for files, entry in entries.items()} == expected
+    assert entries[("page1.meta.json", "page1.page")]['accessed'] == 2000
+
+
+def test_prune_evicts_least_recently_used_derivative_only(workdir):
+    old, new = "0123abcd_w800_q75_c9_s5.0_epub", "0123abcd_w800_q75_c9_s5.0_kindle"
+    write_file(os.path.join(lw.DERIVATIVE_CACHE_DIR, f"{old}.bin"), 600 * 1024, 1000)
+    write_file(os.path.join(lw.DERIVATIVE_CACHE_DIR, f"{old}.json"), 10, 1000)
+    write_file(os.path.join(lw.DERIVATIVE_CACHE_DIR, f"{new}.bin"), 600 * 1024, 2000)
+    write_file(os.path.join(lw.DERIVATIVE_CACHE_DIR, f"{new}.json"), 10, 2000)
+
+    assert lw.prune_cache(max_cache_mb=1) == 1
+
+    assert sorted(os.listdir(lw.DERIVATIVE_CACHE_DIR)) == [f"{new}.bin", f"{new}.json"]
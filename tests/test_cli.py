@@ -0,0 +1,97 @@
+"""Tests for the command line: subcommands, argument checks and light startup."""
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import FIXTURE_IMAGES, FIXTURE_POSTS, REPO_DIR, lw
+
+SCRIPT_PATH = os.path.join(REPO_DIR, "lw_to_epub.py")
+
+
+def load_import_time():
+    spec = importlib.util.spec_from_file_location(
+        "import_time", os.path.join(REPO_DIR, "benchmarks", "import_time.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_cli(tmp_path, *argv):
+    return subprocess.run([sys.executable, SCRIPT_PATH, *argv], cwd=tmp_path,
+                          capture_output=True, text=True, timeout=120)
+
+
+@pytest.mark.parametrize('argv', [
+    [],
+    ['build'],
+    ['build', '--file', 'urls.txt', '--sequence', 'https://example.com/s/abc'],
+    ['build', '--file', 'missing.txt'],
+    ['build', '--bestof', '--year', '1999'],
+    ['cache', 'prune'],
+    ['cache', 'invalidate'],
+    ['--prune'],
+    ['--file', 'missing.txt'],
+])
+def test_rejected_invocations_leave_no_cache_behind(tmp_path, argv):
+    result = run_cli(tmp_path, *argv)
+
+    assert result.returncode != 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_existing_journal_is_refused_before_the_cache_is_created(tmp_path):
+    (tmp_path / "urls.txt").write_text("https://example.com/posts/abc/a-post\n")
+    (tmp_path / "run.journal").write_text("")
+
+    result = run_cli(tmp_path, 'build', '--file', 'urls.txt', '--journal', 'run.journal')
+
+    assert result.returncode == 2 and "--overwrite-journal" in result.stderr
+    assert sorted(os.listdir(tmp_path)) == ["run.journal", "urls.txt"]
+
+
+@pytest.mark.parametrize('name,arguments', load_import_time().COMMANDS)
+def test_light_commands_skip_the_heavy_libraries(tmp_path, name, arguments):
+    import_time = load_import_time()
+
+    _, loaded = import_time.time_command(SCRIPT_PATH, arguments, str(tmp_path))
+
+    assert loaded == [], name
+
+
+def test_cache_stats_subcommand(tmp_path):
+    result = run_cli(tmp_path, 'cache', 'stats')
+
+    assert result.returncode == 0
+    assert result.stdout.splitlines()[0] == "Cache statistics (files backend):"
+
+
+def test_prefetch_fills_the_cache_for_build(workdir, server):
+    with open("urls.txt", 'w', encoding='utf-8') as f:
+        f.write("\n".join(server.add_fixture_posts()) + "\n")
+
+    lw.main(['prefetch', '--file', 'urls.txt'])
+    assert not os.path.exists("book.epub")
+    server.requests.clear()
+
+    lw.main(['build', '--file', 'urls.txt', '-o', 'book.epub'])
+    assert server.requests == []
+    assert os.path.getsize("book.epub") > 0
+
+
+def test_cache_clear_subcommand(workdir, server):
+    with open("urls.txt", 'w', encoding='utf-8') as f:
+        f.write("\n".join(server.add_fixture_posts()) + "\n")
+    lw.main(['prefetch', '--file', 'urls.txt'])
+
+    with pytest.raises(SystemExit):
+        lw.main(['cache', 'clear', 'bogus'])
+    lw.main(['cache', 'clear', 'all'])
+
+    assert all(category['entries'] == 0 for category in lw.get_cache_stats(0).values())
+    server.requests.clear()
+    lw.main(['prefetch', '--file', 'urls.txt'])
+    # Pages and images are all downloaded again
+    assert len(server.requests) == len(FIXTURE_POSTS) + len(FIXTURE_IMAGES)
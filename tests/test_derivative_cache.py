@@ -0,0 +1,86 @@
+"""Tests for the cache of optimized images (lw_cache/derivatives)."""
+import os
+
+import pytest
+
+from conftest import lw
+
+
+@pytest.fixture
+def image_path(workdir, server):
+    server.add_fixture_posts()
+    name = lw.download_image(server.url("/images/photo.jpg"))
+    return os.path.join(lw.IMAGES_DIR, name)
+
+
+@pytest.fixture
+def encodes(monkeypatch):
+    """Records the settings of every image actually encoded."""
+    calls = []
+    encode = lw.encode_image_for_epub
+
+    def counting_encode(source_path, *settings):
+        calls.append(settings)
+        return encode(source_path, *settings)
+    monkeypatch.setattr(lw, 'encode_image_for_epub', counting_encode)
+    return calls
+
+
+def test_same_settings_hit_the_cache(image_path, encodes):
+    first = lw.get_optimized_image(image_path, max_width=300)
+    second = lw.get_optimized_image(image_path, max_width=300)
+
+    assert second == first and first[1] == 'image/jpeg'
+    assert len(encodes) == 1
+
+
+def test_as_path_returns_the_cached_file(image_path, encodes):
+    content, _ = lw.get_optimized_image(image_path, max_width=300)
+    path, media_type = lw.get_optimized_image(image_path, max_width=300, as_path=True)
+
+    assert media_type == 'image/jpeg' and len(encodes) == 1
+    with open(path, 'rb') as f:
+        assert f.read() == content
+
+
+@pytest.mark.parametrize('settings', [
+    {'max_width': 200}, {'jpeg_quality': 40}, {'png_compression': 3},
+    {'max_size_mb': 4.0}, {'kindle_compatible': True},
+])
+def test_changed_settings_miss_the_cache(image_path, encodes, settings):
+    lw.get_optimized_image(image_path)
+    lw.get_optimized_image(image_path, **settings)
+
+    assert len(encodes) == 2
+
+
+def test_changed_image_misses_the_cache(image_path, encodes, server):
+    lw.get_optimized_image(image_path)
+    with open(image_path, 'wb') as f:
+        f.write(server.routes["/images/diagram.png"][1])
+
+    lw.get_optimized_image(image_path)
+
+    assert len(encodes) == 2
+
+
+def test_size_exclusions_are_cached(image_path, encodes):
+    assert lw.get_optimized_image(image_path, max_size_mb=0.000001) == (None, None)
+    assert lw.get_optimized_image(image_path, max_size_mb=0.000001) == (None, None)
+
+    assert len(encodes) == 1
+
+
+def test_failures_are_not_cached(image_path, monkeypatch):
+    encode = lw.encode_image_for_epub
+    failures = [MemoryError()]
+
+    def failing_once(*args):
+        if failures:
+            raise failures.pop()
+        return encode(*args)
+    monkeypatch.setattr(lw, 'encode_image_for_epub', failing_once)
+
+    assert lw.get_optimized_image(image_path) == (None, None)
+    content, media_type = lw.get_optimized_image(image_path)
+    assert content and media_type == 'image/jpeg'
@@ -0,0 +1,38 @@
+"""Tests for fetching posts on a bounded worker pool (--workers)."""
+import pytest
+
+from conftest import fresh_workdir, lw
+
+
+@pytest.fixture
+def post_urls(workdir, server):
+    # A post the stand-in doesn't serve sits between the fixture posts
+    post_urls = server.add_fixture_posts()
+    post_urls.insert(1, server.url("/posts/missing/not-served"))
+    return post_urls
+
+
+def test_workers_keep_the_order_of_the_sequential_loop(post_urls, tmp_path):
+    fresh_workdir(tmp_path, "sequential")
+    expected = lw.fetch_posts(post_urls, use_cache=False, workers=1)
+
+    fresh_workdir(tmp_path, "workers")
+    posts = lw.fetch_posts(post_urls, use_cache=False, workers=4)
+
+    assert posts == expected
+    assert [post['url'] for post in posts] == [post_urls[0]] + post_urls[2:]
+
+
+def test_pipeline_window_yields_in_order(post_urls):
+    posts = list(lw.iter_posts(post_urls, use_cache=False, workers=3, window=1))
+
+    assert [post['url'] for post in posts] == [post_urls[0]] + post_urls[2:]
+
+
+def test_unexpected_errors_propagate(post_urls, monkeypatch):
+    def broken_extraction(*args, **kwargs):
+        raise KeyError("bug")
+    monkeypatch.setattr(lw, 'get_post_content_from_page', broken_extraction)
+
+    with pytest.raises(KeyError):
+        lw.fetch_posts(post_urls, use_cache=False, workers=4)
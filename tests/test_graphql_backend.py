@@ -0,0 +1,102 @@
+"""Tests for the GraphQL fetch backend (--backend graphql) against a local stand-in endpoint."""
+import pytest
+
+from conftest import FIXTURE_POSTS, lw
+from graphql_stub import GraphQLStub
+
+# The API always returns ISO dates and modern post bodies, so the legacy page has no API counterpart
+API_POSTS = ["post_long.html", "post_short.html"]
+SEQUENCE_CHAPTERS = [["benchshort"], ["benchlong", "benchmessy"]]
+
+
+def sequence_page(server, sequence_id, chapters):
+    links = "".join(f'<div class="LWPostsItem-postsItem"><span class="LWPostsItem-title">'
+                    f'<a href="/s/{sequence_id}/p/{post_id}">{post_id}</a></span></div>'
+                    for chapter in chapters for post_id in chapter)
+    return f"<html><body><h1>Sequence</h1>{links}</body></html>".encode('utf-8')
+
+
+@pytest.fixture
+def graphql(workdir, server):
+    stub = GraphQLStub()
+    server.graphql = stub
+    server.add_fixture_posts()
+    for name in API_POSTS:
+        path = FIXTURE_POSTS[name]
+        stub.add_post_from_page(lw.extract_post_id(path), server.routes[path][1])
+    stub.add_sequence("benchseq", SEQUENCE_CHAPTERS)
+    server.routes["/s/benchseq"] = ('text/html', sequence_page(server, "benchseq", SEQUENCE_CHAPTERS))
+    return stub
+
+
+@pytest.mark.parametrize('name', API_POSTS)
+def test_post_matches_html_backend(graphql, server, name):
+    post_url = server.url(FIXTURE_POSTS[name])
+    expected = lw.get_post_content_from_page(post_url, use_cache=False)
+
+    post = lw.get_post_content_from_graphql(post_url, use_cache=False)
+
+    for field in ['title', 'author', 'date', 'url', 'content', 'images']:
+        assert post[field] == expected[field]
+
+
+def test_post_is_cached(graphql, server, monkeypatch):
+    monkeypatch.setattr(lw, 'CONTENT_BACKEND', 'graphql')
+    post_url = server.url(FIXTURE_POSTS["post_short.html"])
+
+    post = lw.get_post_content(post_url, use_cache=True)
+    queries = len(graphql.queries)
+    lw._prefetched_pages.clear()
+
+    # Both the response (page cache) and the post data are cached
+    assert lw.get_post_content_from_graphql(post_url, use_cache=True) == post
+    assert lw.get_post_content(post_url, use_cache=True) == post
+    assert len(graphql.queries) == queries
+
+
+def test_sequence_order_matches_html_backend(graphql, server):
+    sequence_url = server.url("/s/benchseq")
+    expected = lw.get_urls_from_sequence(sequence_url, use_cache=False)
+
+    assert lw.get_urls_from_sequence_graphql(sequence_url, use_cache=False) == expected
+    assert expected == [server.url(f"/s/benchseq/p/{post_id}")
+                        for chapter in SEQUENCE_CHAPTERS for post_id in chapter]
+
+
+def test_missing_post_returns_none(graphql, server):
+    assert lw.get_post_content_from_graphql(server.url("/posts/nosuchpost/x"), use_cache=False) is None
+
+
+def single_post_response(post_id):
+    return lw.get_cached_page(lw.get_graphql_cache_url(lw.POST_QUERY, {'id': post_id}))
+
+
+def test_batch_prefetch_fills_cache_with_one_query(graphql, server, monkeypatch):
+    monkeypatch.setattr(lw, 'CONTENT_BACKEND', 'graphql')
+    post_urls = [server.url(FIXTURE_POSTS[name]) for name in API_POSTS]
+
+    lw.prefetch_posts_graphql(post_urls, use_cache=True, batch_size=10)
+
+    assert len(graphql.queries) == 1
+    posts = [lw.get_post_content(url, use_cache=True) for url in post_urls]
+    assert len(graphql.queries) == 1
+    assert [post['title'] for post in posts] == ["Updating on Weak Evidence", "A Short Note"]
+
+    # Only cache misses go over the wire
+    lw.prefetch_posts_graphql(post_urls, use_cache=True, batch_size=10)
+    assert len(graphql.queries) == 1
+
+
+def test_partly_failed_batch_is_not_cached(graphql, server, monkeypatch):
+    monkeypatch.setattr(lw, 'CONTENT_BACKEND', 'graphql')
+    graphql.failing_ids.add("benchlong")
+    post_urls = [server.url(FIXTURE_POSTS[name]) for name in API_POSTS]
+
+    lw.prefetch_posts_graphql(post_urls, use_cache=True, batch_size=10)
+
+    assert single_post_response("benchlong") is None
+    assert single_post_response("benchshort") is None
+    # The posts are then queried one by one; only the failing one is missing
+    assert lw.get_post_content(post_urls[0], use_cache=True) is None
+    assert lw.get_post_content(post_urls[1], use_cache=True)['title'] == "A Short Note"
+    assert single_post_response("benchlong") is None
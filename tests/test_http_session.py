@@ -0,0 +1,23 @@
+"""Tests for the shared keep-alive HTTP session."""
+from conftest import lw
+
+
+def test_fetches_reuse_one_connection(workdir, server):
+    lw.configure_http_session()
+    post_urls = server.add_fixture_posts()
+
+    posts = lw.fetch_posts(post_urls, use_cache=False, workers=1, image_workers=1)
+
+    assert len(posts) == len(post_urls)
+    assert len(server.requests) > len(post_urls)
+    assert server.connections == 1
+
+
+def test_reconfiguring_replaces_the_session(workdir, server):
+    old_session = lw.configure_http_session(pool_size=2)
+
+    session = lw.configure_http_session(pool_size=8)
+
+    assert lw.get_http_session() is session is not old_session
+    assert session.get_adapter(server.base_url)._pool_maxsize == 8
+    assert session.headers['User-Agent'] == lw.USER_AGENT
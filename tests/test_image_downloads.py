@@ -0,0 +1,36 @@
+"""Tests for downloading a post's images concurrently (--image-download-workers)."""
+from conftest import FIXTURE_IMAGES, fresh_workdir, lw
+
+
+def test_concurrent_downloads_match_sequential(workdir, server, tmp_path):
+    post_urls = server.add_fixture_posts()
+
+    fresh_workdir(tmp_path, "sequential")
+    expected = [lw.get_post_content(url, use_cache=False, image_workers=1) for url in post_urls]
+
+    fresh_workdir(tmp_path, "concurrent")
+    posts = [lw.get_post_content(url, use_cache=False, image_workers=4) for url in post_urls]
+
+    assert posts == expected
+
+
+def test_each_image_url_is_downloaded_once(workdir, server):
+    server.add_fixture_posts()
+    image_urls = [server.url(f"/images/{name}") for name in FIXTURE_IMAGES]
+
+    local_names = lw.download_images(image_urls + image_urls[::-1], max_workers=4)
+
+    assert list(local_names) == image_urls
+    assert sorted(server.requests) == sorted(('GET', f"/images/{name}") for name in FIXTURE_IMAGES)
+
+
+def test_failed_image_gets_a_placeholder(workdir, server):
+    post_url = server.add_fixture_posts()[0]
+    del server.routes["/images/photo.jpg"]
+
+    post = lw.get_post_content(post_url, use_cache=False, image_workers=4)
+
+    placeholders = [name for name in post['images'] if name.startswith("error_image_")]
+    assert len(placeholders) == 1
+    assert not any(name.endswith("_photo.jpg") for name in post['images'])
+    assert len(post['images']) == 4
@@ -0,0 +1,39 @@
+"""Tests for the image-reference index stored with post data ('images')."""
+import json
+import os
+
+from conftest import lw
+
+
+def test_index_matches_the_content(workdir, server):
+    for post_url in server.add_fixture_posts():
+        post = lw.get_post_content(post_url, use_cache=False)
+
+        assert post['images'] == lw.get_image_references(post['content'])
+        assert all(os.path.exists(os.path.join(lw.IMAGES_DIR, image)) for image in post['images'])
+
+
+def test_posts_cached_without_an_index_are_upgraded(workdir, server):
+    post_url = server.add_fixture_posts()[0]
+    post = lw.get_post_content(post_url, use_cache=True)
+    cache_path = os.path.join(lw.POST_CACHE_DIR, f"{lw.url_to_cache_key(post_url)}.json")
+    with open(cache_path, encoding='utf-8') as f:
+        cached = json.load(f)
+    del cached['images']
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cached, f)
+
+    assert lw.get_cached_post_data(post_url) == post
+
+    # The index is stored back, keeping the entry's age
+    with open(cache_path, encoding='utf-8') as f:
+        upgraded = json.load(f)
+    assert upgraded['images'] == post['images']
+    assert upgraded['_cache_timestamp'] == cached['_cache_timestamp']
+
+
+def test_post_images_only_parses_posts_without_an_index(monkeypatch):
+    monkeypatch.setattr(lw, 'get_image_references', lambda content: ["parsed.png"])
+
+    assert lw.get_post_images({'content': '<img src="images/a.png">', 'images': ["a.png"]}) == ["a.png"]
+    assert lw.get_post_images({'content': '<img src="images/a.png">'}) == ["parsed.png"]
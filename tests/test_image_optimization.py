@@ -0,0 +1,29 @@
+"""Tests for optimizing EPUB images on a process pool (--image-workers)."""
+import os
+
+from conftest import FIXTURE_IMAGES, fresh_workdir, lw
+
+
+def download_fixture_images(server):
+    server.add_fixture_posts()
+    names = lw.download_images([server.url(f"/images/{name}") for name in FIXTURE_IMAGES])
+    return [os.path.join(lw.IMAGES_DIR, names[server.url(f"/images/{name}")]) for name in FIXTURE_IMAGES]
+
+
+def test_process_pool_matches_main_process(workdir, server, tmp_path):
+    fresh_workdir(tmp_path, "main")
+    expected = lw.optimize_images(download_fixture_images(server), max_width=200, workers=1)
+
+    fresh_workdir(tmp_path, "pool")
+    optimized = lw.optimize_images(download_fixture_images(server), max_width=200, workers=3)
+
+    assert optimized == expected
+    assert [media_type for _, media_type in optimized] == list(FIXTURE_IMAGES.values())
+
+
+def test_images_over_the_size_limit_are_excluded(workdir, server):
+    paths = download_fixture_images(server)
+
+    optimized = lw.optimize_images(paths, max_size_mb=0.000001, workers=2)
+
+    assert optimized == [(None, None)] * len(paths)
@@ -0,0 +1,116 @@
+"""Tests for incremental EPUB rebuilds (--incremental)."""
+import os
+import zipfile
+
+import pytest
+
+from conftest import lw
+
+
+@pytest.fixture
+def posts(workdir, server, monkeypatch):
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1700000000')
+    return lw.fetch_posts(server.add_fixture_posts(), use_cache=True)
+
+
+@pytest.fixture
+def optimized(monkeypatch):
+    """Records the images each build actually optimizes."""
+    paths = []
+    optimize_images = lw.optimize_images
+
+    def recording_optimize_images(image_paths, *args, **kwargs):
+        paths.extend(os.path.basename(path) for path in image_paths)
+        return optimize_images(image_paths, *args, **kwargs)
+    monkeypatch.setattr(lw, 'optimize_images', recording_optimize_images)
+    return paths
+
+
+@pytest.fixture
+def cleaned(monkeypatch):
+    """Records the chapters each build renders rather than copies."""
+    contents = []
+    transform_html = lw.transform_html
+
+    def recording_transform_html(html_content, *args, **kwargs):
+        contents.append(html_content)
+        return transform_html(html_content, *args, **kwargs)
+    monkeypatch.setattr(lw, 'transform_html', recording_transform_html)
+    return contents
+
+
+def read_entries(path):
+    with zipfile.ZipFile(path) as epub:
+        return {name: epub.read(name) for name in epub.namelist()}
+
+
+def test_unchanged_rebuild_reuses_everything(posts, optimized, cleaned):
+    lw.create_epub(posts, "book.epub", incremental=True)
+    assert len(cleaned) == len(posts) and len(optimized) == 4
+    first = read_entries("book.epub")
+    optimized.clear()
+    cleaned.clear()
+
+    lw.create_epub(posts, "book.epub", incremental=True)
+
+    assert optimized == [] and cleaned == []
+    assert read_entries("book.epub") == first
+
+
+def test_rebuild_matches_a_full_build(posts):
+    lw.create_epub(posts, "book.epub", incremental=True)
+    changed = [dict(posts[0], content=posts[0]['content'] + "<p>Edited</p>")] + posts[1:]
+
+    lw.create_epub(changed, "book.epub", incremental=True)
+    lw.create_epub(changed, "full.epub")
+
+    assert read_entries("book.epub") == read_entries("full.epub")
+
+
+def test_changed_post_is_rendered_again(posts, cleaned):
+    lw.create_epub(posts, "book.epub", incremental=True)
+    cleaned.clear()
+
+    changed = posts[:1] + [dict(posts[1], content=posts[1]['content'] + "<p>Edited</p>")] + posts[2:]
+    lw.create_epub(changed, "book.epub", incremental=True)
+
+    assert cleaned == [changed[1]['content']]
+
+
+def test_changed_image_settings_reencode_images_only(posts, optimized, cleaned):
+    lw.create_epub(posts, "book.epub", incremental=True)
+    optimized.clear()
+    cleaned.clear()
+
+    lw.create_epub(posts, "book.epub", max_image_width=300, incremental=True)
+
+    assert len(optimized) == 4 and cleaned == []
+
+
+def test_changed_chapter_settings_render_every_chapter(posts, cleaned):
+    lw.create_epub(posts, "book.epub", incremental=True)
+    cleaned.clear()
+
+    lw.create_epub(posts, "book.epub", kindle_compatible=True, incremental=True)
+
+    assert len(cleaned) == len(posts)
+
+
+def test_replaced_epub_invalidates_the_state(posts, cleaned):
+    lw.create_epub(posts, "book.epub", incremental=True)
+    lw.create_epub(posts[:1], "other.epub")
+    os.replace("other.epub", "book.epub")
+    cleaned.clear()
+
+    lw.create_epub(posts, "book.epub", incremental=True)
+
+    assert len(cleaned) == len(posts)
+
+
+def test_full_build_removes_the_state(posts):
+    lw.create_epub(posts, "book.epub", incremental=True)
+    assert os.path.exists(lw.get_build_state_path("book.epub"))
+
+    lw.create_epub(posts, "book.epub")
+
+    assert not os.path.exists(lw.get_build_state_path("book.epub"))
@@ -0,0 +1,133 @@
+"""Tests for run journals (--journal) and resuming from them (--resume)."""
+import json
+import os
+
+import pytest
+
+from conftest import lw
+
+
+def parse_build_args(*argv):
+    parser = lw.build_parser()
+    args = parser.parse_args(['build', *argv])
+    return args, args.command_parser
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def journaled_run(workdir, server):
+    """A finished build run with --journal and non-default options. Returns the journal path."""
+    with open("urls.txt", 'w', encoding='utf-8') as f:
+        f.write("\n".join(server.add_fixture_posts()) + "\n")
+    lw.main(['build', '--file', 'urls.txt', '--journal', 'run.journal', '-o', 'book.epub',
+             '--title', "Journaled", '--max-image-width', '400', '--kindle-compatible',
+             '--parser', 'html.parser'])
+    return 'run.journal'
+
+
+def test_journal_records_options_posts_and_images(journaled_run):
+    records = read_records(journaled_run)
+
+    assert records[0]['event'] == 'urls'
+    options = records[0]['options']
+    assert options['output'] == 'book.epub' and options['title'] == "Journaled"
+    assert options['max_image_width'] == 400 and options['kindle_compatible'] is True
+    assert options['parser'] == 'html.parser'
+    assert [record['event'] for record in records[1:]] == ['post'] * 3 + ['image'] * 4 + ['finished']
+    for record in records[4:8]:
+        assert record['key'].endswith("_w400_q75_c9_s5.0_kindle") and record['media_type']
+
+
+def test_resume_restores_journaled_options(journaled_run, monkeypatch):
+    monkeypatch.setattr(lw, 'HTML_PARSER', 'lxml')
+    args, parser = parse_build_args('--resume', journaled_run, '--jpeg-quality', '75')
+
+    urls, journal = lw.collect_post_urls(args, parser, True, 0)
+    journal.close()
+
+    assert urls == read_records(journaled_run)[0]['urls']
+    assert (args.output, args.title, args.max_image_width) == ('book.epub', "Journaled", 400)
+    assert args.kindle_compatible is True and args.no_images is False
+    assert lw.HTML_PARSER == 'html.parser'
+
+
+def test_resume_refuses_conflicting_options(journaled_run):
+    args, parser = parse_build_args('--resume', journaled_run, '--title', "Another")
+
+    with pytest.raises(SystemExit):
+        lw.collect_post_urls(args, parser, True, 0)
+
+
+def test_resumed_build_reads_posts_from_journal(journaled_run, server):
+    server.requests.clear()
+
+    lw.main(['build', '--resume', journaled_run, '--no-cache'])
+
+    assert server.requests == []
+    assert read_records(journaled_run)[-1]['outputs'] == ['book.epub']
+
+
+def test_existing_journal_is_not_overwritten(journaled_run):
+    size = os.path.getsize(journaled_run)
+    args, parser = parse_build_args('--file', 'urls.txt', '--journal', journaled_run)
+
+    with pytest.raises(SystemExit):
+        lw.collect_post_urls(args, parser, True, 0)
+    assert os.path.getsize(journaled_run) == size
+
+    args, parser = parse_build_args('--file', 'urls.txt', '--journal', journaled_run, '--overwrite-journal')
+    _, journal = lw.collect_post_urls(args, parser, True, 0)
+    journal.close()
+    assert [record['event'] for record in read_records(journaled_run)] == ['urls']
+
+
+@pytest.fixture
+def optimized(monkeypatch):
+    """Records the images each build actually optimizes."""
+    paths = []
+    optimize_images = lw.optimize_images
+
+    def recording_optimize_images(image_paths, *args, **kwargs):
+        paths.extend(os.path.basename(path) for path in image_paths)
+        return optimize_images(image_paths, *args, **kwargs)
+    monkeypatch.setattr(lw, 'optimize_images', recording_optimize_images)
+    return paths
+
+
+def test_resume_takes_journaled_images_from_the_derivative_cache(journaled_run, optimized, monkeypatch):
+    def no_hashing(*args):
+        raise AssertionError("journaled images are not hashed again")
+    monkeypatch.setattr(lw, 'get_derivative_cache_key', no_hashing)
+
+    lw.main(['build', '--resume', journaled_run, '--no-cache'])
+
+    assert optimized == []
+    assert read_records(journaled_run)[-1]['event'] == 'finished'
+
+
+def test_journaled_images_missing_from_the_cache_are_optimized_again(journaled_run, optimized):
+    records = read_records(journaled_run)
+    evicted = records[4]
+    os.remove(os.path.join(lw.DERIVATIVE_CACHE_DIR, f"{evicted['key']}.json"))
+
+    lw.main(['build', '--resume', journaled_run])
+
+    assert optimized == [evicted['file']]
+
+
+def test_images_journaled_with_other_settings_are_ignored(workdir):
+    journal = lw.RunJournal("run.journal")
+    journal.record_urls([])
+    journal.record_image("a.png", "abc_" + lw.get_derivative_settings(max_width=400), 'image/png')
+    journal.close()
+
+    journal = lw.RunJournal("run.journal", resume=True)
+    journal.close()
+    assert journal.get_image("a.png", lw.get_derivative_settings(max_width=400)) == \
+        "abc_" + lw.get_derivative_settings(max_width=400)
+    assert journal.get_image("a.png", lw.get_derivative_settings()) is None
+    assert journal.get_image("b.png", lw.get_derivative_settings(max_width=400)) is None
@@ -0,0 +1,62 @@
+"""Tests for the compressed page cache (lw_cache/pages)."""
+import base64
+import json
+import os
+import time
+import zlib
+
+from conftest import lw
+
+
+def test_pages_are_stored_compressed_with_a_sidecar(workdir, server):
+    post_url = server.add_fixture_posts()[0]
+    page = server.routes[post_url[len(server.base_url):]][1]
+
+    lw.make_soup(post_url, use_cache=True)
+
+    body_path, meta_path = lw.get_page_cache_paths(post_url)
+    with open(body_path, 'rb') as f:
+        stored = f.read()
+    assert zlib.decompress(stored) == page and len(stored) < len(page)
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    assert meta['url'] == post_url and meta['is_binary'] and meta['size'] == len(page)
+    assert lw.get_cached_page(post_url) == page
+
+
+def test_cached_page_is_used_instead_of_the_server(workdir, server):
+    post_url = server.add_fixture_posts()[0]
+    lw.make_soup(post_url, use_cache=True)
+    server.requests.clear()
+
+    soup = lw.make_soup(post_url, use_cache=True)
+
+    assert soup.find('h1') is not None
+    assert server.requests == []
+
+
+def test_text_pages_round_trip(workdir):
+    lw.cache_page("https://example.com/text", "café page")
+
+    assert lw.get_cached_page("https://example.com/text") == "café page"
+
+
+def test_expired_pages_are_not_returned(workdir):
+    url = "https://example.com/old"
+    lw.write_page_cache(url, b"old page", time.time() - 3 * 24 * 60 * 60)
+
+    assert lw.get_cached_page(url, max_age_days=2) is None
+    assert lw.get_cached_page(url, max_age_days=4) == b"old page"
+    assert lw.get_cached_page(url, max_age_days=0) == b"old page"
+
+
+def test_legacy_entries_are_migrated(workdir):
+    url = "https://example.com/legacy"
+    legacy_path = os.path.join(lw.PAGE_CACHE_DIR, f"{lw.url_to_cache_key(url)}.html")
+    with open(legacy_path, 'w', encoding='utf-8') as f:
+        json.dump({'url': url, 'timestamp': time.time(), 'is_binary': True,
+                   'content': base64.b64encode(b"<p>legacy</p>").decode('ascii')}, f)
+
+    assert lw.get_cached_page(url) == b"<p>legacy</p>"
+    assert not os.path.exists(legacy_path)
+    assert all(os.path.exists(path) for path in lw.get_page_cache_paths(url))
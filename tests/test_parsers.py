@@ -0,0 +1,54 @@
+"""
+Equivalence of the HTML parser backends (--parser): get_post_content must extract the same post
+from the pages in benchmarks/fixtures under each of them.
+"""
+import re
+
+import pytest
+
+from conftest import FIXTURE_POSTS, fresh_workdir, lw
+
+PARSERS = ['lxml', 'html5lib', 'html.parser']
+# Pages with broken nesting (post_messy.html), which each parser repairs in its own way
+MALFORMED_POSTS = {"post_messy.html"}
+
+
+def extract_posts(server, tmp_path, parser, monkeypatch):
+    """Extracts every fixture post with a fresh cache. Returns {fixture name: post data}."""
+    monkeypatch.setattr(lw, 'HTML_PARSER', parser)
+    fresh_workdir(tmp_path, parser)
+    return {name: lw.get_post_content(server.url(path), use_cache=False)
+            for name, path in FIXTURE_POSTS.items()}
+
+
+def get_text(content):
+    return re.sub(r'\s+', ' ', lw.bs4.BeautifulSoup(content, 'html.parser').get_text(' ')).strip()
+
+
+@pytest.fixture
+def extracted(workdir, server, tmp_path, monkeypatch):
+    server.add_fixture_posts()
+    return {parser: extract_posts(server, tmp_path, parser, monkeypatch) for parser in PARSERS}
+
+
+@pytest.mark.parametrize('parser', PARSERS[1:])
+@pytest.mark.parametrize('name', sorted(FIXTURE_POSTS))
+def test_same_post_under_each_parser(extracted, parser, name):
+    expected, post = extracted['lxml'][name], extracted[parser][name]
+
+    for field in ['title', 'author', 'date', 'url', 'images']:
+        assert post[field] == expected[field]
+    if name in MALFORMED_POSTS:
+        # Mis-nested tags may be closed in different places, but the text is the same
+        assert get_text(post['content']) == get_text(expected['content'])
+    else:
+        assert post['content'] == expected['content']
+
+
+def test_corpus_details(extracted):
+    posts = extracted['lxml']
+    assert posts['post_long.html']['title'] == "Updating on Weak Evidence"
+    assert posts['post_short.html']['date'] == "November 02, 2023"
+    assert posts['post_messy.html']['title'] == "Legacy Post & Markup"
+    assert all(post['author'] != "Unknown author" for post in posts.values())
+    assert len(posts['post_long.html']['images']) == 4
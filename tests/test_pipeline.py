@@ -0,0 +1,87 @@
+"""Tests for the bounded pipeline from post URLs to streamed chapters (--pipeline-window)."""
+import threading
+import zipfile
+
+import pytest
+
+from conftest import lw
+
+
+@pytest.fixture
+def posts(workdir, server, monkeypatch):
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1700000000')
+    return lw.fetch_posts(server.add_fixture_posts(), use_cache=True)
+
+
+def read_entries(path):
+    with zipfile.ZipFile(path) as epub:
+        return {name: epub.read(name) for name in epub.namelist()}
+
+
+def test_image_report_of_a_plain_build(posts, capsys):
+    lw.create_epub(posts, "book.epub")
+
+    out = capsys.readouterr().out
+    assert "Found 4 images referenced in the selected posts\nAdding referenced images to EPUB...\n" in out
+
+
+def test_image_report_of_a_pipelined_build(posts, capsys):
+    lw.create_epub(iter(posts), "book.epub", streaming=True, window=1)
+
+    out = capsys.readouterr().out
+    # The total is known once every post has gone through the pipeline
+    assert out.count("Found 4 images referenced in the selected posts") == 1
+    assert out.index("Found 4 images") > out.index("Adding 4 referenced images to EPUB...")
+
+
+def test_chapters_are_written_a_window_at_a_time(posts, monkeypatch):
+    pulled = []
+    written_after = []
+
+    def post_stream():
+        for post in posts:
+            pulled.append(post['url'])
+            yield post
+
+    transform_html = lw.transform_html
+
+    def recording_transform_html(*args, **kwargs):
+        written_after.append(len(pulled))
+        return transform_html(*args, **kwargs)
+    monkeypatch.setattr(lw, 'transform_html', recording_transform_html)
+
+    lw.create_epub(post_stream(), "book.epub", streaming=True, window=1)
+
+    # Each chapter is written before the next post is taken
+    assert written_after == [1, 2, 3]
+
+
+def test_fetches_stay_within_the_window(workdir, server, monkeypatch):
+    post_urls = server.add_fixture_posts() * 4
+    lock = threading.Lock()
+    started = []
+    get_post_content = lw.get_post_content
+
+    def recording_get_post_content(url, *args):
+        with lock:
+            started.append(url)
+        return get_post_content(url, *args)
+    monkeypatch.setattr(lw, 'get_post_content', recording_get_post_content)
+
+    for consumed, _ in enumerate(lw.iter_posts(post_urls, use_cache=False, workers=2, window=3), 1):
+        with lock:
+            assert len(started) <= consumed + 3
+
+    assert len(started) == len(post_urls)
+
+
+def test_pipelined_cli_build_equals_the_plain_build(workdir, server, monkeypatch):
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1700000000')
+    with open("urls.txt", 'w', encoding='utf-8') as f:
+        f.write("\n".join(server.add_fixture_posts()) + "\n")
+
+    lw.main(['build', '--file', 'urls.txt', '-o', 'plain.epub', '--no-cache'])
+    lw.main(['build', '--file', 'urls.txt', '-o', 'piped.epub', '--no-cache', '--streaming',
+             '--workers', '2', '--pipeline-window', '1'])
+
+    assert read_entries("piped.epub") == read_entries("plain.epub")
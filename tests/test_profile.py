@@ -0,0 +1,67 @@
+"""Tests for the --profile report."""
+import json
+import subprocess
+import sys
+
+import pytest
+
+from conftest import REPO_DIR, lw
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    profiler = lw.Profiler()
+    monkeypatch.setattr(lw, '_profiler', profiler)
+    return profiler
+
+
+def test_report_covers_stages_requests_and_caches(workdir, server, profiler):
+    post_urls = server.add_fixture_posts()
+    posts = lw.fetch_posts(post_urls, use_cache=True)
+    lw.fetch_posts(post_urls, use_cache=True)
+    lw.create_epub(posts, "book.epub", streaming=True)
+
+    report = json.loads(json.dumps(profiler.report()))
+
+    for stage in ['fetch', 'parse', 'extract', 'image_download', 'image_optimize', 'clean',
+                  'epub_write']:
+        assert report['stages'][stage]['calls'] > 0, stage
+    # Every page and image of the first pass went over the wire, the second pass hit the cache
+    assert report['requests']['count'] == len(post_urls) + 4
+    assert {request['status'] for request in report['requests']['urls']} == {200}
+    assert report['requests']['bytes'] == sum(len(body) for body in
+                                              (route[1] for route in server.routes.values()))
+    assert report['cache']['posts'] == {'hits': len(post_urls), 'misses': len(post_urls)}
+    assert report['cache']['derivatives']['misses'] == 4
+    assert report['peak_rss_bytes'] > 0
+
+
+def test_stages_are_noops_without_profiling(workdir):
+    assert lw._profiler is None
+    with lw.profile_stage('fetch'):
+        pass
+    lw.record_request('GET', "https://example.com", 200, 0.1, 10)
+
+
+def run_cli(tmp_path, *argv):
+    return subprocess.run([sys.executable, f"{REPO_DIR}/lw_to_epub.py", *argv], cwd=tmp_path,
+                          capture_output=True, text=True, timeout=120)
+
+
+def test_cli_writes_the_report(tmp_path, server):
+    (tmp_path / "urls.txt").write_text("\n".join(server.add_fixture_posts()) + "\n")
+
+    result = run_cli(tmp_path, 'build', '--file', 'urls.txt', '--profile', 'report.json',
+                     '--profile-cprofile', 'main.prof')
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert report['stages']['collect_urls']['calls'] == 1
+    assert (tmp_path / "main.prof").stat().st_size > 0
+
+
+def test_failed_runs_are_profiled_too(tmp_path):
+    result = run_cli(tmp_path, 'build', '--file', 'missing.txt', '--profile', 'report.json')
+
+    assert result.returncode == 1
+    assert json.loads((tmp_path / "report.json").read_text())['stages']['collect_urls']['calls'] == 1
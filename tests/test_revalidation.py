@@ -0,0 +1,90 @@
+"""Tests for revalidating expired page and image cache entries with conditional requests."""
+import json
+import os
+import time
+
+import pytest
+
+from conftest import lw
+
+DAY = 24 * 60 * 60
+
+
+def age_page(url, days):
+    _, meta_path = lw.get_page_cache_paths(url)
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    meta['timestamp'] -= days * DAY
+    lw.write_page_cache_meta(meta_path, meta)
+
+
+@pytest.fixture
+def post(workdir, server):
+    """A post page served with an ETag and cached. Returns (URL, path)."""
+    post_url = server.add_fixture_posts()[0]
+    path = post_url[len(server.base_url):]
+    server.etags[path] = '"v1"'
+    lw.make_soup(post_url, use_cache=True)
+    server.requests.clear()
+    return post_url, path
+
+
+def test_unchanged_page_is_revalidated(post, server):
+    post_url, path = post
+    age_page(post_url, 10)
+    # Only a full download would pick up this body, which still has the old ETag
+    cached_page = server.routes[path][1]
+    server.routes[path] = ('text/html', b"<html><body><h1>Not sent</h1></body></html>")
+
+    lw.make_soup(post_url, use_cache=True, max_cache_age=5)
+
+    assert server.requests == [('GET', path)]
+    assert lw.get_cached_page(post_url) == cached_page
+    meta = lw.get_cached_page_meta(post_url)
+    assert meta['etag'] == '"v1"' and meta['timestamp'] > time.time() - 60
+    # Fresh again, so the next read doesn't go to the server
+    lw.make_soup(post_url, use_cache=True, max_cache_age=5)
+    assert len(server.requests) == 1
+
+
+def test_changed_page_is_downloaded(post, server):
+    post_url, path = post
+    age_page(post_url, 10)
+    server.etags[path] = '"v2"'
+    server.routes[path] = ('text/html', b"<html><body><h1>Changed</h1></body></html>")
+
+    soup = lw.make_soup(post_url, use_cache=True, max_cache_age=5)
+
+    assert soup.find('h1').get_text() == "Changed"
+    assert lw.get_cached_page_meta(post_url)['etag'] == '"v2"'
+
+
+def test_304_without_a_cached_body_downloads_the_page(post, server):
+    post_url, path = post
+    age_page(post_url, 10)
+    os.remove(lw.get_page_cache_paths(post_url)[0])
+
+    soup = lw.make_soup(post_url, use_cache=True, max_cache_age=5)
+
+    assert soup.find('h1') is not None
+    assert server.requests == [('GET', path), ('GET', path)]
+
+
+def test_expired_image_is_revalidated(workdir, server):
+    server.add_fixture_posts()
+    server.etags["/images/photo.jpg"] = '"img1"'
+    image_url = server.url("/images/photo.jpg")
+    name = lw.download_image(image_url)
+    meta_path = os.path.join(lw.IMAGE_META_DIR, f"{name}.json")
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    assert meta['etag'] == '"img1"'
+    meta['timestamp'] -= 10 * DAY
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    server.requests.clear()
+
+    assert lw.download_image(image_url, max_cache_age=5) == name
+
+    assert server.requests == [('GET', "/images/photo.jpg")]
+    assert lw.get_image_meta(name)['timestamp'] > time.time() - 60
@@ -0,0 +1,59 @@
+"""Tests for expanding the sequences of a sequence list (--sequence-list) concurrently."""
+import time
+
+import pytest
+
+from conftest import lw
+
+# Sequence id: post ids, with posts shared between sequences
+SEQUENCES = {"first": ["a", "b"], "second": ["c", "a"], "third": ["d"]}
+
+
+def sequence_page(sequence_id, post_ids):
+    links = "".join(f'<div class="LWPostsItem-postsItem"><span class="LWPostsItem-title">'
+                    f'<a href="/s/{sequence_id}/p/{post_id}">{post_id}</a></span></div>'
+                    for post_id in post_ids)
+    return f"<html><body>{links}</body></html>".encode('utf-8')
+
+
+@pytest.fixture
+def sequence_list(workdir, server):
+    links = "".join(f'<a class="LargeSequencesItem-title" href="/s/{sequence_id}">{sequence_id}</a>'
+                    for sequence_id in SEQUENCES)
+    server.routes["/library"] = ('text/html', f"<html><body>{links}</body></html>".encode('utf-8'))
+    for sequence_id, post_ids in SEQUENCES.items():
+        server.routes[f"/s/{sequence_id}"] = ('text/html', sequence_page(sequence_id, post_ids))
+        server.delays[f"/s/{sequence_id}"] = 0.3
+    # The first sequence is answered last
+    server.delays["/s/first"] = 0.6
+    return server.url("/library")
+
+
+def expected_urls(server):
+    urls = [server.url(f"/s/{sequence_id}/p/{post_id}")
+            for sequence_id, post_ids in SEQUENCES.items() for post_id in post_ids]
+    return list(dict.fromkeys(urls))
+
+
+def test_concurrent_expansion_keeps_the_list_order(sequence_list, server):
+    start = time.perf_counter()
+    post_urls = lw.get_urls_from_sequence_list(sequence_list, use_cache=False, workers=3)
+    elapsed = time.perf_counter() - start
+
+    assert post_urls == expected_urls(server)
+    # The sequences were fetched at the same time, not one after another (1.2 s)
+    assert elapsed < 1.0
+
+
+def test_sequential_expansion_gives_the_same_urls(sequence_list, server):
+    assert lw.get_urls_from_sequence_list(sequence_list, use_cache=False, workers=1) == expected_urls(server)
+
+
+def test_expanded_list_is_cached(sequence_list, server):
+    post_urls = lw.get_urls_from_sequence_list(sequence_list, use_cache=True, workers=3)
+    server.requests.clear()
+
+    assert lw.get_urls_from_sequence_list(sequence_list, use_cache=True, workers=3) == post_urls
+    assert server.requests == []
+    assert lw.get_cached_sequence_urls(server.url("/s/second")) == [
+        server.url("/s/second/p/c"), server.url("/s/second/p/a")]
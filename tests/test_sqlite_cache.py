@@ -0,0 +1,83 @@
+"""Tests for the SQLite cache store (--cache-backend sqlite)."""
+import os
+import time
+
+import pytest
+
+from conftest import lw
+
+DAY = 24 * 60 * 60
+
+
+@pytest.fixture
+def sqlite_cache(workdir):
+    lw.configure_cache_backend('sqlite')
+    return lw.get_cache_db()
+
+
+def get_accessed(conn, category, url):
+    return conn.execute("SELECT accessed FROM cache_entries WHERE category = ? AND cache_key = ?",
+                        (category, lw.url_to_cache_key(url))).fetchone()[0]
+
+
+def test_pages_and_posts_live_in_one_database(sqlite_cache, server):
+    post_url = server.add_fixture_posts()[0]
+    post = lw.get_post_content(post_url, use_cache=True)
+    server.requests.clear()
+
+    assert lw.get_post_content(post_url, use_cache=True) == post
+    assert lw.get_cached_page(post_url) == server.routes[post_url[len(server.base_url):]][1]
+    assert server.requests == []
+    assert os.listdir(lw.PAGE_CACHE_DIR) == [] and os.listdir(lw.POST_CACHE_DIR) == []
+    categories = sqlite_cache.execute(
+        "SELECT category, COUNT(*) FROM cache_entries GROUP BY category").fetchall()
+    assert dict(categories) == {'pages': 1, 'posts': 1}
+
+
+def test_entries_expire_by_age(sqlite_cache):
+    url = "https://example.com/old"
+    lw.db_cache_put("pages", url, b"old page", {'is_binary': True}, time.time() - 3 * DAY)
+
+    assert lw.get_cached_page(url, max_age_days=2) is None
+    assert lw.get_cached_page(url, max_age_days=4) == b"old page"
+    assert lw.get_cached_page(url, max_age_days=0) == b"old page"
+
+
+def test_invalidate_older_than(sqlite_cache):
+    lw.db_cache_put("pages", "https://example.com/old", b"old", timestamp=time.time() - 10 * DAY)
+    lw.db_cache_put("pages", "https://example.com/new", b"new")
+
+    assert lw.invalidate_cache(older_than_days=7) == 1
+
+    assert lw.get_cached_page("https://example.com/old", 0) is None
+    assert lw.get_cached_page("https://example.com/new", 0) == "new"
+
+
+def test_invalidate_sequence_removes_its_posts(sqlite_cache, server):
+    post_urls = server.add_fixture_posts()
+    sequence_url = server.url("/s/benchseq")
+    lw.cache_sequence_urls(sequence_url, post_urls[:2])
+    for url in post_urls:
+        lw.get_post_content(url, use_cache=True)
+
+    # The sequence plus a page and a post for each of its two posts
+    assert lw.invalidate_cache(sequence_url=sequence_url) == 5
+
+    assert lw.get_cached_sequence_urls(sequence_url) is None
+    assert [lw.get_cached_post_data(url) is None for url in post_urls] == [True, True, False]
+
+
+def test_reads_do_not_write(sqlite_cache):
+    url = "https://example.com/page"
+    lw.db_cache_put("pages", url, b"page", timestamp=time.time() - DAY)
+    sqlite_cache.execute("UPDATE cache_entries SET accessed = 0")
+    sqlite_cache.commit()
+    changes = sqlite_cache.total_changes
+
+    assert lw.get_cached_page(url) == "page"
+    assert sqlite_cache.total_changes == changes
+    assert get_accessed(sqlite_cache, "pages", url) == 0
+
+    # Access times are written in one go, before pruning reads them
+    lw.prune_cache(max_cache_mb=1024)
+    assert get_accessed(sqlite_cache, "pages", url) > time.time() - 60
@@ -0,0 +1,50 @@
+"""Tests for the streaming EPUB writer (--streaming)."""
+import os
+import zipfile
+
+import pytest
+
+from conftest import lw
+
+
+@pytest.fixture
+def posts(workdir, server, monkeypatch):
+    # Pin the modification date, so separate builds are comparable
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1700000000')
+    return lw.fetch_posts(server.add_fixture_posts(), use_cache=True)
+
+
+def read_entries(path):
+    with zipfile.ZipFile(path) as epub:
+        return {name: epub.read(name) for name in epub.namelist()}
+
+
+@pytest.mark.parametrize('kindle_compatible', [False, True])
+def test_streaming_build_equals_plain_build(posts, kindle_compatible):
+    lw.create_epub(posts, "plain.epub", kindle_compatible=kindle_compatible)
+    lw.create_epub(posts, "streamed.epub", kindle_compatible=kindle_compatible, streaming=True)
+
+    plain, streamed = read_entries("plain.epub"), read_entries("streamed.epub")
+    assert streamed == plain
+    assert sum(name.endswith('.xhtml') and 'chap_' in name for name in streamed) == len(posts)
+
+
+def test_streamed_mimetype_comes_first_uncompressed(posts):
+    lw.create_epub(iter(posts), "streamed.epub", streaming=True, window=1)
+
+    with zipfile.ZipFile("streamed.epub") as epub:
+        first = epub.infolist()[0]
+        assert first.filename == 'mimetype' and first.compress_type == zipfile.ZIP_STORED
+        assert epub.read('mimetype') == b'application/epub+zip'
+        assert epub.testzip() is None
+
+
+def test_failed_build_leaves_no_partial_file(posts):
+    def failing_posts():
+        yield posts[0]
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        lw.create_epub(failing_posts(), "streamed.epub", streaming=True, window=1)
+
+    assert not [name for name in os.listdir('.') if name.startswith("streamed.epub")]
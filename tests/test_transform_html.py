@@ -0,0 +1,49 @@
+"""Tests for the chapter HTML passes and their error handling."""
+import pytest
+
+from conftest import lw
+
+CHAPTER = ('<h1>Title</h1><p onclick="x()">Text <img src="images/a.png" alt="A"> and '
+           '<img src="images/b.png" alt="B"></p><script>bad()</script>')
+
+
+def failing_pass(soup):
+    raise RuntimeError("pass failed")
+
+
+def test_passes_share_one_tree():
+    content = lw.transform_html(CHAPTER, [
+        lw.epub_cleanup_pass,
+        lambda soup: lw.excluded_images_pass(soup, {'b.png'}, 'excluded.png'),
+    ])
+
+    assert '<script>' not in content and 'onclick' not in content
+    assert 'src="images/a.png"' in content
+    assert 'src="images/excluded.png"' in content and 'src="images/b.png"' not in content
+
+
+def test_pass_errors_propagate():
+    with pytest.raises(RuntimeError):
+        lw.transform_html(CHAPTER, [failing_pass, lw.remove_images_pass])
+
+
+def test_unparsable_markup_still_gets_every_pass(workdir):
+    content = lw.transform_html(CHAPTER, [lw.remove_images_pass], parser='no-such-parser')
+
+    assert '<img' not in content
+    assert '[A]' in content and '[B]' in content
+
+
+def test_extraction_falls_back_when_cleaning_fails(workdir, server, monkeypatch):
+    post_url = server.add_fixture_posts()[0]
+    expected = lw.get_post_content(post_url, use_cache=False)
+
+    def failing_cleanup(soup, root=None):
+        raise RuntimeError("cleanup failed")
+    monkeypatch.setattr(lw, 'epub_cleanup_pass', failing_cleanup)
+    post = lw.get_post_content(post_url, use_cache=False)
+
+    # The uncleaned body normalized by lxml, with the same images
+    assert post['title'] == expected['title']
+    assert post['images'] == expected['images']
+    assert 'Content could not be properly formatted' not in post['content']
@@ -0,0 +1,81 @@
+"""Tests for planning --split volumes against a size budget (--max-volume-mb)."""
+import os
+import zipfile
+
+from conftest import lw
+
+MB = 1024 * 1024
+
+
+def make_post(number, images=()):
+    return {'title': f"Post {number}", 'content': "", 'url': f"https://example.com/{number}",
+            'images': list(images)}
+
+
+def plan(posts, image_sizes, max_volume_mb=1.0, max_posts_per_file=None):
+    volumes = lw.split_epub_by_size(posts, max_posts_per_file, "book", max_volume_mb, image_sizes)
+    return [[post['title'] for post in volume['posts']] for volume in volumes]
+
+
+def test_posts_are_packed_in_order_within_the_budget():
+    posts = [make_post(i, [f"{i}.png"]) for i in range(5)]
+    image_sizes = {f"{i}.png": 0.4 * MB for i in range(5)}
+
+    assert plan(posts, image_sizes) == [["Post 0", "Post 1"], ["Post 2", "Post 3"], ["Post 4"]]
+
+
+def test_shared_images_count_once_per_volume():
+    posts = [make_post(i, ["shared.png"]) for i in range(4)]
+
+    assert plan(posts, {"shared.png": 0.6 * MB}) == [["Post 0", "Post 1", "Post 2", "Post 3"]]
+
+
+def test_oversized_post_gets_its_own_volume():
+    posts = [make_post(0, ["small.png"]), make_post(1, ["huge.png"]), make_post(2, ["small.png"])]
+
+    assert plan(posts, {"small.png": 0.1 * MB, "huge.png": 3 * MB}) == [
+        ["Post 0"], ["Post 1"], ["Post 2"]]
+
+
+def test_post_count_is_a_secondary_cap():
+    posts = [make_post(i) for i in range(5)]
+
+    assert plan(posts, {}, max_posts_per_file=2) == [["Post 0", "Post 1"], ["Post 2", "Post 3"], ["Post 4"]]
+
+
+def test_volume_filenames():
+    posts = [make_post(i, [f"{i}.png"]) for i in range(3)]
+
+    single = lw.split_epub_by_size(posts, None, "book", 10, {})
+    split = lw.split_epub_by_size(posts, None, "book", 1, {f"{i}.png": 0.7 * MB for i in range(3)})
+
+    assert [volume['filename'] for volume in single] == ["book.epub"]
+    assert [volume['filename'] for volume in split] == ["book_vol1.epub", "book_vol2.epub", "book_vol3.epub"]
+
+
+def test_estimates_match_the_built_images(workdir, server):
+    posts = lw.fetch_posts(server.add_fixture_posts(), use_cache=True)
+
+    image_sizes = lw.estimate_image_sizes(posts, max_width=300)
+    lw.create_epub(posts, "book.epub", max_image_width=300)
+
+    with zipfile.ZipFile("book.epub") as epub:
+        built = {os.path.basename(info.filename): info.file_size for info in epub.infolist()
+                 if info.filename.startswith('EPUB/images/')}
+    assert image_sizes and all(built[image] == size for image, size in image_sizes.items())
+
+
+def test_max_volume_mb_splits_the_build(workdir, server):
+    with open("urls.txt", 'w', encoding='utf-8') as f:
+        f.write("\n".join(server.add_fixture_posts()) + "\n")
+
+    # No two consecutive posts fit in the budget together, so each gets a volume
+    lw.main(['build', '--file', 'urls.txt', '-o', 'book.epub', '--max-volume-mb', '0.05'])
+
+    assert sorted(name for name in os.listdir('.') if name.endswith('.epub')) == [
+        "book_vol1.epub", "book_vol2.epub", "book_vol3.epub"]
+    # The short post fits in the budget, on disk too
+    with zipfile.ZipFile("book_vol2.epub") as epub:
+        assert [name for name in epub.namelist() if name.startswith('EPUB/chap_')] == [
+            "EPUB/chap_001_A Short Note.xhtml"]
+    assert os.path.getsize("book_vol2.epub") <= 0.05 * MB
@@ -0,0 +1,43 @@
+"""Tests for building --split volumes in parallel (--volume-workers)."""
+import zipfile
+
+import pytest
+
+from conftest import fresh_workdir, lw
+
+
+@pytest.fixture
+def post_urls(workdir, server, monkeypatch):
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1700000000')
+    return server.add_fixture_posts()
+
+
+def build_volumes(post_urls, workers):
+    posts = lw.fetch_posts(post_urls, use_cache=True)
+    volumes = lw.split_epub_by_size(posts, max_posts_per_file=1, base_filename="book")
+    return lw.create_volumes(volumes, "Book", "Author", {'max_image_width': 300}, workers)
+
+
+def read_entries(path):
+    with zipfile.ZipFile(path) as epub:
+        return {name: epub.read(name) for name in epub.namelist()}
+
+
+def test_parallel_volumes_equal_sequential_ones(post_urls, tmp_path):
+    sequential_dir = fresh_workdir(tmp_path, "sequential")
+    sequential = build_volumes(post_urls, workers=1)
+
+    fresh_workdir(tmp_path, "parallel")
+    parallel = build_volumes(post_urls, workers=3)
+
+    assert parallel == sequential == ["book_vol1.epub", "book_vol2.epub", "book_vol3.epub"]
+    for path in parallel:
+        assert read_entries(path) == read_entries(sequential_dir / path)
+
+
+def test_volumes_are_titled_by_number(post_urls):
+    paths = build_volumes(post_urls, workers=2)
+
+    for number, path in enumerate(paths, 1):
+        with zipfile.ZipFile(path) as epub:
+            assert f"<dc:title>Book - Vol {number}</dc:title>".encode() in epub.read('EPUB/content.opf')